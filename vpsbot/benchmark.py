@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bot's command handlers against the fake Docker daemon
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fake_docker import FakeDockerDaemon
+
+LIST_SIZES = (10, 100, 1000)
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"bench-user-{user_id}"
+        self.mention = f"<@{user_id}>"
+        # Stop and delete act on seeded VPSes with no owner, which only administrators may manage
+        self.guild_permissions = SimpleNamespace(administrator=True)
+
+class FakeReaction:
+    def __init__(self, emoji: str, message: "FakeMessage"):
+        self.emoji = emoji
+        self.message = message
+
+class FakeMessage:
+    """Stands in for a sent Discord message; edits and reactions take the simulated API latency"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, ctx: "FakeContext", content: Optional[str], embed):
+        self.id = next(self._ids)
+        self.ctx = ctx
+        self.content = content
+        self.embed = embed
+        self.channel = ctx
+        self.edited = False
+
+    async def edit(self, content: Optional[str] = None, embed=None):
+        await asyncio.sleep(self.ctx.latency)
+        self.ctx.record(content, embed)
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+        self.edited = True
+
+    async def add_reaction(self, emoji: str):
+        await asyncio.sleep(self.ctx.latency)
+        if self.ctx.reaction and emoji == self.ctx.reaction:
+            self.ctx.tasks.append(asyncio.create_task(self._react(emoji)))
+
+    async def _react(self, emoji: str, timeout: float = 30):
+        """Click a reaction the way a user would, once the handler is listening for it"""
+        # The handler only starts listening after adding all of its reactions,
+        # so keep clicking until it answers
+        deadline = time.monotonic() + timeout
+        while not self.edited and time.monotonic() < deadline:
+            self.ctx.bot.dispatch("reaction_add", FakeReaction(emoji, self), self.ctx.author)
+            await asyncio.sleep(0.01)
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+class FakeContext:
+    """Just enough of commands.Context for the command handlers in bot.py"""
+
+    def __init__(self, bot, author: FakeAuthor, latency: float, reaction: Optional[str] = "✅"):
+        self.bot = bot
+        self.author = author
+        self.channel = FakeChannel(author.id)
+        self.latency = latency
+        self.reaction = reaction
+        self.errors: List[str] = []
+        self.tasks: List[asyncio.Task] = []
+
+    def record(self, content: Optional[str], embed):
+        text = content or (embed.title if embed is not None else "") or ""
+        if text.startswith(("❌", "⏰")):
+            self.errors.append(text if content else f"{text}: {embed.description}")
+
+    async def send(self, content: Optional[str] = None, embed=None) -> FakeMessage:
+        await asyncio.sleep(self.latency)
+        self.record(content, embed)
+        return FakeMessage(self, content, embed)
+
+class LoopLag:
+    """Measures how late the event loop wakes up; blocking calls show up here first"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.monotonic() - started - self.interval)
+
+    def start(self):
+        self.max_lag = 0.0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> float:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return self.max_lag
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(name: str, latencies: List[float], errors: List[str], elapsed: float, max_lag: float) -> Dict:
+    result = {
+        "ops": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "loop_lag_max": max_lag,
+    }
+    print(f"{name:<12} {result['ops']:>6} {result['errors']:>6} {result['throughput']:>9.1f} "
+          f"{result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+          f"{max_lag * 1000:>9.1f}")
+    for error in sorted(set(errors))[:3]:
+        print(f"    {error[:120]}")
+    return result
+
+async def run_scenario(name: str, ops: List[Callable[[FakeContext], Awaitable]], users: int, make_ctx,
+                       lag: LoopLag, manager=None, finished_jobs: Optional[List] = None) -> Dict[str, Dict]:
+    """Run the operations with ``users`` of them in flight at a time.
+
+    Commands that queue jobs get a second ``<name>_job`` row, timed from
+    submission until the job finished.
+    """
+    latencies: List[float] = []
+    errors: List[str] = []
+    queue = list(reversed(ops))
+
+    async def user(author_id: int):
+        while queue:
+            op = queue.pop()
+            ctx = make_ctx(author_id)
+            started = time.monotonic()
+            try:
+                await op(ctx)
+            except Exception as e:
+                ctx.errors.append(f"{type(e).__name__}: {e}")
+            latencies.append(time.monotonic() - started)
+            errors.extend(ctx.errors)
+
+    lag.start()
+    started = time.monotonic()
+    wall_started = time.time()
+    if finished_jobs is not None:
+        finished_jobs.clear()
+    await asyncio.gather(*(user(author_id) for author_id in range(1, users + 1)))
+    elapsed = time.monotonic() - started
+    if manager is None:
+        return {name: summarize(name, latencies, errors, elapsed, await lag.stop())}
+
+    await manager.jobs.join()
+    max_lag = await lag.stop()
+    rows = {name: summarize(name, latencies, errors, elapsed, max_lag)}
+    jobs = [job for job in finished_jobs if job.created_at >= wall_started]
+    if jobs:
+        rows[f"{name}_job"] = summarize(
+            f"{name}_job",
+            [job.finished_at - job.created_at for job in jobs],
+            [f"job #{job.id}: {job.result}" for job in jobs if job.status != "done"],
+            max(job.finished_at for job in jobs) - wall_started,
+            max_lag
+        )
+    return rows
+
+async def benchmark(args) -> Dict[str, Dict]:
+    daemon = FakeDockerDaemon(mem_total=args.host_ram_gb * 1024 ** 3, ncpu=args.host_cpus,
+                              latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    url = await daemon.start()
+    state_dir = tempfile.TemporaryDirectory(prefix="vpsbot-bench-")
+
+    # bot.py builds its VPSManager from config at import time
+    os.environ.update({
+        "DOCKER_BACKEND": args.backend,
+        "DOCKER_HOST": url,
+        "DOCKER_NODES": "",
+        "STATE_DB_PATH": os.path.join(state_dir.name, "state.db"),
+        "WARM_POOL_ENABLED": "true" if args.warm_pool else "false",
+        "MAX_VPS_COUNT": str(max(LIST_SIZES) + args.ops * 2),
+        "METRICS_PORT": "0",
+        "TRACE_EXPORT_PATH": "",
+    })
+    import bot as bot_module
+    manager = bot_module.vps_manager
+    finished_jobs = []
+
+    async def collect(job):
+        finished_jobs.append(job)
+
+    manager.jobs.listeners.append(collect)
+    await manager.start()
+
+    def make_ctx(author_id: int) -> FakeContext:
+        return FakeContext(bot_module.bot, FakeAuthor(author_id), args.discord_latency)
+
+    lag = LoopLag()
+    results: Dict[str, Dict] = {}
+    print(f"{'scenario':<12} {'ops':>6} {'errors':>6} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'lag ms':>9}")
+    try:
+        results.update(await run_scenario(
+            "create", [lambda ctx: bot_module.create_vps(ctx, args="1 1 10")] * args.ops, args.users, make_ctx, lag,
+            manager, finished_jobs))
+
+        for size in LIST_SIZES:
+            missing = size - len(manager.vps_instances)
+            if missing > 0:
+                daemon.seed(missing, prefix=f"vps-seed{size}-")
+                await manager.resync(manager.nodes.primary)
+            results.update(await run_scenario(
+                f"list_{size}", [bot_module.list_vps] * args.ops, args.users, make_ctx, lag))
+
+        running = [name for name, vps in manager.vps_instances.items() if vps.status == "running"]
+        results.update(await run_scenario(
+            "status", [lambda ctx, name=name: bot_module.vps_status(ctx, name)
+                       for name in random.choices(running, k=args.ops)], args.users, make_ctx, lag))
+        results.update(await run_scenario(
+            "tmate", [lambda ctx, name=name: bot_module.tmate_command(ctx, name, "refresh")
+                      for name in random.choices(running, k=args.ops)], args.users, make_ctx, lag))
+
+        # Each stop and delete needs its own VPS
+        targets = random.sample(running, min(args.ops, len(running)))
+        results.update(await run_scenario(
+            "stop", [lambda ctx, name=name: bot_module.stop_vps(ctx, name) for name in targets],
+            args.users, make_ctx, lag, manager, finished_jobs))
+        results.update(await run_scenario(
+            "delete", [lambda ctx, name=name: bot_module.delete_vps(ctx, name) for name in targets],
+            args.users, make_ctx, lag, manager, finished_jobs))
+    finally:
+        await manager.close()
+        await daemon.stop()
+        state_dir.cleanup()
+    return results
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Print the change against a baseline and return the regressed scenarios"""
+    regressions = []
+    print(f"\n{'scenario':<12} {'ops/s':>16} {'p95 ms':>20} {'lag ms':>20}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        throughput = result["throughput"] / base["throughput"] - 1 if base["throughput"] else 0.0
+        p95 = result["p95"] / base["p95"] - 1 if base["p95"] else 0.0
+        regressed = throughput < -tolerance or p95 > tolerance
+        # Tiny lag values are noise; only a new blocking call moves this by much
+        lag_regressed = result["loop_lag_max"] > max(base["loop_lag_max"] * (1 + tolerance), 0.05)
+        if regressed or lag_regressed:
+            regressions.append(name)
+        print(f"{name:<12} {result['throughput']:>8.1f} {throughput:>+7.0%} "
+              f"{result['p95'] * 1000:>11.1f} {p95:>+7.0%} "
+              f"{result['loop_lag_max'] * 1000:>11.1f} {base['loop_lag_max'] * 1000:>7.1f}"
+              f"{'  ⚠️ REGRESSION' if regressed or lag_regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's commands against a fake Docker daemon")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--ops", type=int, default=50, help="Operations per scenario")
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds added to every Docker call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per Docker call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of Docker calls that fail")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Seconds per simulated Discord API call")
+    parser.add_argument("--backend", default="engine", choices=("engine", "dockerpy"))
+    parser.add_argument("--warm-pool", action="store_true", help="Benchmark creates with the warm pool enabled")
+    parser.add_argument("--host-ram-gb", type=int, default=4096, help="RAM the fake daemon reports")
+    parser.add_argument("--host-cpus", type=int, default=1024, help="CPUs the fake daemon reports")
+    parser.add_argument("--baseline", help="Compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\n💾 Results saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import discord
 from discord.ext import commands
 import asyncio
+import gzip
+import io
+import logging
 import os
 import re
-from typing import List, Tuple
-from vps_manager import VPSManager
-from config import DISCORD_TOKEN, DISCORD_GUILD_ID
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from metrics import sparkline
+from job_queue import Job
+from snapshots import Snapshot
+from vps_manager import VPSConfig, VPSManager
+from config import DISCORD_TOKEN, DISCORD_GUILD_ID, MAX_BATCH_SIZE, METRICS_HOST, METRICS_PORT, STORAGE_GRACE_PERIOD
+from metrics_server import start_metrics_server
 
 # Bot setup
 intents = discord.Intents.default()
@@ -15,6 +23,50 @@ bot = commands.Bot(command_prefix='!', intents=intents)
 # Initialize VPS Manager
 vps_manager = VPSManager()
 
+# Bot metrics, exported next to the manager's
+COMMAND_SECONDS = vps_manager.metrics.histogram("command_seconds", "Latency of bot commands", ("command", "outcome"))
+RATE_LIMIT_HITS = vps_manager.metrics.counter("discord_rate_limit_hits_total", "Discord API rate limit responses").labels()
+
+class RateLimitCounter(logging.Handler):
+    """Counts the rate limit warnings discord.py logs when it gets a 429"""
+
+    def emit(self, record: logging.LogRecord):
+        if "rate limited" in record.getMessage():
+            RATE_LIMIT_HITS.inc()
+
+logging.getLogger("discord.http").addHandler(RateLimitCounter(logging.WARNING))
+
+# !top metric names -> (stats field, label, unit)
+TOP_METRICS = {
+    "cpu": ("cpu_percent", "CPU", "%"),
+    "mem": ("mem_mb", "Memory", " MB"),
+    "mem%": ("mem_percent", "Memory of limit", "%"),
+    "rx": ("net_rx_kbps", "Network in", " KB/s"),
+    "tx": ("net_tx_kbps", "Network out", " KB/s"),
+    "read": ("blk_read_kbps", "Disk read", " KB/s"),
+    "write": ("blk_write_kbps", "Disk write", " KB/s"),
+}
+
+@bot.event
+async def setup_hook():
+    # Runs once inside the bot's event loop before connecting to Discord
+    await vps_manager.start()
+    if METRICS_PORT:
+        await start_metrics_server(vps_manager.metrics, METRICS_HOST, METRICS_PORT)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.command_started = time.monotonic()
+
+@bot.after_invoke
+async def record_command(ctx):
+    # Runs after every command, whether it succeeded or raised
+    started = getattr(ctx, "command_started", None)
+    if started is None:
+        return
+    outcome = "error" if ctx.command_failed else "ok"
+    COMMAND_SECONDS.labels(ctx.command.qualified_name, outcome).observe(time.monotonic() - started)
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
@@ -23,24 +75,156 @@ async def on_ready():
     # Set bot status
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name="VPS Resources"))
 
+# Messages to update when their job finishes, by message id. The event is
+# set once the command that sent the message is done editing it itself.
+job_messages: Dict[int, Tuple[discord.Message, asyncio.Event]] = {}
+
+def track_job_message(message: discord.Message) -> asyncio.Event:
+    ready = asyncio.Event()
+    job_messages[message.id] = (message, ready)
+    return ready
+
+# Background tasks of commands that outlive them
+background_tasks = set()
+
+# Bulk operations: command -> (job op, verb, past tense, emoji)
+BULK_OPS = {
+    "stop": ("stop", "Stopping", "Stopped", "⏹️"),
+    "delete": ("delete", "Deleting", "Deleted", "🗑️"),
+    "restart": ("restart", "Restarting", "Restarted", "🔄"),
+}
+
+# Age selector units in seconds
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Shown before deletes; storage only lives on in the trash for the grace period
+DELETE_WARNING = (f"Its storage is kept for {STORAGE_GRACE_PERIOD / 3600:g} h; `!undelete` brings it back until then."
+                  if STORAGE_GRACE_PERIOD else "This action cannot be undone!")
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def add_lines(embed: discord.Embed, title: str, lines: List[str]):
+    """Add lines as fields, spread over several when they outgrow one (1024 characters)"""
+    field = []
+    for line in lines:
+        if field and len("\n".join(field + [line])) > 1024:
+            embed.add_field(name=title, value="\n".join(field), inline=False)
+            title = "\u200b"
+            field = []
+        field.append(line[:1024])
+    if field:
+        embed.add_field(name=title, value="\n".join(field), inline=False)
+
+def format_bytes(count: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+def created_embed(vps_config: VPSConfig) -> discord.Embed:
+    embed = discord.Embed(
+        title="✅ VPS Created Successfully!",
+        description=f"**VPS Name:** `{vps_config.name}`\n"
+                   f"**Specifications:**\n"
+                   f"• RAM: {vps_config.ram_gb} GB\n"
+                   f"• CPU: {vps_config.cpu_cores} cores\n"
+                   f"• Disk: {vps_config.disk_gb} GB\n"
+                   f"**Status:** {vps_config.status}",
+        color=0x00ff00
+    )
+    embed.add_field(
+        name="🔗 Remote Access (tmate)",
+        value=f"```bash\n{vps_config.tmate_session}\n```" if vps_config.tmate_session
+              else f"Session not ready yet. Try `!tmate {vps_config.name} refresh`",
+        inline=False
+    )
+    return embed
+
+async def report_job(job: Job):
+    """Update the message that started a job once the job has finished"""
+    if not job.message_id:
+        return
+    entry = job_messages.pop(job.message_id, None)
+    if entry is not None:
+        message, ready = entry
+        await ready.wait()
+    else:
+        # Queued before a restart; only the ids survived
+        channel = bot.get_channel(job.channel_id)
+        if channel is None:
+            return
+        message = channel.get_partial_message(job.message_id)
+
+    done = job.status == "done"
+    vps_config = vps_manager.vps_instances.get(job.vps)
+    if job.op == "create" and done and vps_config:
+        embed = created_embed(vps_config)
+    elif job.op == "create":
+        embed = discord.Embed(title="❌ VPS Creation Failed", description=f"**VPS:** `{job.vps}`\n{job.result}",
+                              color=0xff0000)
+    elif job.op == "restart":
+        embed = discord.Embed(title="🔄 VPS Restarted" if done else "❌ Error", description=job.result,
+                              color=0x00ff00 if done else 0xff0000)
+        if done and vps_config and vps_config.tmate_session:
+            embed.add_field(name="🔗 Remote Access (tmate)", value=f"```bash\n{vps_config.tmate_session}\n```",
+                            inline=False)
+    elif job.op == "stop":
+        embed = discord.Embed(title="⏹️ VPS Stopped" if done else "❌ Error", description=job.result,
+                              color=0xffa500 if done else 0xff0000)
+    else:
+        embed = discord.Embed(title="🗑️ VPS Deleted" if done else "❌ Error", description=job.result,
+                              color=0x00ff00 if done else 0xff0000)
+    embed.set_footer(text=f"Job #{job.id} • queued {job.waited:.1f}s • ran {job.took or 0:.1f}s")
+
+    if job.op != "create":
+        await message.edit(embed=embed)
+        return
+    trace = vps_manager.tracer.trace(job.vps)
+    with trace.span("discord_edit"):
+        await message.edit(embed=embed)
+    if done and vps_config and vps_config.tmate_session:
+        # Edits don't notify anyone; a new message does
+        tmate_embed = discord.Embed(
+            title="🔗 tmate Session Ready",
+            description=f"**VPS:** `{vps_config.name}`\n"
+                       f"**SSH Command:**\n```bash\n{vps_config.tmate_session}\n```",
+            color=0x0099ff
+        )
+        with trace.span("discord_send"):
+            await message.channel.send(embed=tmate_embed)
+
+vps_manager.jobs.listeners.append(report_job)
+
 @bot.command(name='create')
 async def create_vps(ctx, *, args: str = None):
     """
     Create a new VPS with specified resources
-    Usage: !create <ram_gb> <cpu_cores> <disk_gb>
+    Usage: !create <ram_gb> <cpu_cores> <disk_gb> [x<count>] [pinned]
     Example: !create 8 4 30
     """
     if not args:
-        await ctx.send("❌ **Usage:** `!create <ram_gb> <cpu_cores> <disk_gb>`\n"
+        await ctx.send("❌ **Usage:** `!create <ram_gb> <cpu_cores> <disk_gb> [x<count>] [pinned]`\n"
                       "**Example:** `!create 8 4 30`\n"
                       "• 8 = RAM in GB\n"
                       "• 4 = CPU cores\n"
-                      "• 30 = Disk space in GB")
+                      "• 30 = Disk space in GB\n"
+                      "• x10 = create 10 identical VPSes (optional)\n"
+                      "• pinned = dedicated cores instead of shared ones (optional)")
         return
     
     # Parse arguments
     try:
         parts = args.strip().split()
+        pinned = len(parts) > 3 and parts[-1].lower() == "pinned"
+        if pinned:
+            parts.pop()
+        count = 1
+        if len(parts) == 4 and parts[3].lower().startswith("x"):
+            count = int(parts.pop()[1:])
         if len(parts) != 3:
             raise ValueError("Invalid number of arguments")
         
@@ -61,82 +245,131 @@ async def create_vps(ctx, *, args: str = None):
             await ctx.send("❌ **Error:** Disk space must be between 5-500 GB")
             return
         
+        if count < 1 or count > MAX_BATCH_SIZE:
+            await ctx.send(f"❌ **Error:** Count must be between 1-{MAX_BATCH_SIZE}")
+            return
+        
     except ValueError as e:
-        await ctx.send("❌ **Error:** Invalid arguments. Please use: `!create <ram_gb> <cpu_cores> <disk_gb>`")
+        await ctx.send("❌ **Error:** Invalid arguments. Please use: `!create <ram_gb> <cpu_cores> <disk_gb> [x<count>] [pinned]`")
+        return
+    
+    if count != 1:
+        await create_batch(ctx, ram_gb, cpu_cores, disk_gb, count, pinned)
         return
     
+    cpu = f"{cpu_cores} {'dedicated ' if pinned else ''}cores"
     # Show creation message
     embed = discord.Embed(
         title="🚀 Creating VPS...",
         description=f"**Specifications:**\n"
                    f"• RAM: {ram_gb} GB\n"
-                   f"• CPU: {cpu_cores} cores\n"
+                   f"• CPU: {cpu}\n"
                    f"• Disk: {disk_gb} GB",
         color=0x00ff00
     )
     embed.set_footer(text="This may take a few minutes...")
     message = await ctx.send(embed=embed)
     
-    # Create VPS
-    success, result_msg, vps_config = await vps_manager.create_vps(ram_gb, cpu_cores, disk_gb)
-    
-    if success:
-        # Update message with success
-        embed = discord.Embed(
-            title="✅ VPS Created Successfully!",
-            description=f"**VPS Name:** `{vps_config.name}`\n"
-                       f"**Specifications:**\n"
-                       f"• RAM: {ram_gb} GB\n"
-                       f"• CPU: {cpu_cores} cores\n"
-                       f"• Disk: {disk_gb} GB\n"
-                       f"**Status:** {vps_config.status}",
-            color=0x00ff00
-        )
-        
-        # Wait a bit for tmate setup
-        await asyncio.sleep(5)
+    # Create VPS; the create job updates this message when it finishes
+    ready = track_job_message(message)
+    try:
+        success, result_msg, vps_config = await vps_manager.create_vps(ram_gb, cpu_cores, disk_gb,
+                                                                        origin=(ctx.channel.id, message.id),
+                                                                        owner=ctx.author.id, pinned=pinned)
         
-        # Get updated VPS info
-        vps_info = vps_manager.get_vps_info(vps_config.name)
-        if vps_info and vps_info.get('tmate_session'):
-            embed.add_field(
-                name="🔗 Remote Access (tmate)",
-                value=f"```bash\n{vps_info['tmate_session']}\n```",
-                inline=False
-            )
-        else:
-            embed.add_field(
-                name="🔗 Remote Access (tmate)",
-                value="Setting up tmate session...",
-                inline=False
+        if not success:
+            job_messages.pop(message.id, None)
+            # Update message with error
+            embed = discord.Embed(
+                title="❌ VPS Creation Failed",
+                description=result_msg,
+                color=0xff0000
             )
+            await message.edit(embed=embed)
+            return
         
-        await message.edit(embed=embed)
-        
-        # Send follow-up message with tmate info after a delay
-        await asyncio.sleep(10)
-        vps_info = vps_manager.get_vps_info(vps_config.name)
-        if vps_info and vps_info.get('tmate_session'):
-            tmate_embed = discord.Embed(
-                title="🔗 tmate Session Ready",
-                description=f"**VPS:** `{vps_config.name}`\n"
-                           f"**SSH Command:**\n```bash\n{vps_info['tmate_session']}\n```",
-                color=0x0099ff
+        with vps_manager.tracer.trace(vps_config.name).span("discord_edit"):
+            if vps_config.status == "running":
+                # Claimed from the warm pool, usable right away
+                job_messages.pop(message.id, None)
+                await message.edit(embed=created_embed(vps_config))
+                return
+            
+            embed = discord.Embed(
+                title="⏳ VPS Queued",
+                description=f"**VPS Name:** `{vps_config.name}`\n"
+                           f"**Specifications:**\n"
+                           f"• RAM: {ram_gb} GB\n"
+                           f"• CPU: {cpu}\n"
+                           f"• Disk: {disk_gb} GB\n"
+                           f"**Status:** {result_msg}",
+                color=0xffa500
             )
-            await ctx.send(embed=tmate_embed)
-    else:
-        # Update message with error
+            embed.set_footer(text="This message updates when the VPS is ready. See !jobs for the queue.")
+            await message.edit(embed=embed)
+    finally:
+        ready.set()
+
+async def create_batch(ctx, ram_gb: int, cpu_cores: int, disk_gb: int, count: int, pinned: bool = False):
+    """Create ``count`` identical VPSes and report them in one summary embed"""
+    specs = f"• RAM: {ram_gb} GB\n• CPU: {cpu_cores} {'dedicated ' if pinned else ''}cores\n• Disk: {disk_gb} GB"
+    embed = discord.Embed(
+        title=f"🚀 Creating {count} VPSes...",
+        description=f"**Specifications (each):**\n{specs}",
+        color=0x00ff00
+    )
+    embed.set_footer(text="This may take a few minutes...")
+    message = await ctx.send(embed=embed)
+    
+    success, result_msg, vps_configs = await vps_manager.create_vps_batch(ram_gb, cpu_cores, disk_gb, count,
+                                                                          owner=ctx.author.id, pinned=pinned)
+    if not success:
         embed = discord.Embed(
-            title="❌ VPS Creation Failed",
+            title="❌ VPS Batch Creation Failed",
             description=result_msg,
             color=0xff0000
         )
         await message.edit(embed=embed)
+        return
+    
+    embed = discord.Embed(
+        title=f"⏳ {count} VPSes Queued",
+        description=f"**Specifications (each):**\n{specs}\n**Status:** {result_msg}",
+        color=0xffa500
+    )
+    embed.set_footer(text="This message updates when all of them are ready. See !jobs for the queue.")
+    await message.edit(embed=embed)
+    
+    run_in_background(report_batch(message, vps_configs, specs, time.monotonic()))
+
+async def report_batch(message: discord.Message, vps_configs: List[VPSConfig], specs: str, started: float):
+    """Replace the batch message with a summary once every VPS in it is ready or failed"""
+    try:
+        failures = await vps_manager.wait_until_created(vps_configs)
+    except Exception as e:
+        print(f"Error waiting for VPS batch: {e}")
+        return
+    ready = [vps_config for vps_config in vps_configs if vps_config.name not in failures]
+    
+    embed = discord.Embed(
+        title=f"✅ {len(ready)} VPSes Created" if not failures else f"⚠️ {len(ready)} of {len(vps_configs)} VPSes Created",
+        description=f"**Specifications (each):**\n{specs}",
+        color=0x00ff00 if not failures else 0xffa500
+    )
+    lines = [f"`{vps_config.name}` {vps_config.tmate_session or '(session not ready, use !tmate refresh)'}"
+             for vps_config in ready]
+    lines += [f"❌ `{name}` {error[:100]}" for name, error in failures.items()]
+    add_lines(embed, "🔗 VPSes", lines)
+    embed.set_footer(text=f"Took {time.monotonic() - started:.1f}s")
+    try:
+        await message.edit(embed=embed)
+    except Exception as e:
+        print(f"Error reporting VPS batch: {e}")
 
 @bot.command(name='list')
 async def list_vps(ctx):
     """List all VPS instances"""
-    vps_list = vps_manager.list_vps()
+    vps_list = await vps_manager.list_vps()
     
     if not vps_list:
         await ctx.send("📋 **No VPS instances found**")
@@ -152,6 +385,9 @@ async def list_vps(ctx):
         
         vps_info = f"**Specs:** {vps['ram_gb']}GB RAM, {vps['cpu_cores']} CPU, {vps['disk_gb']}GB Disk\n"
         vps_info += f"**Status:** {status_emoji} {vps['status']}\n"
+        if vps.get('net_bytes'):
+            received, sent = vps['net_bytes']
+            vps_info += f"**Traffic:** ↓ {format_bytes(received)} ↑ {format_bytes(sent)}\n"
         
         if vps.get('tmate_session'):
             vps_info += f"**tmate:** `{vps['tmate_session']}`"
@@ -164,11 +400,21 @@ async def list_vps(ctx):
     
     await ctx.send(embed=embed)
 
+async def wake(ctx, vps_name: str):
+    """Resume a VPS the idle policy paused or stopped, letting the user know"""
+    vps_config = vps_manager.vps_instances.get(vps_name)
+    if not vps_config or not vps_config.idle_suspended or vps_config.status not in ("paused", "stopped"):
+        return
+    message = await ctx.send(f"⏳ `{vps_name}` was {vps_config.status} for being idle, resuming it...")
+    success, result_msg = await vps_manager.resume_vps(vps_name)
+    await message.edit(content=f"▶️ {result_msg}" if success else f"❌ **Error:** {result_msg}")
+
 @bot.command(name='status')
 async def vps_status(ctx, vps_name: str = None):
     """Get status of a specific VPS or all VPS instances"""
     if vps_name:
-        vps_info = vps_manager.get_vps_info(vps_name)
+        await wake(ctx, vps_name)
+        vps_info = await vps_manager.get_vps_info(vps_name)
         if not vps_info:
             await ctx.send(f"❌ VPS `{vps_name}` not found")
             return
@@ -182,83 +428,433 @@ async def vps_status(ctx, vps_name: str = None):
         
         embed.add_field(name="Specifications", value=f"• RAM: {vps_info['ram_gb']} GB\n• CPU: {vps_info['cpu_cores']} cores\n• Disk: {vps_info['disk_gb']} GB", inline=True)
         embed.add_field(name="Status", value=f"{status_emoji} {vps_info['status']}", inline=True)
+        embed.add_field(name="Node", value=vps_info['node'], inline=True)
+        if vps_info.get('owner'):
+            embed.add_field(name="Owner", value=f"<@{vps_info['owner']}>", inline=True)
+        if vps_info.get('cpuset'):
+            embed.add_field(name="Pinned Cores", value=vps_info['cpuset'], inline=True)
+        
+        if vps_info.get('net_mbit'):
+            egress, ingress = vps_info['net_mbit']
+            network = (f"Limit: ↓ {f'{ingress:g} Mbit/s' if ingress else 'unlimited'} "
+                       f"↑ {f'{egress:g} Mbit/s' if egress else 'unlimited'}")
+            if vps_info.get('net_bytes'):
+                received, sent = vps_info['net_bytes']
+                network += f"\nSince start: ↓ {format_bytes(received)} ↑ {format_bytes(sent)}"
+            embed.add_field(name="Network", value=network, inline=False)
+        
+        disk_usage = await vps_manager.get_disk_usage(vps_name)
+        if disk_usage:
+            embed.add_field(
+                name="Disk Usage",
+                value="\n".join(f"`{mount}`: {used:.1f} / {total:.1f} GB ({used / total * 100 if total else 0:.0f}%)"
+                                 for mount, (used, total) in disk_usage.items()),
+                inline=False
+            )
         
         if vps_info.get('tmate_session'):
             embed.add_field(name="Remote Access", value=f"```bash\n{vps_info['tmate_session']}\n```", inline=False)
         
+        cpu_history = vps_manager.stats_collector.history(vps_name, "cpu_percent")
+        if cpu_history:
+            mem_history = vps_manager.stats_collector.history(vps_name, "mem_percent")
+            embed.add_field(
+                name=f"Recent Usage (last {len(cpu_history)}s)",
+                value=f"```\nCPU {sparkline(cpu_history)} {cpu_history[-1]:.0f}%\n"
+                      f"MEM {sparkline(mem_history, ceiling=100)} {mem_history[-1]:.0f}%\n```",
+                inline=False
+            )
+        
         await ctx.send(embed=embed)
     else:
         await list_vps(ctx)
 
+@bot.command(name='top')
+async def top_command(ctx, metric: str = "cpu", count: int = 10):
+    """Rank VPS instances by current resource usage"""
+    if metric not in TOP_METRICS:
+        await ctx.send(f"❌ **Usage:** `!top [{'|'.join(TOP_METRICS)}] [count]`")
+        return
+    field, label, unit = TOP_METRICS[metric]
+    ranked = vps_manager.stats_collector.top(field, limit=max(1, min(count, 25)))
+    if not ranked:
+        await ctx.send("📭 No usage data yet. Stats arrive a few seconds after a VPS starts.")
+        return
+    
+    embed = discord.Embed(
+        title=f"📊 Top VPS by {label}",
+        color=0x0099ff
+    )
+    lines = []
+    for position, (name, value) in enumerate(ranked, 1):
+        cpu = vps_manager.stats_collector.recent(name, "cpu_percent") or 0
+        mem = vps_manager.stats_collector.recent(name, "mem_percent") or 0
+        lines.append(f"`{position:>2}.` **{name}** — {value:.1f}{unit} (CPU {cpu:.0f}%, MEM {mem:.0f}%)")
+    embed.description = "\n".join(lines)
+    embed.set_footer(text="Averaged over the last 10 seconds")
+    await ctx.send(embed=embed)
+
+def parse_targets(ctx, args: Tuple[str, ...]) -> Tuple[List[str], Dict, Optional[str]]:
+    """Split command arguments into VPS names and selectors (prefix=, status=, age=, owner=)"""
+    names, selectors = [], {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        if not sep:
+            names.append(arg)
+        elif not value:
+            return [], {}, f"Empty selector `{key}=`; give it a value"
+        elif key == "prefix":
+            selectors["prefix"] = value
+        elif key == "status":
+            selectors["status"] = value
+        elif key == "age":
+            unit = AGE_UNITS.get(value[-1:])
+            if unit is None or not value[:-1].isdigit():
+                return [], {}, f"Invalid age `{value}`, use e.g. `30m`, `2h` or `1d`"
+            selectors["min_age"] = int(value[:-1]) * unit
+        elif key == "owner":
+            owner = re.sub(r"[<@!>]", "", value)
+            if value == "me":
+                selectors["owner"] = ctx.author.id
+            elif owner.isdigit():
+                selectors["owner"] = int(owner)
+            else:
+                return [], {}, f"Invalid owner `{value}`, use `me` or a mention"
+        else:
+            return [], {}, f"Unknown selector `{key}`"
+    return names, selectors, None
+
+def is_admin(ctx) -> bool:
+    """Server administrators may act on every user's VPSes"""
+    permissions = getattr(ctx.author, "guild_permissions", None)
+    return bool(permissions and permissions.administrator)
+
+def may_manage(ctx, item: Union[VPSConfig, Snapshot]) -> bool:
+    """Whether the author may stop, delete, restart, snapshot or clone a VPS, or use or delete a snapshot.
+
+    Owners and administrators may. VPSes and snapshots without a recorded
+    owner, created before owners were tracked, are left to administrators.
+    """
+    return is_admin(ctx) or (item.owner is not None and item.owner == ctx.author.id)
+
+async def check_access(ctx, name: str, action: str, snapshots: bool = False) -> bool:
+    """``may_manage`` for a VPS, or a snapshot first if ``snapshots``, by name,
+    telling the author when they may not; unknown names pass"""
+    item = vps_manager.snapshots.get(name) if snapshots else None
+    if item is None:
+        item = vps_manager.vps_instances.get(name)
+    if item is None or may_manage(ctx, item):
+        return True
+    await ctx.send(f"❌ **Error:** Only its owner or an administrator can {action} `{name}`")
+    return False
+
+async def confirm(ctx, message: discord.Message) -> Optional[bool]:
+    """Wait for the author to react ✅ or ❌ to a message; None on timeout"""
+    await message.add_reaction("✅")
+    await message.add_reaction("❌")
+    
+    def check(reaction, user):
+        return user == ctx.author and str(reaction.emoji) in ["✅", "❌"]
+    
+    try:
+        reaction, user = await bot.wait_for('reaction_add', timeout=30.0, check=check)
+    except asyncio.TimeoutError:
+        return None
+    return str(reaction.emoji) == "✅"
+
+async def bulk_command(ctx, command: str, args: Tuple[str, ...]):
+    """Stop, delete or restart every VPS named or matched by selectors, after one confirmation"""
+    op, verb, done, emoji = BULK_OPS[command]
+    names, selectors, error = parse_targets(ctx, args)
+    if not error and not names and not selectors:
+        error = "Name at least one VPS or give a selector"
+    if not error and not is_admin(ctx):
+        # Everyone else only matches their own VPSes
+        foreign = [name for name in names
+                   if name in vps_manager.vps_instances and not may_manage(ctx, vps_manager.vps_instances[name])]
+        if selectors.get("owner", ctx.author.id) != ctx.author.id:
+            error = f"Only administrators can {command} other users' VPSes"
+        elif foreign:
+            error = f"Only administrators can {command} other users' VPSes: {', '.join(f'`{name}`' for name in foreign)}"
+        selectors["owner"] = ctx.author.id
+    if error:
+        await ctx.send(f"❌ **Error:** {error}")
+        return
+    missing = [name for name in names if name not in vps_manager.vps_instances]
+    targets = [vps.name for vps in vps_manager.select_vps(names or None, **selectors)] + missing
+    if not targets:
+        await ctx.send("❌ No VPS matches")
+        return
+    
+    shown = ", ".join(f"`{name}`" for name in targets[:30])
+    if len(targets) > 30:
+        shown += f" and {len(targets) - 30} more"
+    embed = discord.Embed(
+        title=f"⚠️ Confirm {command.title()} of {len(targets)} VPSes",
+        description=shown + (f"\n{DELETE_WARNING}" if op == "delete" else ""),
+        color=0xff0000
+    )
+    message = await ctx.send(embed=embed)
+    confirmed = await confirm(ctx, message)
+    if confirmed is None:
+        await message.edit(embed=discord.Embed(title="⏰ Timeout", description=f"{command.title()} cancelled due to timeout", color=0xffa500))
+        return
+    if not confirmed:
+        await message.edit(embed=discord.Embed(title=f"❌ {command.title()} Cancelled", color=0xffa500))
+        return
+    
+    embed = discord.Embed(
+        title=f"⏳ {verb} {len(targets)} VPSes...",
+        description=shown,
+        color=0xffa500
+    )
+    embed.set_footer(text="This message updates when all of them are done. See !jobs for the queue.")
+    await message.edit(embed=embed)
+    run_in_background(report_bulk(message, op, done, emoji, targets, time.monotonic()))
+
+async def report_bulk(message: discord.Message, op: str, done: str, emoji: str, targets: List[str], started: float):
+    """Replace a bulk operation's message with each VPS's result once all have finished"""
+    try:
+        results = await vps_manager.bulk(op, targets)
+    except Exception as e:
+        print(f"Error running bulk {op}: {e}")
+        return
+    failed = [name for name, (success, _) in results.items() if not success]
+    embed = discord.Embed(
+        title=f"{emoji} {done} {len(results)} VPSes" if not failed
+              else f"⚠️ {done} {len(results) - len(failed)} of {len(results)} VPSes",
+        color=0x00ff00 if not failed else 0xffa500
+    )
+    add_lines(embed, "Results", [f"✅ `{name}`" if success else f"❌ `{name}` {result[:100]}"
+                                 for name, (success, result) in results.items()])
+    embed.set_footer(text=f"Took {time.monotonic() - started:.1f}s")
+    try:
+        await message.edit(embed=embed)
+    except Exception as e:
+        print(f"Error reporting bulk {op}: {e}")
+
 @bot.command(name='stop')
-async def stop_vps(ctx, vps_name: str):
-    """Stop a VPS instance"""
-    if not vps_name:
-        await ctx.send("❌ **Usage:** `!stop <vps_name>`")
+async def stop_vps(ctx, *targets: str):
+    """Stop a VPS instance, or several by name or selector"""
+    if not targets:
+        await ctx.send("❌ **Usage:** `!stop <vps_name> [...]` or `!stop prefix=<p> status=<s> age=<2h> owner=<me|@user>`")
+        return
+    if len(targets) > 1 or "=" in targets[0]:
+        await bulk_command(ctx, "stop", targets)
+        return
+    vps_name = targets[0]
+    if not await check_access(ctx, vps_name, "stop"):
+        return
+    
+    embed = discord.Embed(
+        title="⏳ Stopping VPS...",
+        description=f"**VPS:** `{vps_name}`",
+        color=0xffa500
+    )
+    message = await ctx.send(embed=embed)
+    await submit_and_report(ctx, message, "stop", vps_name)
+
+async def submit_and_report(ctx, message: discord.Message, op: str, vps_name: str):
+    """Queue a stop/delete/restart job that will update ``message`` when it finishes"""
+    ready = track_job_message(message)
+    try:
+        success, result_msg, job = vps_manager.submit_job(op, vps_name, origin=(ctx.channel.id, message.id))
+        if success and job.message_id == message.id:
+            return
+        # Not queued, or an earlier job for this VPS will report instead
+        job_messages.pop(message.id, None)
+        embed = discord.Embed(
+            title="⏳ Already In Progress" if success else "❌ Error",
+            description=result_msg,
+            color=0xffa500 if success else 0xff0000
+        )
+        await message.edit(embed=embed)
+    finally:
+        ready.set()
+
+@bot.command(name='delete')
+async def delete_vps(ctx, *targets: str):
+    """Delete a VPS instance, or several by name or selector"""
+    if not targets:
+        await ctx.send("❌ **Usage:** `!delete <vps_name> [...]` or `!delete prefix=<p> status=<s> age=<2h> owner=<me|@user>`")
+        return
+    if len(targets) > 1 or "=" in targets[0]:
+        await bulk_command(ctx, "delete", targets)
+        return
+    vps_name = targets[0]
+    if not await check_access(ctx, vps_name, "delete"):
         return
     
-    success, message = await vps_manager.stop_vps(vps_name)
+    # Confirmation
+    embed = discord.Embed(
+        title="⚠️ Confirm Deletion",
+        description=f"Are you sure you want to delete VPS `{vps_name}`?\n{DELETE_WARNING}",
+        color=0xff0000
+    )
+    message = await ctx.send(embed=embed)
+    confirmed = await confirm(ctx, message)
     
-    if success:
+    if confirmed:
         embed = discord.Embed(
-            title="⏹️ VPS Stopped",
-            description=message,
+            title="⏳ Deleting VPS...",
+            description=f"**VPS:** `{vps_name}`",
             color=0xffa500
         )
+        await message.edit(embed=embed)
+        await submit_and_report(ctx, message, "delete", vps_name)
+    elif confirmed is None:
+        await message.edit(embed=discord.Embed(title="⏰ Timeout", description="Deletion cancelled due to timeout", color=0xffa500))
     else:
+        await message.edit(embed=discord.Embed(title="❌ Deletion Cancelled", color=0xffa500))
+
+@bot.command(name='undelete')
+async def undelete_vps(ctx, vps_name: str = None):
+    """Bring back a deleted VPS while its storage is still in the trash"""
+    if not vps_name:
+        await ctx.send("❌ **Usage:** `!undelete <vps_name>`")
+        return
+    
+    embed = discord.Embed(
+        title="⏳ Restoring VPS...",
+        description=f"**VPS:** `{vps_name}`",
+        color=0xffa500
+    )
+    message = await ctx.send(embed=embed)
+    
+    # Restored VPSes are recreated by a create job, which updates this message
+    ready = track_job_message(message)
+    try:
+        success, result_msg, vps_config = await vps_manager.undelete_vps(vps_name, origin=(ctx.channel.id, message.id))
+        if not success:
+            job_messages.pop(message.id, None)
+            await message.edit(embed=discord.Embed(title="❌ Undelete Failed", description=result_msg, color=0xff0000))
+            return
         embed = discord.Embed(
-            title="❌ Error",
-            description=message,
-            color=0xff0000
+            title="⏳ VPS Restored",
+            description=f"**VPS Name:** `{vps_config.name}`\n**Status:** {result_msg}",
+            color=0xffa500
         )
+        embed.set_footer(text="This message updates when the VPS is ready. See !jobs for the queue.")
+        await message.edit(embed=embed)
+    finally:
+        ready.set()
+
+@bot.command(name='restart')
+async def restart_vps(ctx, *targets: str):
+    """Restart a VPS instance, or several by name or selector"""
+    if not targets:
+        await ctx.send("❌ **Usage:** `!restart <vps_name> [...]` or `!restart prefix=<p> status=<s> age=<2h> owner=<me|@user>`")
+        return
+    if len(targets) > 1 or "=" in targets[0]:
+        await bulk_command(ctx, "restart", targets)
+        return
+    if not await check_access(ctx, targets[0], "restart"):
+        return
     
+    embed = discord.Embed(
+        title="⏳ Restarting VPS...",
+        description=f"**VPS:** `{targets[0]}`",
+        color=0xffa500
+    )
+    message = await ctx.send(embed=embed)
+    await submit_and_report(ctx, message, "restart", targets[0])
+
+@bot.command(name='resize')
+async def resize_vps(ctx, vps_name: str = None, ram_gb: int = None, cpu_cores: int = None):
+    """Change the RAM and CPU of a VPS without recreating it"""
+    if not vps_name or ram_gb is None or cpu_cores is None:
+        await ctx.send("❌ **Usage:** `!resize <vps_name> <ram_gb> <cpu_cores>`\n**Example:** `!resize vps-1234567890 16 8`")
+        return
+    
+    await wake(ctx, vps_name)
+    success, result_msg = await vps_manager.resize_vps(vps_name, ram_gb, cpu_cores)
+    embed = discord.Embed(
+        title="📐 VPS Resized" if success else "❌ Resize Failed",
+        description=result_msg,
+        color=0x00ff00 if success else 0xff0000
+    )
     await ctx.send(embed=embed)
 
-@bot.command(name='delete')
-async def delete_vps(ctx, vps_name: str):
-    """Delete a VPS instance"""
-    if not vps_name:
-        await ctx.send("❌ **Usage:** `!delete <vps_name>`")
+@bot.command(name='snapshot')
+async def snapshot_command(ctx, target: str = None, name: str = None):
+    """Snapshot a VPS, or list and delete snapshots"""
+    if not target or (target == "delete" and not name):
+        await ctx.send("❌ **Usage:** `!snapshot <vps_name> [name]`, `!snapshot list` or `!snapshot delete <name>`")
+        return
+    
+    if target == "list":
+        snapshots = sorted(vps_manager.snapshots.values(), key=lambda snapshot: snapshot.created_at)
+        embed = discord.Embed(title="📸 Snapshots", color=0x0099ff)
+        if not snapshots:
+            embed.description = "No snapshots yet. Take one with `!snapshot <vps_name>`."
+        add_lines(embed, f"{len(snapshots)} snapshots", [
+            f"`{snapshot.name}` of `{snapshot.source}` • {snapshot.ram_gb} GB / {snapshot.cpu_cores} cores / "
+            f"{snapshot.disk_gb} GB • {snapshot.node}" + ("" if snapshot.volume else " • no volume")
+            for snapshot in snapshots
+        ])
+        await ctx.send(embed=embed)
+        return
+    
+    if target == "delete":
+        if not await check_access(ctx, name, "delete", snapshots=True):
+            return
+        success, result_msg = await vps_manager.delete_snapshot(name)
+        embed = discord.Embed(
+            title="🗑️ Snapshot Deleted" if success else "❌ Error",
+            description=result_msg,
+            color=0x00ff00 if success else 0xff0000
+        )
+        await ctx.send(embed=embed)
+        return
+    if not await check_access(ctx, target, "snapshot"):
         return
     
-    # Confirmation
     embed = discord.Embed(
-        title="⚠️ Confirm Deletion",
-        description=f"Are you sure you want to delete VPS `{vps_name}`?\nThis action cannot be undone!",
-        color=0xff0000
+        title="📸 Taking Snapshot...",
+        description=f"**VPS:** `{target}`",
+        color=0xffa500
     )
     message = await ctx.send(embed=embed)
-    await message.add_reaction("✅")
-    await message.add_reaction("❌")
+    success, result_msg, snapshot = await vps_manager.snapshot_vps(target, name, owner=ctx.author.id)
+    embed = discord.Embed(
+        title="📸 Snapshot Taken" if success else "❌ Snapshot Failed",
+        description=result_msg + (f"\n`!clone {snapshot.name}` starts a VPS from it." if success else ""),
+        color=0x00ff00 if success else 0xff0000
+    )
+    await message.edit(embed=embed)
+
+@bot.command(name='clone')
+async def clone_command(ctx, source: str = None, count: str = None):
+    """Create VPSes that start as copies of a VPS or snapshot"""
+    if not source or (count and not re.fullmatch(r"x\d+", count.lower())):
+        await ctx.send("❌ **Usage:** `!clone <vps_name|snapshot> [x<count>]`\n**Example:** `!clone vps-1234567890 x5`")
+        return
+    count = int(count[1:]) if count else 1
+    if not await check_access(ctx, source, "clone", snapshots=True):
+        return
     
-    def check(reaction, user):
-        return user == ctx.author and str(reaction.emoji) in ["✅", "❌"]
+    embed = discord.Embed(
+        title="🧬 Cloning...",
+        description=f"**Source:** `{source}`",
+        color=0x00ff00
+    )
+    message = await ctx.send(embed=embed)
+    success, result_msg, vps_configs = await vps_manager.clone_vps(source, count, owner=ctx.author.id)
+    if not success:
+        await message.edit(embed=discord.Embed(title="❌ Clone Failed", description=result_msg, color=0xff0000))
+        return
     
-    try:
-        reaction, user = await bot.wait_for('reaction_add', timeout=30.0, check=check)
-        
-        if str(reaction.emoji) == "✅":
-            success, result_msg = await vps_manager.delete_vps(vps_name)
-            
-            if success:
-                embed = discord.Embed(
-                    title="🗑️ VPS Deleted",
-                    description=result_msg,
-                    color=0x00ff00
-                )
-            else:
-                embed = discord.Embed(
-                    title="❌ Error",
-                    description=result_msg,
-                    color=0xff0000
-                )
-            
-            await message.edit(embed=embed)
-        else:
-            await message.edit(embed=discord.Embed(title="❌ Deletion Cancelled", color=0xffa500))
+    vps_config = vps_configs[0]
+    specs = f"• RAM: {vps_config.ram_gb} GB\n• CPU: {vps_config.cpu_cores} cores\n• Disk: {vps_config.disk_gb} GB"
+    embed = discord.Embed(
+        title=f"⏳ {count} Clones Queued" if count != 1 else f"⏳ Clone `{vps_config.name}` Queued",
+        description=f"**Specifications (each):**\n{specs}\n**Status:** {result_msg}",
+        color=0xffa500
+    )
+    embed.set_footer(text="This message updates when all of them are ready. See !jobs for the queue.")
+    await message.edit(embed=embed)
     
-    except asyncio.TimeoutError:
-        await message.edit(embed=discord.Embed(title="⏰ Timeout", description="Deletion cancelled due to timeout", color=0xffa500))
+    run_in_background(report_batch(message, vps_configs, specs, time.monotonic()))
 
 @bot.command(name='resources')
 async def system_resources(ctx):
@@ -287,7 +883,213 @@ async def system_resources(ctx):
         value=f"Used: {resources['disk_used_gb']:.1f} GB / {resources['disk_total_gb']:.1f} GB",
         inline=True
     )
+
+    embed.add_field(
+        name="Load & I/O",
+        value=f"Load: {resources['load_1m']:.2f}\n"
+              f"Disk: {resources['disk_read_mbps']:.1f} MB/s read, {resources['disk_write_mbps']:.1f} MB/s write\n"
+              f"Net: {resources['net_rx_mbps']:.1f} MB/s in, {resources['net_tx_mbps']:.1f} MB/s out",
+        inline=False
+    )
+
+    history_lines = []
+    for field, label, unit in (("cpu_percent", "CPU", "%"), ("used_ram_gb", "RAM", " GB"), ("load_1m", "Load", "")):
+        for window, (low, avg, high) in resources['history'][field].items():
+            history_lines.append(f"{label} {window}: {low:.1f}{unit} / {avg:.1f}{unit} / {high:.1f}{unit}")
+    if history_lines:
+        embed.add_field(
+            name="History (min / avg / max)",
+            value="\n".join(history_lines),
+            inline=False
+        )
+
+    for node in vps_manager.nodes:
+        capacity = node.scheduler.stats()
+        committed, limits, headroom = capacity["committed"], capacity["limits"], capacity["headroom"]
+        embed.add_field(
+            name=f"Capacity on {node.name} (committed / limit)",
+            value=f"RAM: {committed['ram_gb']:.0f} / {limits['ram_gb']:.0f} GB\n"
+                  f"CPU: {committed['cpu_cores']:.0f} / {limits['cpu_cores']:.0f} cores\n"
+                  f"Disk: {committed['disk_gb']:.0f} / {limits['disk_gb']:.0f} GB\n"
+                  f"Headroom: {max(0, headroom['ram_gb']):.0f} GB, {max(0, headroom['cpu_cores']):.0f} cores, "
+                  f"{max(0, headroom['disk_gb']):.0f} GB disk",
+            inline=False
+        )
+
+        if node.cpusets:
+            cpusets = node.cpusets.stats()
+            embed.add_field(
+                name=f"Dedicated Cores on {node.name}",
+                value=f"Used: {cpusets['used']} / {cpusets['pinnable']} by {cpusets['allocations']} VPSes\n"
+                      f"Largest free run: {cpusets['largest_free_run']} cores\n"
+                      f"Free per NUMA node: " + ", ".join(f"{numa}: {free}" for numa, free in cpusets['free_by_numa'].items())
+                      + f"\nShared cores: {cpusets['shared'] or 'none'}",
+                inline=False
+            )
+
+        lanes = node.backend.stats_summary()["lanes"]
+        embed.add_field(
+            name=f"Docker Queue on {node.name}",
+            value="\n".join(f"{name}: {lane['running']}/{lane['workers']} running, {lane['queued']} queued"
+                            for name, lane in lanes.items()),
+            inline=False
+        )
+
+    if vps_manager.idle_policy:
+        idle = vps_manager.idle_policy.stats()
+        embed.add_field(
+            name="Idle VPSes",
+            value=f"Paused: {idle['paused']}, stopped: {idle['stopped']}\n"
+                  f"Reclaimed: {idle['reclaimed_ram_gb']:.1f} GB RAM\n"
+                  f"Resumed so far: {idle['resumes']}",
+            inline=False
+        )
+
+    if any(node.local for node in vps_manager.nodes):
+        storage = vps_manager.storage.stats()
+        embed.add_field(
+            name="Storage",
+            value=f"Volumes: {storage['active']} in use, {storage['trash']} in trash ({storage['trash_gb']} GB)\n"
+                  f"Reclaimed: {storage['reclaimed']} volumes, {storage['reclaimed_gb']} GB\n"
+                  f"Orphans found: {storage['orphans']}",
+            inline=False
+        )
+
+    if vps_manager.warm_pool:
+        pool = vps_manager.warm_pool.stats()
+        embed.add_field(
+            name="Warm Pool",
+            value="\n".join(f"{size}: {count} ready" for size, count in pool["ready"].items())
+                  + f"\nReserved: {pool['reserved_ram_gb']} GB RAM",
+            inline=False
+        )
+
+    await ctx.send(embed=embed)
+
+@bot.command(name='nodes')
+async def nodes_command(ctx, node_name: str = None, action: str = None):
+    """Show Docker nodes, or drain/undrain one"""
+    if node_name:
+        if action not in ("drain", "undrain"):
+            await ctx.send("❌ **Usage:** `!nodes [node_name drain|undrain]`")
+            return
+        if not is_admin(ctx):
+            await ctx.send("❌ Only administrators can drain or undrain nodes")
+            return
+        success, message = vps_manager.drain_node(node_name, draining=action == "drain")
+        await ctx.send(f"{'✅' if success else '❌'} {message}")
+        return
+
+    embed = discord.Embed(
+        title="🌐 Docker Nodes",
+        color=0x0099ff
+    )
+    for name, node in vps_manager.nodes.stats().items():
+        if not node['healthy']:
+            state = f"🔴 unreachable: {node['last_error']}"
+        elif node['draining']:
+            state = "🟡 draining"
+        else:
+            state = "🟢 healthy"
+        headroom = node['capacity']['headroom']
+        vps_count = sum(1 for vps in vps_manager.vps_instances.values() if vps_manager.nodes.get(vps.node).name == name)
+        embed.add_field(
+            name=name,
+            value=f"{state}\n`{node['url']}`\nVPS: {vps_count}\n"
+                  f"Free: {max(0, headroom['ram_gb']):.0f} GB RAM, {max(0, headroom['cpu_cores']):.0f} cores",
+            inline=True
+        )
+    await ctx.send(embed=embed)
+
+@bot.command(name='jobs')
+async def jobs_command(ctx):
+    """Show queued, running and recently finished lifecycle jobs"""
+    jobs = vps_manager.jobs
+    running = sorted(jobs.running.values(), key=lambda job: job.started_at)
+    queued = [job for _, _, job in jobs.queued]
+    failed = [job for job in jobs.recent if job.status == "failed"]
+    done = [job for job in jobs.recent if job.status == "done"]
     
+    embed = discord.Embed(
+        title="🧾 Jobs",
+        color=0x0099ff
+    )
+    embed.add_field(
+        name=f"▶️ Running ({len(running)})",
+        value="\n".join(f"`#{job.id}` {job.op} `{job.vps}` — {job.took:.0f}s (queued {job.waited:.0f}s)"
+                        for job in running[:10]) or "Nothing running",
+        inline=False
+    )
+    embed.add_field(
+        name=f"⏳ Queued ({len(queued)})",
+        value="\n".join(f"`#{job.id}` {job.op} `{job.vps}` — waiting {job.waited:.0f}s"
+                        for job in queued[:10]) or "Queue is empty",
+        inline=False
+    )
+    embed.add_field(
+        name="❌ Recently Failed",
+        value="\n".join(f"`#{job.id}` {job.op} `{job.vps}` — {(job.result or '')[:60]}"
+                        for job in failed[:5]) or "No failures",
+        inline=False
+    )
+    embed.add_field(
+        name="✅ Recently Done",
+        value="\n".join(f"`#{job.id}` {job.op} `{job.vps}` — queued {job.waited:.1f}s, ran {job.took or 0:.1f}s"
+                        for job in done[:5]) or "Nothing yet",
+        inline=False
+    )
+    limits = ", ".join(f"{op} ≤ {limit}" for op, limit in jobs.limits.items())
+    embed.set_footer(text=f"{jobs.workers} workers" + (f"; at most {limits} at once" if limits else ""))
+    await ctx.send(embed=embed)
+
+def export_traces() -> Tuple[int, bytes]:
+    """Every kept span as gzipped JSON lines"""
+    buffer = io.BytesIO()
+    with gzip.open(buffer, "wt") as f:
+        count = vps_manager.tracer.export(f)
+    return count, buffer.getvalue()
+
+@bot.command(name='trace')
+async def trace_command(ctx, vps_name: str = None):
+    """Show where the time went while provisioning a VPS"""
+    if vps_name == "export":
+        if not is_admin(ctx):
+            await ctx.send("❌ Only administrators can export traces")
+            return
+        # Sent as an attachment, so nothing is written on the bot's host
+        count, data = await asyncio.get_running_loop().run_in_executor(None, export_traces)
+        await ctx.send(f"✅ Exported {count} spans",
+                       file=discord.File(io.BytesIO(data), filename=f"traces-{int(time.time())}.jsonl.gz"))
+        return
+    if not vps_name:
+        await ctx.send("❌ **Usage:** `!trace <vps_name>` or `!trace export`")
+        return
+
+    trace = vps_manager.tracer.get(vps_name)
+    if not trace or not trace.spans:
+        await ctx.send(f"❌ No trace recorded for `{vps_name}`")
+        return
+
+    # Enclosing spans are recorded when they end, so order by start time
+    spans = sorted(trace.spans, key=lambda span: span.start)
+    origin = spans[0].start
+    total = max(span.start + span.duration for span in spans) - origin
+    lines = []
+    for span in spans:
+        line = f"{span.start - origin:7.2f}s {span.duration:7.2f}s  {span.name:<16} {span.outcome}"
+        if span.detail:
+            line += f" ({span.detail[:40]})"
+        lines.append(line)
+    # Long session polls would push the interesting stages out of the embed
+    if len(lines) > 40:
+        lines = lines[:20] + [f"... {len(lines) - 40} more ..."] + lines[-20:]
+
+    embed = discord.Embed(
+        title=f"⏱️ Trace: {vps_name}",
+        description="```\n  start    took  stage            outcome\n" + "\n".join(lines) + "\n```",
+        color=0x0099ff
+    )
+    embed.set_footer(text=f"Total: {total:.2f}s over {len(spans)} spans")
     await ctx.send(embed=embed)
 
 @bot.command(name='tmate')
@@ -297,7 +1099,8 @@ async def tmate_command(ctx, vps_name: str = None, action: str = None):
         await ctx.send("❌ **Usage:** `!tmate <vps_name> [refresh]`\n**Example:** `!tmate vps-1234567890`\n**Refresh:** `!tmate vps-1234567890 refresh`")
         return
     
-    vps_info = vps_manager.get_vps_info(vps_name)
+    await wake(ctx, vps_name)
+    vps_info = await vps_manager.get_vps_info(vps_name)
     if not vps_info:
         await ctx.send(f"❌ VPS `{vps_name}` not found")
         return
@@ -315,7 +1118,7 @@ async def tmate_command(ctx, vps_name: str = None, action: str = None):
         
         if success:
             # Get updated VPS info
-            vps_info = vps_manager.get_vps_info(vps_name)
+            vps_info = await vps_manager.get_vps_info(vps_name)
             embed = discord.Embed(
                 title="✅ tmate Session Refreshed",
                 description=f"**VPS:** `{vps_name}`\n"
@@ -378,13 +1181,22 @@ async def help_command(ctx):
     )
     
     commands_list = [
-        ("!create <ram> <cpu> <disk>", "Create a new VPS (e.g., !create 8 4 30)"),
+        ("!create <ram> <cpu> <disk> [x<count>] [pinned]", "Create a new VPS, or several identical ones (e.g., !create 8 4 30 x10); pinned gives it dedicated cores"),
         ("!list", "List all VPS instances"),
         ("!status [vps_name]", "Get VPS status"),
         ("!tmate <vps_name> [refresh]", "Get tmate SSH session for VPS"),
-        ("!stop <vps_name>", "Stop a VPS instance"),
-        ("!delete <vps_name>", "Delete a VPS instance"),
+        ("!stop <vps_name...|selectors>", "Stop one or more VPS instances"),
+        ("!delete <vps_name...|selectors>", "Delete one or more VPS instances"),
+        ("!undelete <vps_name>", "Bring back a deleted VPS and its storage during the grace period"),
+        ("!restart <vps_name...|selectors>", "Restart one or more VPS instances"),
+        ("!resize <vps_name> <ram> <cpu>", "Change a VPS's RAM and CPU in place"),
+        ("!snapshot <vps_name> [name] | list | delete <name>", "Save a VPS's filesystem and storage as a snapshot"),
+        ("!clone <vps_name|snapshot> [x<count>]", "Create VPSes that start as copies of a VPS or snapshot"),
         ("!resources", "Show system resource usage"),
+        ("!top [cpu|mem|mem%|rx|tx|read|write] [count]", "Rank VPS instances by usage"),
+        ("!nodes [node drain|undrain]", "Show Docker nodes or drain one"),
+        ("!jobs", "Show queued, running and failed create/stop/delete jobs"),
+        ("!trace <vps_name|export>", "Show how long each provisioning stage of a VPS took"),
         ("!commands", "Show this help message")
     ]
     
@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """
 Build the custom VPS Docker image
+
+The build context is a tar archive made in memory from the Dockerfile and
+start script below, so nothing from the working directory is sent to the
+daemon. The image is labeled with a hash of that context and tagged with it
+too; when an image with the current hash already exists, the build is
+skipped.
 """
 
-import docker
-import os
+import argparse
+import hashlib
+import io
+import sys
+import tarfile
+from typing import Callable, Dict, Optional, Tuple
+
+from config import VPS_IMAGE
 
-def build_custom_image():
-    """Build the custom VPS Docker image with tmate pre-installed"""
-    
-    # Create Dockerfile content
-    dockerfile_content = """
+# Layers go from least to most likely to change, so editing the start script
+# or the SSH setup doesn't re-run the package install
+DOCKERFILE = """\
 FROM ubuntu:24.04
 
 # Install essential packages
@@ -24,61 +34,137 @@ RUN apt-get update && apt-get install -y \\
     && rm -rf /var/lib/apt/lists/*
 
 # Configure SSH
-RUN mkdir /var/run/sshd
-RUN echo 'root:password' | chpasswd
-RUN sed -i 's/#PermitRootLogin prohibit-password/PermitRootLogin yes/' /etc/ssh/sshd_config
-RUN sed -i 's/#PasswordAuthentication yes/PasswordAuthentication yes/' /etc/ssh/sshd_config
-
-# Create startup script
-RUN echo '#!/bin/bash' > /start.sh && \\
-    echo 'service ssh start' >> /start.sh && \\
-    echo 'tmate -S /tmp/tmate.sock new-session -d' >> /start.sh && \\
-    echo 'tmate -S /tmp/tmate.sock display -p "#{tmate_ssh}" > /tmp/tmate_info' >> /start.sh && \\
-    echo 'while true; do sleep 30; done' >> /start.sh && \\
-    chmod +x /start.sh
+RUN mkdir -p /var/run/sshd && \\
+    echo 'root:password' | chpasswd && \\
+    sed -i 's/#PermitRootLogin prohibit-password/PermitRootLogin yes/' /etc/ssh/sshd_config && \\
+    sed -i 's/#PasswordAuthentication yes/PasswordAuthentication yes/' /etc/ssh/sshd_config
 
 EXPOSE 22
 
+# Startup script; starts SSH and publishes the tmate session for the bot
+COPY start.sh /start.sh
+
+# Tells the bot this image starts and publishes its own tmate session
+LABEL vpsbot.tmate="true"
+
 CMD ["/start.sh"]
 """
-    
-    try:
-        # Write Dockerfile
-        with open("Dockerfile", "w") as f:
-            f.write(dockerfile_content)
-        
-        print("📝 Created Dockerfile")
-        
-        # Build Docker image
-        client = docker.from_env()
-        print("🔨 Building custom Docker image...")
-        
-        image, build_logs = client.images.build(
-            path=".",
-            tag="vpsbot-ubuntu:24.04",
-            rm=True
-        )
-        
-        print("✅ Docker image built successfully!")
-        print(f"Image ID: {image.id}")
-        
-        # Clean up Dockerfile
-        os.remove("Dockerfile")
-        print("🧹 Cleaned up Dockerfile")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error building Docker image: {e}")
-        return False
+
+START_SCRIPT = """\
+#!/bin/bash
+service ssh start
+tmate -S /tmp/tmate.sock new-session -d
+tmate -S /tmp/tmate.sock wait tmate-ready
+tmate -S /tmp/tmate.sock display -p "#{tmate_ssh}" > /tmp/tmate_info
+while true; do sleep 30; done
+"""
+
+# Everything the build reads: path in the context -> (content, mode)
+CONTEXT_FILES: Dict[str, Tuple[str, int]] = {
+    "Dockerfile": (DOCKERFILE, 0o644),
+    "start.sh": (START_SCRIPT, 0o755),
+}
+
+HASH_LABEL = "vpsbot.content-hash"
+
+def content_hash() -> str:
+    """sha256 over every context file's path, mode and content"""
+    digest = hashlib.sha256()
+    for path, (content, mode) in sorted(CONTEXT_FILES.items()):
+        digest.update(f"{path}\0{mode:o}\0{len(content)}\0".encode())
+        digest.update(content.encode())
+    return digest.hexdigest()
+
+def build_context() -> bytes:
+    """The minimal build context as an in-memory tar; the same inputs always give the same bytes"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for path, (content, mode) in sorted(CONTEXT_FILES.items()):
+            data = content.encode()
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mode = mode
+            # Fixed metadata, so COPY layers stay cached across builds
+            info.mtime = 0
+            info.uid = info.gid = 0
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+def _split(image: str) -> Tuple[str, str]:
+    """``registry:5000/vpsbot-ubuntu:24.04`` -> (``registry:5000/vpsbot-ubuntu``, ``24.04``)"""
+    if ":" not in image.rsplit("/", 1)[-1]:
+        return image, "latest"
+    repository, tag = image.rsplit(":", 1)
+    return repository, tag
+
+def content_tag(image: str = VPS_IMAGE) -> str:
+    """``vpsbot-ubuntu:24.04`` -> ``vpsbot-ubuntu:content-<first 12 hex of the hash>``"""
+    return f"{_split(image)[0]}:content-{content_hash()[:12]}"
+
+def build_custom_image(image: str = VPS_IMAGE, force: bool = False, pull: bool = False,
+                       log: Callable[[str], None] = print) -> Tuple[bool, str]:
+    """Build (or reuse) the VPS image for the current build inputs and tag it as ``image``"""
+    import docker
+
+    expected = content_hash()
+    cached = content_tag(image)
+    client = docker.from_env()
+    api = client.api
+
+    for tag in ([] if force else [cached, image]):
+        try:
+            existing = api.inspect_image(tag)
+        except docker.errors.NotFound:
+            continue
+        if (existing["Config"].get("Labels") or {}).get(HASH_LABEL) == expected:
+            # Built before; make sure both names point at it
+            api.tag(existing["Id"], *_split(image))
+            api.tag(existing["Id"], *_split(cached))
+            return True, f"{image} is up to date ({cached}, {existing['Id'][:19]})"
+
+    log(f"🔨 Building {image} from {len(CONTEXT_FILES)} files, content hash {expected[:12]}...")
+    image_id: Optional[str] = None
+    for chunk in api.build(fileobj=io.BytesIO(build_context()), custom_context=True, tag=image, rm=True,
+                           forcerm=True, pull=pull, labels={HASH_LABEL: expected}, decode=True):
+        if "error" in chunk:
+            return False, chunk["error"].strip()
+        if "stream" in chunk:
+            # Step output arrives as it is produced, not after the build
+            line = chunk["stream"].rstrip("\n")
+            if line.strip():
+                log(line)
+        elif "status" in chunk:
+            log(f"{chunk['status']} {chunk.get('progress', '')}".rstrip())
+        elif "aux" in chunk and "ID" in chunk["aux"]:
+            image_id = chunk["aux"]["ID"]
+    if image_id is None:
+        image_id = api.inspect_image(image)["Id"]
+    api.tag(image_id, *_split(cached))
+    return True, f"Built {image} ({cached}, {image_id[:19]})"
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the custom VPS Docker image")
+    parser.add_argument("--tag", default=VPS_IMAGE, help="Image name the bot uses (default: VPS_IMAGE)")
+    parser.add_argument("--force", action="store_true", help="Build even when the content hash is already tagged")
+    parser.add_argument("--pull", action="store_true", help="Pull a newer base image first")
+    parser.add_argument("--print-hash", action="store_true", help="Print the content hash and exit")
+    args = parser.parse_args()
+
+    if args.print_hash:
+        print(content_hash())
+        sys.exit(0)
+
     print("🚀 Building VPS Bot Docker Image")
     print("=" * 40)
-    
-    if build_custom_image():
-        print("\n✅ Build completed successfully!")
+
+    try:
+        success, message = build_custom_image(args.tag, force=args.force, pull=args.pull)
+    except Exception as e:
+        success, message = False, f"Error building Docker image: {e}"
+    if success:
+        print(f"\n✅ {message}")
         print("You can now create VPS instances with tmate pre-installed.")
     else:
-        print("\n❌ Build failed!")
+        print(f"\n❌ Build failed: {message}")
         print("Please check the error messages above.")
+        sys.exit(1)
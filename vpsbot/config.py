@@ -10,13 +10,103 @@ DISCORD_GUILD_ID = int(os.getenv('DISCORD_GUILD_ID', 0))
 # VPS Configuration
 UBUNTU_ISO_PATH = "/path/to/ubuntu-24.04.3-live-server-amd64.iso"  # Update this path
 CONTAINER_BASE_PATH = "/var/lib/vpsbot/containers"
-MAX_VPS_COUNT = 10  # Maximum number of VPS instances
+MAX_VPS_COUNT = int(os.getenv('MAX_VPS_COUNT', 10))  # Maximum number of VPS instances
 DEFAULT_VPS_PREFIX = "vps-"
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 50))  # Most VPSes one !create can ask for
+VPS_IMAGE = os.getenv('VPS_IMAGE', 'vpsbot-ubuntu:24.04')
+VERIFY_VPS_IMAGE = os.getenv('VERIFY_VPS_IMAGE', 'true').lower() == 'true'  # Drain nodes missing VPS_IMAGE at startup; turn off for registry images pulled on first use
+SNAPSHOT_REPO = os.getenv('SNAPSHOT_REPO', 'vpsbot-snapshot')  # Image repository !snapshot commits to, tagged with the snapshot name
 
 # Resource Limits
 MAX_RAM_GB = 32
 MAX_CPU_CORES = 16
 MAX_DISK_GB = 500
+RESIZE_MAX_USAGE = float(os.getenv('RESIZE_MAX_USAGE', 0.8))  # A VPS may only shrink to where current usage is at most this share of the new limit
+RAM_OVERCOMMIT_RATIO = float(os.getenv('RAM_OVERCOMMIT_RATIO', 1.0))  # Committed VPS RAM allowed per GB of host RAM
+CPU_OVERCOMMIT_RATIO = float(os.getenv('CPU_OVERCOMMIT_RATIO', 2.0))  # Committed VPS cores allowed per host core
+CPU_PINNING_CORES = os.getenv('CPU_PINNING_CORES', '')  # Host cores handed out exclusively to pinned VPSes, e.g. "8-15"; empty disables pinning
+DISK_OVERCOMMIT_RATIO = float(os.getenv('DISK_OVERCOMMIT_RATIO', 1.0))  # Committed VPS disk allowed per GB of host disk
+HOST_RESERVED_RAM_GB = float(os.getenv('HOST_RESERVED_RAM_GB', 2))  # RAM kept back for the host and Docker itself
+HOST_SAMPLE_INTERVAL = float(os.getenv('HOST_SAMPLE_INTERVAL', 5))  # Seconds between host resource samples
+HOST_HISTORY_SECONDS = int(os.getenv('HOST_HISTORY_SECONDS', 900))  # Host resource history kept for !resources
+STATS_HISTORY_SECONDS = int(os.getenv('STATS_HISTORY_SECONDS', 300))  # Per-VPS stats history kept for !top and !status
+
+# Disk Configuration
+DISK_QUOTA = os.getenv('DISK_QUOTA', 'none')  # "none", "loopback" (sparse ext4 image per VPS volume, local node only, bot runs as root) or "storage-opt" (root filesystem size, needs overlay2 on xfs with pquota)
+DISK_MBPS_PER_GB = float(os.getenv('DISK_MBPS_PER_GB', 2))  # Read and write bandwidth each VPS gets per GB of its disk; 0 disables
+DISK_IOPS_PER_GB = int(os.getenv('DISK_IOPS_PER_GB', 20))  # Read and write IOPS each VPS gets per GB of its disk; 0 disables
+DISK_IO_DEVICE = os.getenv('DISK_IO_DEVICE', '')  # Disk holding container root filesystems, e.g. /dev/sda; empty detects it on the local node
+STORAGE_OWNER = os.getenv('STORAGE_OWNER', '')  # uid:gid that owns /vps-storage inside each VPS (bot runs as root); empty keeps the bot's user
+STORAGE_GRACE_PERIOD = int(os.getenv('STORAGE_GRACE_PERIOD', 86400))  # Seconds a deleted VPS's volume is kept for !undelete; 0 reclaims right away
+STORAGE_RECLAIM_INTERVAL = int(os.getenv('STORAGE_RECLAIM_INTERVAL', 60))  # Seconds between passes of the background volume reclaimer
+
+# Network Configuration
+VPS_NETWORK = os.getenv('VPS_NETWORK', 'vpsbot')  # Bridge network VPSes are attached to, created if missing; empty keeps Docker's default bridge
+NET_EGRESS_MBIT_PER_CORE = float(os.getenv('NET_EGRESS_MBIT_PER_CORE', 0))  # Upload bandwidth each VPS gets per core (local node, bot runs as root); 0 leaves it unlimited
+NET_INGRESS_MBIT_PER_CORE = float(os.getenv('NET_INGRESS_MBIT_PER_CORE', 0))  # Download bandwidth each VPS gets per core (local node, bot runs as root); 0 leaves it unlimited
+
+# Metrics Configuration
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # Prometheus /metrics endpoint; 0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Tracing Configuration
+TRACE_MAX_VPS = int(os.getenv('TRACE_MAX_VPS', 500))  # Provisioning traces kept in memory for !trace
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')  # Append every span as a JSON line here; empty disables it
 
 # Tmate Configuration
 TMATE_SESSION_TIMEOUT = 3600  # 1 hour in seconds
+TMATE_READY_TIMEOUT = int(os.getenv('TMATE_READY_TIMEOUT', 120))  # Max wait for a new session to come up
+TMATE_RUNTIME_INSTALL = os.getenv('TMATE_RUNTIME_INSTALL', 'true').lower() == 'true'  # apt-get install tmate in images that don't ship it
+
+# Docker Backend Configuration
+DOCKER_BACKEND = os.getenv('DOCKER_BACKEND', 'engine')  # "engine" (native asyncio) or "dockerpy" (threaded)
+DOCKER_HOST = os.getenv('DOCKER_HOST', 'unix:///var/run/docker.sock')
+DOCKER_API_VERSION = os.getenv('DOCKER_API_VERSION', '1.41')
+DOCKER_NODES = os.getenv('DOCKER_NODES', '')  # name=url,name=url to spread VPSes over several daemons; empty uses DOCKER_HOST
+PLACEMENT_STRATEGY = os.getenv('PLACEMENT_STRATEGY', 'best-fit')  # "best-fit" (pack nodes) or "least-loaded" (spread)
+NODE_HEALTH_INTERVAL = int(os.getenv('NODE_HEALTH_INTERVAL', 15))  # Seconds between node pings
+NODE_MAX_FAILURES = int(os.getenv('NODE_MAX_FAILURES', 3))  # Failed pings before a node stops receiving VPSes
+DOCKER_ENGINE_POOL_SIZE = int(os.getenv('DOCKER_ENGINE_POOL_SIZE', 32))  # Keep-alive connections per daemon
+
+# Docker Executor Configuration (dockerpy backend)
+DOCKER_FAST_WORKERS = int(os.getenv('DOCKER_FAST_WORKERS', 8))  # Short API calls (get, stop, remove, list)
+DOCKER_SLOW_WORKERS = int(os.getenv('DOCKER_SLOW_WORKERS', 4))  # Long calls (container runs, apt installs)
+DOCKER_MAX_QUEUE = int(os.getenv('DOCKER_MAX_QUEUE', 64))  # Pending calls per lane before rejecting
+DOCKER_OP_TIMEOUT = 30  # Default per-operation timeout in seconds
+DOCKER_OP_TIMEOUTS = {
+    "containers.run": 120,
+    "containers.create": 60,
+    "exec_run": 60,
+    "exec_run.install": 900,
+    "container.stop": 30,
+    "container.remove": 60,
+    "container.commit": 600,
+    "images.remove": 120,
+}
+
+# State Cache Configuration
+STATE_RESYNC_INTERVAL = int(os.getenv('STATE_RESYNC_INTERVAL', 300))  # Full Docker resync as a safety net (seconds)
+# SQLite registry of VPS records and history; defaults to a path the bot's own user can write
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', os.path.join(
+    os.getenv('XDG_STATE_HOME') or os.path.expanduser('~/.local/state'), 'vpsbot', 'state.db'))
+
+# Job Queue Configuration
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 8))  # Lifecycle jobs running at once
+JOB_CREATE_CONCURRENCY = int(os.getenv('JOB_CREATE_CONCURRENCY', 3))  # Image/apt-heavy creates running at once
+JOB_LIMITS = {"create": JOB_CREATE_CONCURRENCY}  # Per-op caps below JOB_WORKERS
+JOB_PRIORITIES = {"delete": 0, "stop": 0, "restart": 10, "create": 10}  # Lower runs first; frees capacity before using it
+JOB_RETENTION_DAYS = 7  # Finished jobs kept for !jobs and the history
+
+# Idle Policy Configuration
+IDLE_PAUSE_AFTER = int(os.getenv('IDLE_PAUSE_AFTER', 0))  # Idle seconds before a VPS is paused; 0 (default) disables the policy
+IDLE_STOP_AFTER = int(os.getenv('IDLE_STOP_AFTER', TMATE_SESSION_TIMEOUT))  # Idle seconds before a paused VPS is stopped, which frees its RAM; 0 never stops
+IDLE_CPU_PERCENT = float(os.getenv('IDLE_CPU_PERCENT', 2))  # CPU use below this counts as idle
+IDLE_NET_KBPS = float(os.getenv('IDLE_NET_KBPS', 1))  # Network traffic (in + out) below this counts as idle
+IDLE_CHECK_INTERVAL = int(os.getenv('IDLE_CHECK_INTERVAL', 60))  # Seconds between idle checks, also the averaging window
+
+# Warm Pool Configuration
+WARM_POOL_ENABLED = os.getenv('WARM_POOL_ENABLED', 'true').lower() == 'true'
+WARM_POOL_SIZES = [(2, 1, 10), (8, 4, 30)]  # (ram_gb, cpu_cores, disk_gb) classes kept pre-started
+WARM_POOL_LOW_WATERMARK = 1  # Refill a class when fewer containers than this are ready
+WARM_POOL_HIGH_WATERMARK = 2  # Refill a class up to this many ready containers
+WARM_POOL_MAX_RESERVED_RAM_GB = int(os.getenv('WARM_POOL_MAX_RESERVED_RAM_GB', 16))
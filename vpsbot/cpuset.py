@@ -0,0 +1,136 @@
+import glob
+import os
+import re
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+NODE_SYSFS = "/sys/devices/system/node"
+
+def parse_cpulist(spec: str) -> List[int]:
+    """``0-3,8,10-11`` -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = set()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+def format_cpulist(cpus: Iterable[int]) -> str:
+    """[0, 1, 2, 3, 8] -> ``0-3,8``"""
+    parts = []
+    for start, end in _runs(sorted(set(cpus))):
+        parts.append(str(start) if start == end else f"{start}-{end}")
+    return ",".join(parts)
+
+def _runs(cpus: List[int]) -> List[Tuple[int, int]]:
+    """Contiguous (first, last) ranges of a sorted cpu list"""
+    runs = []
+    for cpu in cpus:
+        if runs and cpu == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], cpu)
+        else:
+            runs.append((cpu, cpu))
+    return runs
+
+def read_topology(path: str = NODE_SYSFS) -> Dict[int, List[int]]:
+    """Cores of each NUMA node of this host; one node holding every usable core without NUMA"""
+    topology = {}
+    for node_dir in glob.glob(os.path.join(path, "node[0-9]*")):
+        try:
+            with open(os.path.join(node_dir, "cpulist")) as f:
+                cpus = parse_cpulist(f.read())
+        except OSError:
+            continue
+        if cpus:
+            topology[int(re.sub(r"\D", "", os.path.basename(node_dir)))] = cpus
+    if not topology:
+        topology = {0: sorted(os.sched_getaffinity(0))}
+    return topology
+
+class CpusetAllocator:
+    """Hands out exclusive cores to pinned VPSes from a fixed set of host cores.
+
+    Only cores in ``pinnable`` are ever pinned; everything else is the
+    shared pool that unpinned VPSes float across, so both kinds coexist
+    without pinned VPSes getting noisy neighbors. An allocation stays on
+    one NUMA node when any node has room, picking the node with the
+    fewest free cores that still fits and, within it, the smallest
+    contiguous run that fits, so large holes stay available for large
+    requests.
+    """
+
+    def __init__(self, topology: Dict[int, List[int]], pinnable: Iterable[int]):
+        pinnable = set(pinnable)
+        self.topology = {numa: [cpu for cpu in cpus if cpu in pinnable] for numa, cpus in topology.items()}
+        self.topology = {numa: cpus for numa, cpus in self.topology.items() if cpus}
+        self.numa_of = {cpu: numa for numa, cpus in self.topology.items() for cpu in cpus}
+        self.shared = sorted(cpu for cpus in topology.values() for cpu in cpus if cpu not in pinnable)
+        self.allocations: Dict[Hashable, List[int]] = {}
+        self._used: Set[int] = set()
+
+    @property
+    def total(self) -> int:
+        return len(self.numa_of)
+
+    def free(self, numa: Optional[int] = None) -> List[int]:
+        cpus = self.topology.get(numa, []) if numa is not None else sorted(self.numa_of)
+        return [cpu for cpu in cpus if cpu not in self._used]
+
+    def can_allocate(self, cores: int) -> bool:
+        return len(self.free()) >= cores
+
+    def _pick(self, cores: int) -> Optional[List[int]]:
+        fitting = [numa for numa in self.topology if len(self.free(numa)) >= cores]
+        if not fitting:
+            # No single NUMA node has room; spread over the emptiest ones
+            free = sorted(self.topology, key=lambda numa: len(self.free(numa)), reverse=True)
+            cpus = [cpu for numa in free for cpu in self.free(numa)]
+            return cpus[:cores] if len(cpus) >= cores else None
+        numa = min(fitting, key=lambda numa: len(self.free(numa)))
+        free = self.free(numa)
+        runs = [(start, end) for start, end in _runs(free) if end - start + 1 >= cores]
+        if runs:
+            start, _ = min(runs, key=lambda run: run[1] - run[0])
+            return list(range(start, start + cores))
+        return free[:cores]
+
+    def allocate(self, key: Hashable, cores: int) -> Optional[Tuple[str, Optional[str]]]:
+        """Reserve cores for a VPS; returns (cpuset_cpus, cpuset_mems) or None when they don't fit"""
+        cpus = self._pick(cores)
+        if cpus is None:
+            return None
+        self.allocations[key] = cpus
+        self._used.update(cpus)
+        return self.describe(key)
+
+    def claim(self, key: Hashable, cpuset: str) -> bool:
+        """Take over the cores of an existing pinned container; False if any is unknown or taken"""
+        cpus = parse_cpulist(cpuset)
+        if self.allocations.get(key) == cpus:
+            return True
+        if not cpus or any(cpu not in self.numa_of or cpu in self._used for cpu in cpus):
+            return False
+        self.allocations[key] = cpus
+        self._used.update(cpus)
+        return True
+
+    def release(self, key: Hashable):
+        self._used.difference_update(self.allocations.pop(key, []))
+
+    def describe(self, key: Hashable) -> Tuple[str, Optional[str]]:
+        """cpuset_cpus and cpuset_mems of an allocation; mems only where the host has several NUMA nodes"""
+        cpus = self.allocations[key]
+        mems = None
+        if len(self.topology) > 1:
+            mems = format_cpulist({self.numa_of[cpu] for cpu in cpus})
+        return format_cpulist(cpus), mems
+
+    def stats(self) -> Dict:
+        free = self.free()
+        return {
+            "pinnable": self.total,
+            "used": len(self._used),
+            "allocations": len(self.allocations),
+            "shared": format_cpulist(self.shared),
+            # Fragmentation shows as a largest hole much smaller than the free total
+            "largest_free_run": max((end - start + 1 for start, end in _runs(free)), default=0),
+            "free_by_numa": {numa: len(self.free(numa)) for numa in self.topology},
+        }
@@ -0,0 +1,389 @@
+import asyncio
+import functools
+import io
+import tarfile
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from docker_executor import DockerExecutor, OperationStats
+
+class DockerAPIError(Exception):
+    """Raised when the Docker daemon rejects a request"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+class DockerNotFound(DockerAPIError):
+    """Raised when a container, exec or image does not exist"""
+
+@dataclass
+class ContainerSpec:
+    """Everything the manager needs to create and start a VPS container"""
+    name: str
+    image: str
+    mem_limit: int  # bytes
+    cpu_quota: int
+    cpu_period: int = 100000
+    cpuset_cpus: Optional[str] = None  # e.g. "4-7"; None lets the container run on any core
+    cpuset_mems: Optional[str] = None  # NUMA nodes to allocate memory from
+    network: Optional[str] = None  # None keeps Docker's default bridge
+    storage_size: Optional[str] = None  # Root filesystem size, e.g. "30G"; needs overlay2 on xfs with pquota
+    # Block I/O limits: device path -> bytes or operations per second
+    device_read_bps: Dict[str, int] = field(default_factory=dict)
+    device_write_bps: Dict[str, int] = field(default_factory=dict)
+    device_read_iops: Dict[str, int] = field(default_factory=dict)
+    device_write_iops: Dict[str, int] = field(default_factory=dict)
+    privileged: bool = True
+    labels: Dict[str, str] = field(default_factory=dict)
+    binds: Dict[str, str] = field(default_factory=dict)  # host path -> container path
+    command: Optional[List[str]] = None  # None keeps the image CMD
+
+@dataclass
+class ExecResult:
+    exit_code: int
+    output: bytes
+
+def extract_file(archive: bytes) -> Optional[bytes]:
+    """Contents of the single file in a container archive (tar) response"""
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        for member in tar:
+            if member.isfile():
+                return tar.extractfile(member).read()
+    return None
+
+def memswap_limit(mem_limit: int) -> int:
+    """Memory plus swap for a resized VPS: twice its memory, which is what Docker
+    gives a container created with a memory limit and no swap limit"""
+    return mem_limit * 2
+
+def container_name(summary: Dict) -> str:
+    """Name of a container from a list entry (``/vps-1`` -> ``vps-1``)"""
+    names = summary.get("Names") or [""]
+    return names[0].lstrip("/")
+
+class DockerBackend:
+    """Async interface to one Docker daemon.
+
+    Containers are described with Engine API shaped dicts: ``list_containers``
+    returns the ``/containers/json`` form and ``inspect_container`` the
+    ``/containers/{id}/json`` form, whichever implementation is in use.
+    Every implementation records its API calls in ``op_stats``.
+    """
+
+    op_stats: OperationStats
+
+    async def ping(self) -> bool:
+        raise NotImplementedError
+
+    async def info(self) -> Dict:
+        raise NotImplementedError
+
+    async def list_containers(self, labels: Optional[List[str]] = None, all: bool = True) -> List[Dict]:
+        raise NotImplementedError
+
+    async def create_container(self, spec: ContainerSpec) -> str:
+        """Create (but don't start) a container, returning its id"""
+        raise NotImplementedError
+
+    async def start_container(self, container_id: str):
+        raise NotImplementedError
+
+    async def inspect_container(self, container_id: str) -> Dict:
+        raise NotImplementedError
+
+    async def exec(self, container_id: str, cmd: str, detach: bool = False, op: str = "exec_run",
+                   timeout: Optional[float] = None) -> ExecResult:
+        """Run cmd through /bin/sh inside the container"""
+        raise NotImplementedError
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        raise NotImplementedError
+
+    async def remove_container(self, container_id: str, force: bool = True):
+        raise NotImplementedError
+
+    async def pause_container(self, container_id: str):
+        """Freeze every process of a container; its memory stays allocated"""
+        raise NotImplementedError
+
+    async def unpause_container(self, container_id: str):
+        raise NotImplementedError
+
+    async def inspect_image(self, image: str) -> Dict:
+        raise NotImplementedError
+
+    async def list_images(self, labels: Optional[List[str]] = None) -> List[Dict]:
+        """Images in the ``/images/json`` form, optionally filtered by label"""
+        raise NotImplementedError
+
+    async def commit_container(self, container_id: str, repository: str, tag: str,
+                               labels: Optional[Dict[str, str]] = None, pause: bool = True) -> str:
+        """Save a container's filesystem as a new image on top of its own, returning the image id"""
+        raise NotImplementedError
+
+    async def remove_image(self, image: str, force: bool = False):
+        raise NotImplementedError
+
+    async def inspect_network(self, name: str) -> Dict:
+        raise NotImplementedError
+
+    async def create_network(self, name: str, labels: Optional[Dict[str, str]] = None,
+                             options: Optional[Dict[str, str]] = None):
+        """Create a bridge network"""
+        raise NotImplementedError
+
+    async def read_file(self, container_id: str, path: str) -> Optional[bytes]:
+        """Read one file out of a container without running a process in it"""
+        raise NotImplementedError
+
+    async def rename_container(self, container_id: str, name: str):
+        raise NotImplementedError
+
+    async def update_container(self, container_id: str, mem_limit: Optional[int] = None,
+                               cpu_quota: Optional[int] = None, cpuset_cpus: Optional[str] = None,
+                               cpuset_mems: Optional[str] = None):
+        """Change resource limits of a running container in place"""
+        raise NotImplementedError
+
+    def stats(self, container_id: str) -> AsyncIterator[Dict]:
+        """Stream stats samples for a container until the caller stops iterating"""
+        raise NotImplementedError
+
+    def events(self, labels: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Stream daemon events, optionally filtered by container label"""
+        raise NotImplementedError
+
+    def stats_summary(self) -> Dict:
+        """Queue depth and per-operation latency statistics"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class DockerPyBackend(DockerBackend):
+    """docker-py client driven through the bounded DockerExecutor"""
+
+    def __init__(self, executor: DockerExecutor, base_url: Optional[str] = None):
+        import docker
+        self._docker = docker
+        self.client = docker.DockerClient(base_url=base_url) if base_url else docker.from_env()
+        self.api = self.client.api
+        self.executor = executor
+        self.op_stats = executor.op_stats
+
+    async def _call(self, op: str, func: Callable, *args, lane: str = "fast", **kwargs):
+        try:
+            return await self.executor.run(op, func, *args, lane=lane, **kwargs)
+        except self._docker.errors.NotFound as e:
+            raise DockerNotFound(404, str(e.explanation or e)) from e
+        except self._docker.errors.APIError as e:
+            raise DockerAPIError(e.status_code or 500, str(e.explanation or e)) from e
+
+    async def ping(self) -> bool:
+        return await self._call("ping", self.api.ping)
+
+    async def info(self) -> Dict:
+        return await self._call("info", self.api.info)
+
+    async def list_containers(self, labels: Optional[List[str]] = None, all: bool = True) -> List[Dict]:
+        filters = {"label": labels} if labels else None
+        return await self._call("containers.list", self.api.containers, all=all, filters=filters)
+
+    async def create_container(self, spec: ContainerSpec) -> str:
+        def create():
+            kwargs = dict(
+                image=spec.image,
+                name=spec.name,
+                detach=True,
+                privileged=spec.privileged,
+                mem_limit=spec.mem_limit,
+                cpu_quota=spec.cpu_quota,
+                cpu_period=spec.cpu_period,
+                cpuset_cpus=spec.cpuset_cpus,
+                cpuset_mems=spec.cpuset_mems,
+                volumes={host: {"bind": bind, "mode": "rw"} for host, bind in spec.binds.items()},
+                labels=spec.labels,
+                command=spec.command
+            )
+            if spec.network:
+                kwargs["network"] = spec.network
+            if spec.storage_size:
+                kwargs["storage_opt"] = {"size": spec.storage_size}
+            for limit in ("device_read_bps", "device_write_bps", "device_read_iops", "device_write_iops"):
+                devices = getattr(spec, limit)
+                if devices:
+                    kwargs[limit] = [{"Path": path, "Rate": rate} for path, rate in devices.items()]
+            try:
+                return self.client.containers.create(**kwargs)
+            except self._docker.errors.ImageNotFound:
+                # Same fallback as containers.run
+                self.client.images.pull(spec.image)
+                return self.client.containers.create(**kwargs)
+
+        container = await self._call("containers.create", create, lane="slow")
+        return container.id
+
+    async def start_container(self, container_id: str):
+        await self._call("containers.run", self.api.start, container_id, lane="slow")
+
+    async def inspect_container(self, container_id: str) -> Dict:
+        return await self._call("containers.inspect", self.api.inspect_container, container_id)
+
+    async def exec(self, container_id: str, cmd: str, detach: bool = False, op: str = "exec_run",
+                   timeout: Optional[float] = None) -> ExecResult:
+        lane = "slow" if op.endswith(".install") else "fast"
+
+        def run():
+            exec_id = self.api.exec_create(container_id, ["/bin/sh", "-c", cmd], stdout=True, stderr=True)["Id"]
+            output = self.api.exec_start(exec_id, detach=detach)
+            exit_code = 0 if detach else self.api.exec_inspect(exec_id).get("ExitCode") or 0
+            return ExecResult(exit_code=exit_code, output=output or b"")
+
+        return await self._call(op, run, lane=lane, timeout=timeout)
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        # Bind the stop grace period; a bare timeout= would be taken as the executor timeout
+        stop = functools.partial(self.api.stop, container_id, timeout=timeout)
+        await self._call("container.stop", stop, timeout=timeout + self.executor.timeouts.get("container.stop", 30))
+
+    async def remove_container(self, container_id: str, force: bool = True):
+        await self._call("container.remove", self.api.remove_container, container_id, force=force)
+
+    async def pause_container(self, container_id: str):
+        await self._call("container.pause", self.api.pause, container_id)
+
+    async def unpause_container(self, container_id: str):
+        await self._call("container.unpause", self.api.unpause, container_id)
+
+    async def inspect_image(self, image: str) -> Dict:
+        return await self._call("images.inspect", self.api.inspect_image, image)
+
+    async def list_images(self, labels: Optional[List[str]] = None) -> List[Dict]:
+        filters = {"label": labels} if labels else None
+        return await self._call("images.list", self.api.images, filters=filters)
+
+    async def commit_container(self, container_id: str, repository: str, tag: str,
+                               labels: Optional[Dict[str, str]] = None, pause: bool = True) -> str:
+        result = await self._call("container.commit", self.api.commit, container_id, repository=repository,
+                                  tag=tag, conf={"Labels": labels or {}}, pause=pause, lane="slow")
+        return result["Id"]
+
+    async def remove_image(self, image: str, force: bool = False):
+        await self._call("images.remove", self.api.remove_image, image, force=force)
+
+    async def inspect_network(self, name: str) -> Dict:
+        return await self._call("networks.inspect", self.api.inspect_network, name)
+
+    async def create_network(self, name: str, labels: Optional[Dict[str, str]] = None,
+                             options: Optional[Dict[str, str]] = None):
+        await self._call("networks.create", self.api.create_network, name, driver="bridge",
+                         labels=labels, options=options, check_duplicate=True)
+
+    async def read_file(self, container_id: str, path: str) -> Optional[bytes]:
+        def read():
+            stream, _ = self.api.get_archive(container_id, path)
+            return b"".join(stream)
+
+        try:
+            archive = await self._call("containers.archive", read)
+        except DockerNotFound:
+            return None
+        return extract_file(archive)
+
+    async def rename_container(self, container_id: str, name: str):
+        await self._call("container.rename", self.api.rename, container_id, name)
+
+    async def update_container(self, container_id: str, mem_limit: Optional[int] = None,
+                               cpu_quota: Optional[int] = None, cpuset_cpus: Optional[str] = None,
+                               cpuset_mems: Optional[str] = None):
+        kwargs = {}
+        if mem_limit is not None:
+            # Both at once: Docker rejects a memory limit above the current swap limit
+            kwargs.update(mem_limit=mem_limit, memswap_limit=memswap_limit(mem_limit))
+        if cpu_quota is not None:
+            kwargs["cpu_quota"] = cpu_quota
+        if cpuset_cpus is not None:
+            kwargs["cpuset_cpus"] = cpuset_cpus
+        if cpuset_mems is not None:
+            kwargs["cpuset_mems"] = cpuset_mems
+        await self._call("container.update", self.api.update_container, container_id, **kwargs)
+
+    def stats(self, container_id: str) -> AsyncIterator[Dict]:
+        return _stream_in_thread(lambda: self.api.stats(container_id, decode=True, stream=True))
+
+    def events(self, labels: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        filters = {"label": labels} if labels else None
+        return _stream_in_thread(lambda: self.api.events(filters=filters, decode=True))
+
+    def stats_summary(self) -> Dict:
+        return self.executor.stats()
+
+    async def close(self):
+        self.executor.shutdown()
+        self.client.close()
+
+async def _stream_in_thread(factory: Callable[[], Iterator[Dict]]) -> AsyncIterator[Dict]:
+    """Iterate a blocking docker-py generator on its own thread.
+
+    Streams live for minutes or hours, so they get a dedicated daemon thread
+    instead of occupying a slot in the bounded executor.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        if not stopped.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def pump():
+        try:
+            generator = factory()
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    put(item)
+            finally:
+                close = getattr(generator, "close", None)
+                if close:
+                    close()
+        except Exception as e:
+            put(e)
+        put(done)
+
+    threading.Thread(target=pump, name="docker-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+def make_backend(url: Optional[str] = None, kind: Optional[str] = None) -> DockerBackend:
+    """Create the configured backend for a Docker endpoint"""
+    from config import (DOCKER_BACKEND, DOCKER_FAST_WORKERS, DOCKER_SLOW_WORKERS, DOCKER_MAX_QUEUE,
+                        DOCKER_OP_TIMEOUT, DOCKER_OP_TIMEOUTS)
+
+    kind = kind or DOCKER_BACKEND
+    if kind == "engine":
+        from docker_engine import EngineAPIBackend
+        return EngineAPIBackend(url)
+    if kind == "dockerpy":
+        executor = DockerExecutor(
+            fast_workers=DOCKER_FAST_WORKERS,
+            slow_workers=DOCKER_SLOW_WORKERS,
+            max_queue=DOCKER_MAX_QUEUE,
+            default_timeout=DOCKER_OP_TIMEOUT,
+            timeouts=DOCKER_OP_TIMEOUTS
+        )
+        return DockerPyBackend(executor, url)
+    raise ValueError(f"Unknown Docker backend: {kind}")
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import struct
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from config import DOCKER_API_VERSION, DOCKER_ENGINE_POOL_SIZE, DOCKER_OP_TIMEOUT, DOCKER_OP_TIMEOUTS
+from docker_backend import (ContainerSpec, DockerAPIError, DockerBackend, DockerNotFound, ExecResult, extract_file,
+                            memswap_limit)
+from docker_executor import OperationStats
+
+DEFAULT_SOCKET = "unix:///var/run/docker.sock"
+# Content types of stdout/stderr framed streams; Engine API 1.42+ answers non-TTY exec with the second
+MULTIPLEXED_TYPES = ("application/vnd.docker.raw-stream", "application/vnd.docker.multiplexed-stream")
+
+class EngineAPIBackend(DockerBackend):
+    """Native asyncio client for the Docker Engine API.
+
+    Request/response calls share one keep-alive connection pool. Long-lived
+    streams (events, stats) use a separate unbounded connector so hundreds
+    of them can never starve ordinary requests of connections.
+
+    ``url`` may be ``unix:///path/to/docker.sock``, ``tcp://host:port`` or
+    ``http://host:port``; the latter lets a fake Engine API server stand in
+    for the daemon.
+    """
+
+    def __init__(self, url: Optional[str] = None, pool_size: int = DOCKER_ENGINE_POOL_SIZE,
+                 api_version: str = DOCKER_API_VERSION):
+        self.url = url or DEFAULT_SOCKET
+        self.pool_size = pool_size
+        self.prefix = f"/v{api_version}"
+        if self.url.startswith("unix://"):
+            self._socket_path = self.url[len("unix://"):]
+            self._base = "http://docker"
+        else:
+            self._socket_path = None
+            self._base = self.url.replace("tcp://", "http://", 1).rstrip("/")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stream_session: Optional[aiohttp.ClientSession] = None
+        self.op_stats = OperationStats()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.open_streams = 0
+
+    def _connector(self, limit: int) -> aiohttp.BaseConnector:
+        if self._socket_path:
+            return aiohttp.UnixConnector(path=self._socket_path, limit=limit, keepalive_timeout=60)
+        return aiohttp.TCPConnector(limit=limit, keepalive_timeout=60)
+
+    def _sessions(self):
+        # Created lazily so the backend can be built before the event loop runs
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=self._connector(self.pool_size),
+                                                  timeout=aiohttp.ClientTimeout(total=None))
+            self._stream_session = aiohttp.ClientSession(connector=self._connector(0),
+                                                         timeout=aiohttp.ClientTimeout(total=None, sock_connect=10))
+        return self._session, self._stream_session
+
+    def _url(self, path: str) -> str:
+        return f"{self._base}{self.prefix}{path}"
+
+    @staticmethod
+    async def _raise_for_status(resp: aiohttp.ClientResponse):
+        if resp.status < 400:
+            return
+        try:
+            message = (await resp.json(content_type=None)).get("message", "")
+        except Exception:
+            message = await resp.text()
+        if resp.status == 404:
+            raise DockerNotFound(resp.status, message)
+        raise DockerAPIError(resp.status, message)
+
+    async def _request(self, op: str, method: str, path: str, params: Optional[Dict] = None,
+                       body: Optional[Dict] = None, timeout: Optional[float] = None, raw: bool = False):
+        session, _ = self._sessions()
+        timeout = timeout or DOCKER_OP_TIMEOUTS.get(op, DOCKER_OP_TIMEOUT)
+
+        async def send():
+            async with session.request(method, self._url(path), params=params, json=body) as resp:
+                await self._raise_for_status(resp)
+                if raw:
+                    if resp.content_type in MULTIPLEXED_TYPES:
+                        return await read_frames(resp.content)
+                    return await resp.read()
+                if resp.status == 204 or resp.content_length == 0:
+                    return None
+                return await resp.json(content_type=None)
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            data = await asyncio.wait_for(send(), timeout)
+            outcome = "ok"
+            return data
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            self.in_flight -= 1
+            self.op_stats.record(op, outcome, time.monotonic() - started)
+
+    async def _stream(self, op: str, path: str, params: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """Yield JSON messages from a streaming endpoint as they arrive"""
+        _, session = self._sessions()
+        self.open_streams += 1
+        try:
+            async with session.get(self._url(path), params=params) as resp:
+                await self._raise_for_status(resp)
+                buffer = b""
+                async for chunk in resp.content.iter_any():
+                    buffer += chunk
+                    while b"\n" in buffer:
+                        line, buffer = buffer.split(b"\n", 1)
+                        if line.strip():
+                            yield json.loads(line)
+        finally:
+            self.open_streams -= 1
+
+    async def ping(self) -> bool:
+        return await self._request("ping", "GET", "/_ping", raw=True) == b"OK"
+
+    async def info(self) -> Dict:
+        return await self._request("info", "GET", "/info")
+
+    async def list_containers(self, labels: Optional[List[str]] = None, all: bool = True) -> List[Dict]:
+        params = {"all": "1" if all else "0"}
+        if labels:
+            params["filters"] = json.dumps({"label": labels})
+        return await self._request("containers.list", "GET", "/containers/json", params=params)
+
+    async def create_container(self, spec: ContainerSpec) -> str:
+        body = {
+            "Image": spec.image,
+            "Labels": spec.labels,
+            "HostConfig": {
+                "Privileged": spec.privileged,
+                "Memory": spec.mem_limit,
+                "CpuQuota": spec.cpu_quota,
+                "CpuPeriod": spec.cpu_period,
+                "CpusetCpus": spec.cpuset_cpus or "",
+                "CpusetMems": spec.cpuset_mems or "",
+                "Binds": [f"{host}:{bind}:rw" for host, bind in spec.binds.items()],
+            },
+        }
+        if spec.command is not None:
+            body["Cmd"] = spec.command
+        if spec.network:
+            body["HostConfig"]["NetworkMode"] = spec.network
+        if spec.storage_size:
+            body["HostConfig"]["StorageOpt"] = {"size": spec.storage_size}
+        for key, devices in (("BlkioDeviceReadBps", spec.device_read_bps), ("BlkioDeviceWriteBps", spec.device_write_bps),
+                             ("BlkioDeviceReadIOps", spec.device_read_iops),
+                             ("BlkioDeviceWriteIOps", spec.device_write_iops)):
+            if devices:
+                body["HostConfig"][key] = [{"Path": path, "Rate": rate} for path, rate in devices.items()]
+        created = await self._request("containers.create", "POST", "/containers/create",
+                                      params={"name": spec.name}, body=body)
+        return created["Id"]
+
+    async def start_container(self, container_id: str):
+        await self._request("containers.run", "POST", f"/containers/{quote(container_id)}/start")
+
+    async def inspect_container(self, container_id: str) -> Dict:
+        return await self._request("containers.inspect", "GET", f"/containers/{quote(container_id)}/json")
+
+    async def exec(self, container_id: str, cmd: str, detach: bool = False, op: str = "exec_run",
+                   timeout: Optional[float] = None) -> ExecResult:
+        created = await self._request("exec.create", "POST", f"/containers/{quote(container_id)}/exec", body={
+            "AttachStdout": not detach,
+            "AttachStderr": not detach,
+            "Cmd": ["/bin/sh", "-c", cmd],
+        })
+        exec_id = created["Id"]
+        if detach:
+            await self._request(op, "POST", f"/exec/{exec_id}/start", body={"Detach": True, "Tty": False})
+            return ExecResult(exit_code=0, output=b"")
+
+        raw = await self._request(op, "POST", f"/exec/{exec_id}/start",
+                                  body={"Detach": False, "Tty": False}, raw=True, timeout=timeout)
+        inspect = await self._request("exec.inspect", "GET", f"/exec/{exec_id}/json")
+        return ExecResult(exit_code=inspect.get("ExitCode") or 0, output=raw)
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        await self._request("container.stop", "POST", f"/containers/{quote(container_id)}/stop",
+                            params={"t": str(timeout)}, timeout=timeout + DOCKER_OP_TIMEOUTS.get("container.stop", DOCKER_OP_TIMEOUT))
+
+    async def remove_container(self, container_id: str, force: bool = True):
+        await self._request("container.remove", "DELETE", f"/containers/{quote(container_id)}",
+                            params={"force": "1" if force else "0"})
+
+    async def pause_container(self, container_id: str):
+        await self._request("container.pause", "POST", f"/containers/{quote(container_id)}/pause")
+
+    async def unpause_container(self, container_id: str):
+        await self._request("container.unpause", "POST", f"/containers/{quote(container_id)}/unpause")
+
+    async def inspect_image(self, image: str) -> Dict:
+        return await self._request("images.inspect", "GET", f"/images/{image}/json")
+
+    async def list_images(self, labels: Optional[List[str]] = None) -> List[Dict]:
+        params = {"filters": json.dumps({"label": labels})} if labels else None
+        return await self._request("images.list", "GET", "/images/json", params=params)
+
+    async def commit_container(self, container_id: str, repository: str, tag: str,
+                               labels: Optional[Dict[str, str]] = None, pause: bool = True) -> str:
+        # The body is the image config; anything left out is inherited from the container
+        result = await self._request("container.commit", "POST", "/commit", params={
+            "container": container_id, "repo": repository, "tag": tag, "pause": "1" if pause else "0",
+        }, body={"Labels": labels or {}})
+        return result["Id"]
+
+    async def remove_image(self, image: str, force: bool = False):
+        await self._request("images.remove", "DELETE", f"/images/{image}", params={"force": "1" if force else "0"})
+
+    async def inspect_network(self, name: str) -> Dict:
+        return await self._request("networks.inspect", "GET", f"/networks/{quote(name)}")
+
+    async def create_network(self, name: str, labels: Optional[Dict[str, str]] = None,
+                             options: Optional[Dict[str, str]] = None):
+        await self._request("networks.create", "POST", "/networks/create", body={
+            "Name": name, "Driver": "bridge", "CheckDuplicate": True,
+            "Labels": labels or {}, "Options": options or {},
+        })
+
+    async def read_file(self, container_id: str, path: str) -> Optional[bytes]:
+        try:
+            archive = await self._request("containers.archive", "GET", f"/containers/{quote(container_id)}/archive",
+                                          params={"path": path}, raw=True)
+        except DockerNotFound:
+            return None
+        return extract_file(archive)
+
+    async def rename_container(self, container_id: str, name: str):
+        await self._request("container.rename", "POST", f"/containers/{quote(container_id)}/rename",
+                            params={"name": name})
+
+    async def update_container(self, container_id: str, mem_limit: Optional[int] = None,
+                               cpu_quota: Optional[int] = None, cpuset_cpus: Optional[str] = None,
+                               cpuset_mems: Optional[str] = None):
+        body = {}
+        if mem_limit is not None:
+            # Both at once: Docker rejects a memory limit above the current swap limit
+            body.update(Memory=mem_limit, MemorySwap=memswap_limit(mem_limit))
+        if cpu_quota is not None:
+            body["CpuQuota"] = cpu_quota
+        if cpuset_cpus is not None:
+            body["CpusetCpus"] = cpuset_cpus
+        if cpuset_mems is not None:
+            body["CpusetMems"] = cpuset_mems
+        await self._request("container.update", "POST", f"/containers/{quote(container_id)}/update", body=body)
+
+    def stats(self, container_id: str) -> AsyncIterator[Dict]:
+        return self._stream("containers.stats", f"/containers/{quote(container_id)}/stats", params={"stream": "1"})
+
+    def events(self, labels: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        filters = {"type": ["container"]}
+        if labels:
+            filters["label"] = labels
+        return self._stream("events", "/events", params={"filters": json.dumps(filters)})
+
+    def stats_summary(self) -> Dict:
+        return {
+            "lanes": {
+                "engine": {
+                    "workers": self.pool_size,
+                    "running": min(self.in_flight, self.pool_size),
+                    "queued": max(0, self.in_flight - self.pool_size),
+                    "peak_queued": max(0, self.peak_in_flight - self.pool_size),
+                },
+                "streams": {"workers": self.open_streams, "running": self.open_streams, "queued": 0, "peak_queued": 0},
+            },
+            "operations": self.op_stats.snapshot(),
+        }
+
+    async def close(self):
+        for session in (self._session, self._stream_session):
+            if session is not None:
+                await session.close()
+        self._session = self._stream_session = None
+
+async def read_frames(stream: aiohttp.StreamReader) -> bytes:
+    """Read a non-TTY attach stream frame by frame, joining stdout and stderr"""
+    out = bytearray()
+    while True:
+        try:
+            header = await stream.readexactly(8)
+        except asyncio.IncompleteReadError as e:
+            # Plain (TTY) output has no frame headers
+            out += e.partial
+            return bytes(out)
+        stream_type, length = struct.unpack(">BxxxL", header)
+        if stream_type not in (0, 1, 2):
+            out += header + await stream.read()
+            return bytes(out)
+        out += await stream.readexactly(length)
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import Histogram
+
+class DockerOperationTimeout(Exception):
+    """Raised when a Docker operation does not finish within its timeout"""
+
+class DockerExecutorFull(Exception):
+    """Raised when the executor queue is full and cannot accept more work"""
+
+class OperationStats:
+    """Per-operation call counts and latency totals"""
+
+    def __init__(self):
+        self.ops: Dict[str, Dict[str, float]] = {}
+        self.latency: Dict[str, Histogram] = {}
+
+    def record(self, op: str, outcome: str, elapsed: float):
+        stats = self.ops.get(op)
+        if stats is None:
+            # Only the first call of an operation allocates
+            stats = self.ops[op] = {"calls": 0, "errors": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            self.latency[op] = Histogram()
+        self.latency[op].observe(elapsed)
+        stats["calls"] += 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+        if outcome == "error":
+            stats["errors"] += 1
+        elif outcome == "timeout":
+            stats["timeouts"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {op: dict(stats) for op, stats in self.ops.items()}
+
+class _Lane:
+    """A bounded thread pool with its own queue accounting"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"docker-{name}")
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+
+class DockerExecutor:
+    """Runs blocking docker-py calls off the event loop.
+
+    Work is split into a "fast" lane for short API calls (get, stop, remove,
+    list) and a "slow" lane for long-running calls (image runs, apt installs
+    inside exec_run) so a slow provisioning step can never starve the calls
+    that every other command depends on.
+    """
+
+    def __init__(self, fast_workers: int = 8, slow_workers: int = 4,
+                 max_queue: int = 64, default_timeout: float = 30,
+                 timeouts: Optional[Dict[str, float]] = None):
+        self._lanes = {
+            "fast": _Lane("fast", fast_workers, max_queue),
+            "slow": _Lane("slow", slow_workers, max_queue),
+        }
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.op_stats = OperationStats()
+
+    async def run(self, op: str, func: Callable[..., Any], *args, lane: str = "fast",
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the given lane with a per-operation timeout"""
+        pool = self._lanes[lane]
+        if pool.queued + pool.running >= pool.max_workers + pool.max_queue:
+            raise DockerExecutorFull(f"Docker {lane} queue is full ({pool.queued} waiting)")
+
+        if timeout is None:
+            timeout = self.timeouts.get(op, self.default_timeout)
+
+        pool.queued += 1
+        pool.peak_queued = max(pool.peak_queued, pool.queued)
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+
+        def call():
+            # Runs in the worker thread; counters are only touched from the loop
+            loop.call_soon_threadsafe(self._started, pool)
+            return func(*args, **kwargs)
+
+        future = loop.run_in_executor(pool.pool, call)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            # The thread cannot be interrupted; it keeps its slot until the call returns
+            future.add_done_callback(lambda f: self._finished(pool, f))
+            self.op_stats.record(op, "timeout", time.monotonic() - submitted)
+            raise DockerOperationTimeout(f"Docker operation '{op}' timed out after {timeout}s")
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: self._finished(pool, f))
+            raise
+        except Exception:
+            self._finished(pool, future)
+            self.op_stats.record(op, "error", time.monotonic() - submitted)
+            raise
+        self._finished(pool, future)
+        self.op_stats.record(op, "ok", time.monotonic() - submitted)
+        return result
+
+    def _started(self, pool: _Lane):
+        pool.queued -= 1
+        pool.running += 1
+
+    def _finished(self, pool: _Lane, future: asyncio.Future):
+        if future.cancelled():
+            # Never reached a worker thread
+            pool.queued -= 1
+            return
+        pool.running -= 1
+        # Retrieve the exception so abandoned calls don't log "never retrieved"
+        future.exception()
+
+    def stats(self) -> Dict:
+        """Queue depth and per-operation latency statistics"""
+        return {
+            "lanes": {
+                name: {
+                    "workers": lane.max_workers,
+                    "queued": lane.queued,
+                    "running": lane.running,
+                    "peak_queued": lane.peak_queued,
+                }
+                for name, lane in self._lanes.items()
+            },
+            "operations": self.op_stats.snapshot(),
+        }
+
+    def shutdown(self):
+        for lane in self._lanes.values():
+            lane.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Fake Docker Engine API server for local testing and benchmarks
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import re
+import struct
+import tarfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+TMATE_DISPLAY = re.compile(r"tmate .*display -p")
+
+class FakeContainer:
+    def __init__(self, name: str, body: Dict):
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex
+        self.name = name
+        self.image = body.get("Image", "")
+        self.labels = body.get("Labels") or {}
+        self.host_config = body.get("HostConfig") or {}
+        self.cmd = body.get("Cmd")
+        self.status = "created"
+        self.created = int(time.time())
+        self.started_at = None
+        self.starts = 0
+        # Idle containers stop using CPU and network
+        self.busy = True
+
+    @property
+    def tmate_session(self) -> str:
+        """A new session on every start, like a real /start.sh"""
+        return f"ssh {self.id[:16]}{self.starts:08x}@nyc1.tmate.io"
+
+    def summary(self) -> Dict:
+        return {
+            "Id": self.id,
+            "Names": [f"/{self.name}"],
+            "Image": self.image,
+            "Labels": self.labels,
+            "State": self.status,
+            "Status": self.status,
+            "Created": self.created,
+        }
+
+    def inspect(self) -> Dict:
+        return {
+            "Id": self.id,
+            "Name": f"/{self.name}",
+            "Created": self.created,
+            "Config": {"Image": self.image, "Labels": self.labels, "Cmd": self.cmd},
+            "HostConfig": self.host_config,
+            "State": {
+                "Status": self.status,
+                "Running": self.status == "running",
+                "Paused": self.status == "paused",
+                "OOMKilled": False,
+                "StartedAt": self.started_at,
+            },
+        }
+
+class FakeDockerDaemon:
+    """In-memory Docker daemon speaking enough of the Engine API for VPSManager.
+
+    Serve it over TCP (``http://127.0.0.1:<port>``) or a unix socket and point
+    ``DOCKER_HOST`` at it.
+
+    Every call waits ``latency`` seconds (plus up to ``jitter``) before it is
+    answered and fails with a 500 with probability ``failure_rate``.
+    ``op_latency`` overrides the latency of single routes, keyed like
+    ``"POST /containers/{id}/start"``. Streams only get the latency.
+    ``stream_type`` is the content type of exec output; Engine API 1.42+
+    daemons send ``application/vnd.docker.multiplexed-stream``.
+    """
+
+    def __init__(self, mem_total: int = 32 * 1024 ** 3, ncpu: int = 16, latency: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, op_latency: Optional[Dict[str, float]] = None,
+                 stream_type: str = "application/vnd.docker.raw-stream"):
+        self.containers: Dict[str, FakeContainer] = {}
+        self.execs: Dict[str, Dict] = {}
+        self.networks: Dict[str, Dict] = {}
+        # Committed images by repo:tag
+        self.images: Dict[str, Dict] = {}
+        self.mem_total = mem_total
+        self.ncpu = ncpu
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.op_latency = op_latency or {}
+        self.stream_type = stream_type
+        self.calls = 0
+        self.injected_failures = 0
+        self._subscribers: List[asyncio.Queue] = []
+        self._closing = False
+        self._runner: Optional[web.AppRunner] = None
+        self.app = self._build_app()
+
+    def _build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject])
+        routes = [
+            ("GET", "/_ping", self.ping),
+            ("GET", "/info", self.info),
+            ("GET", "/containers/json", self.list_containers),
+            ("POST", "/containers/create", self.create_container),
+            ("POST", "/containers/{id}/start", self.start_container),
+            ("POST", "/containers/{id}/stop", self.stop_container),
+            ("POST", "/containers/{id}/pause", self.pause_container),
+            ("POST", "/containers/{id}/unpause", self.unpause_container),
+            ("GET", "/containers/{id}/json", self.inspect_container),
+            ("DELETE", "/containers/{id}", self.remove_container),
+            ("POST", "/containers/{id}/rename", self.rename_container),
+            ("POST", "/containers/{id}/update", self.update_container),
+            ("POST", "/containers/{id}/exec", self.create_exec),
+            ("GET", "/containers/{id}/stats", self.container_stats),
+            ("POST", "/exec/{id}/start", self.start_exec),
+            ("GET", "/exec/{id}/json", self.inspect_exec),
+            ("GET", "/containers/{id}/archive", self.get_archive),
+            ("GET", "/images/json", self.list_images),
+            ("GET", "/images/{name:.+}/json", self.inspect_image),
+            ("DELETE", "/images/{name:.+}", self.remove_image),
+            ("POST", "/commit", self.commit_container),
+            ("GET", "/networks/{id}", self.inspect_network),
+            ("POST", "/networks/create", self.create_network),
+            ("GET", "/events", self.events),
+        ]
+        for method, path, handler in routes:
+            # Accept both versioned and unversioned paths
+            app.router.add_route(method, path, handler)
+            app.router.add_route(method, r"/v{version:[0-9.]+}" + path, handler)
+        return app
+
+    @web.middleware
+    async def _inject(self, request, handler):
+        """Apply the configured latency and failures to a call"""
+        self.calls += 1
+        resource = request.match_info.route.resource
+        route = f"{request.method} {resource.canonical if resource else request.path}"
+        route = re.sub(r"^(\w+ )/v\{version\}", r"\1", route)
+        delay = self.op_latency.get(route, self.latency)
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        streaming = handler in (self.events, self.container_stats)
+        if self.failure_rate and not streaming and random.random() < self.failure_rate:
+            self.injected_failures += 1
+            return web.json_response({"message": "injected failure"}, status=500)
+        return await handler(request)
+
+    def seed(self, count: int, prefix: str = "vps-seed-", status: str = "running") -> List[FakeContainer]:
+        """Add VPS containers directly, without going through the API"""
+        seeded = []
+        for index in range(count):
+            container = FakeContainer(f"{prefix}{index:05d}", {
+                "Image": "vpsbot-ubuntu:24.04",
+                "Labels": {"vpsbot": "true", "vps.ram": "1", "vps.cpu": "1", "vps.disk": "10"},
+                "HostConfig": {"Memory": 1024 ** 3, "CpuQuota": 100000, "CpuPeriod": 100000},
+            })
+            container.status = status
+            self.containers[container.id] = container
+            seeded.append(container)
+        return seeded
+
+    def _find(self, ref: str) -> FakeContainer:
+        container = self.containers.get(ref)
+        if container is None:
+            for candidate in self.containers.values():
+                if candidate.name == ref or candidate.id.startswith(ref):
+                    return candidate
+            raise web.HTTPNotFound(text=json.dumps({"message": f"No such container: {ref}"}),
+                                   content_type="application/json")
+        return container
+
+    def _emit(self, container: FakeContainer, action: str):
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container.id,
+            "Actor": {"ID": container.id, "Attributes": dict(container.labels, name=container.name)},
+            "time": int(time.time()),
+            "timeNano": time.time_ns(),
+        }
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    async def ping(self, request):
+        return web.Response(text="OK")
+
+    async def info(self, request):
+        return web.json_response({"MemTotal": self.mem_total, "NCPU": self.ncpu,
+                                  "Containers": len(self.containers), "Name": "fake-docker"})
+
+    async def list_containers(self, request):
+        show_all = request.query.get("all") in ("1", "true")
+        labels = json.loads(request.query.get("filters", "{}")).get("label", [])
+        result = []
+        for container in self.containers.values():
+            if not show_all and container.status != "running":
+                continue
+            if not all(_label_matches(container.labels, label) for label in labels):
+                continue
+            result.append(container.summary())
+        return web.json_response(result)
+
+    async def create_container(self, request):
+        name = request.query.get("name") or uuid.uuid4().hex[:12]
+        if any(c.name == name for c in self.containers.values()):
+            return web.json_response({"message": f"Conflict. The container name \"/{name}\" is already in use"}, status=409)
+        container = FakeContainer(name, await request.json())
+        self.containers[container.id] = container
+        self._emit(container, "create")
+        return web.json_response({"Id": container.id, "Warnings": []}, status=201)
+
+    async def start_container(self, request):
+        container = self._find(request.match_info["id"])
+        container.status = "running"
+        container.starts += 1
+        container.started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._emit(container, "start")
+        return web.Response(status=204)
+
+    async def stop_container(self, request):
+        container = self._find(request.match_info["id"])
+        if container.status != "running":
+            return web.Response(status=304)
+        container.status = "exited"
+        self._emit(container, "die")
+        self._emit(container, "stop")
+        return web.Response(status=204)
+
+    async def pause_container(self, request):
+        container = self._find(request.match_info["id"])
+        if container.status != "running":
+            return web.json_response({"message": f"Container {container.id} is not running"}, status=409)
+        container.status = "paused"
+        self._emit(container, "pause")
+        return web.Response(status=204)
+
+    async def unpause_container(self, request):
+        container = self._find(request.match_info["id"])
+        if container.status != "paused":
+            return web.json_response({"message": f"Container {container.id} is not paused"}, status=409)
+        container.status = "running"
+        self._emit(container, "unpause")
+        return web.Response(status=204)
+
+    async def inspect_container(self, request):
+        return web.json_response(self._find(request.match_info["id"]).inspect())
+
+    async def remove_container(self, request):
+        container = self._find(request.match_info["id"])
+        if container.status == "running" and request.query.get("force") not in ("1", "true"):
+            return web.json_response({"message": "container is running"}, status=409)
+        del self.containers[container.id]
+        self._emit(container, "destroy")
+        return web.Response(status=204)
+
+    async def rename_container(self, request):
+        container = self._find(request.match_info["id"])
+        name = request.query["name"]
+        if any(c.name == name for c in self.containers.values()):
+            return web.json_response({"message": f"Conflict. The container name \"/{name}\" is already in use"}, status=409)
+        container.name = name
+        self._emit(container, "rename")
+        return web.Response(status=204)
+
+    async def update_container(self, request):
+        container = self._find(request.match_info["id"])
+        container.host_config.update(await request.json())
+        self._emit(container, "update")
+        return web.json_response({"Warnings": []})
+
+    async def create_exec(self, request):
+        container = self._find(request.match_info["id"])
+        if container.status != "running":
+            return web.json_response({"message": f"Container {container.id} is not running"}, status=409)
+        exec_id = uuid.uuid4().hex
+        self.execs[exec_id] = {"container": container, "cmd": (await request.json()).get("Cmd", []),
+                               "exit_code": None}
+        return web.json_response({"Id": exec_id}, status=201)
+
+    def run_command(self, container: FakeContainer, cmd: List[str]):
+        """Return (exit_code, output) for a command run inside a fake container"""
+        line = " ".join(cmd)
+        if TMATE_DISPLAY.search(line) or "/tmp/tmate_info" in line:
+            return 0, f"{container.tmate_session}\n".encode()
+        if line.startswith("/bin/sh -c df "):
+            disk_kb = int(container.labels.get("vps.disk", "10")) * 1024 ** 2
+            return 0, (f"Filesystem 1024-blocks Used Available Capacity Mounted on\n"
+                       f"overlay {disk_kb * 4} 1572864 {disk_kb * 4 - 1572864} 2% /\n"
+                       f"/dev/loop0 {disk_kb} 24576 {disk_kb - 24576} 1% /vps-storage\n").encode()
+        return 0, b""
+
+    async def start_exec(self, request):
+        record = self.execs.get(request.match_info["id"])
+        if record is None:
+            raise web.HTTPNotFound()
+        body = await request.json()
+        exit_code, output = self.run_command(record["container"], record["cmd"])
+        record["exit_code"] = exit_code
+        if body.get("Detach"):
+            return web.Response(status=200)
+        payload = struct.pack(">BxxxL", 1, len(output)) + output if output else b""
+        return web.Response(body=payload, content_type=self.stream_type)
+
+    async def inspect_exec(self, request):
+        record = self.execs.get(request.match_info["id"])
+        if record is None:
+            raise web.HTTPNotFound()
+        return web.json_response({"ID": request.match_info["id"], "Running": False,
+                                  "ExitCode": record["exit_code"]})
+
+    def container_files(self, container: FakeContainer) -> Dict[str, bytes]:
+        """Files readable through the archive endpoint"""
+        if container.cmd is None and container.status == "running":
+            # The image's /start.sh publishes the tmate session
+            return {"/tmp/tmate_info": f"{container.tmate_session}\n".encode()}
+        return {}
+
+    async def get_archive(self, request):
+        container = self._find(request.match_info["id"])
+        path = request.query.get("path", "")
+        content = self.container_files(container).get(path)
+        if content is None:
+            return web.json_response({"message": f"Could not find the file {path} in container"}, status=404)
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            info = tarfile.TarInfo(path.rsplit("/", 1)[-1])
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        return web.Response(body=buffer.getvalue(), content_type="application/x-tar")
+
+    async def inspect_network(self, request):
+        network = self.networks.get(request.match_info["id"])
+        if network is None:
+            return web.json_response({"message": f"network {request.match_info['id']} not found"}, status=404)
+        return web.json_response(network)
+
+    async def create_network(self, request):
+        body = await request.json()
+        if body["Name"] in self.networks:
+            return web.json_response({"message": f"network with name {body['Name']} already exists"}, status=409)
+        network = dict(body, Id=uuid.uuid4().hex * 2)
+        self.networks[body["Name"]] = network
+        return web.json_response({"Id": network["Id"], "Warning": ""}, status=201)
+
+    async def list_images(self, request):
+        labels = json.loads(request.query.get("filters", "{}")).get("label", [])
+        return web.json_response([
+            {"Id": image["Id"], "RepoTags": image["RepoTags"], "Labels": image["Config"]["Labels"],
+             "Created": image["Created"], "Size": 0}
+            for image in self.images.values()
+            if all(_label_matches(image["Config"]["Labels"], label) for label in labels)
+        ])
+
+    async def commit_container(self, request):
+        container = self._find(request.query["container"])
+        body = await request.json() if request.can_read_body else {}
+        name = f"{request.query['repo']}:{request.query.get('tag') or 'latest'}"
+        self.images[name] = {
+            "Id": "sha256:" + uuid.uuid4().hex * 2,
+            "RepoTags": [name],
+            "Created": int(time.time()),
+            # Inherits the container's command and the base image's labels, like docker commit
+            "Config": {"Cmd": container.cmd or ["/start.sh"],
+                       "Labels": {"vpsbot.tmate": "true", **(body.get("Labels") or {})}},
+        }
+        return web.json_response({"Id": self.images[name]["Id"]}, status=201)
+
+    async def remove_image(self, request):
+        name = request.match_info["name"]
+        if name not in self.images:
+            return web.json_response({"message": f"No such image: {name}"}, status=404)
+        if request.query.get("force") not in ("1", "true") and any(c.image == name for c in self.containers.values()):
+            return web.json_response({"message": f"conflict: unable to remove repository reference \"{name}\" "
+                                                 f"(must force) - container is using its referenced image"}, status=409)
+        del self.images[name]
+        return web.json_response([{"Untagged": name}])
+
+    async def inspect_image(self, request):
+        name = request.match_info["name"]
+        if name in self.images:
+            return web.json_response(self.images[name])
+        return web.json_response({
+            "Id": "sha256:" + uuid.uuid5(uuid.NAMESPACE_URL, name).hex * 2,
+            "RepoTags": [name],
+            "Config": {"Cmd": ["/start.sh"], "Labels": {"vpsbot.tmate": "true"}},
+        })
+
+    async def container_stats(self, request):
+        container = self._find(request.match_info["id"])
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        total = system = 0
+        try:
+            while container.id in self.containers and not self._closing:
+                system += 1_000_000_000
+                if container.busy and container.status == "running":
+                    total += 10_000_000
+                sample = {
+                    "read": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "cpu_stats": {"cpu_usage": {"total_usage": total}, "system_cpu_usage": system,
+                                  "online_cpus": self.ncpu},
+                    "memory_stats": {"usage": 64 * 1024 ** 2,
+                                     "limit": container.host_config.get("Memory") or self.mem_total},
+                    "networks": {"eth0": {"rx_bytes": total // 1000, "tx_bytes": total // 2000}},
+                    "blkio_stats": {"io_service_bytes_recursive": []},
+                }
+                await response.write(json.dumps(sample).encode() + b"\n")
+                if request.query.get("stream") in ("0", "false"):
+                    break
+                await asyncio.sleep(1)
+        except ConnectionResetError:
+            # Subscriber went away
+            pass
+        return response
+
+    async def events(self, request):
+        labels = json.loads(request.query.get("filters", "{}")).get("label", [])
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                attributes = event["Actor"]["Attributes"]
+                if all(_label_matches(attributes, label) for label in labels):
+                    await response.write(json.dumps(event).encode() + b"\n")
+        except ConnectionResetError:
+            # Subscriber went away
+            pass
+        finally:
+            self._subscribers.remove(queue)
+        return response
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, socket_path: Optional[str] = None) -> str:
+        """Start serving and return the URL to use as DOCKER_HOST"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        if socket_path:
+            site = web.UnixSite(self._runner, socket_path)
+            await site.start()
+            return f"unix://{socket_path}"
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        # End open streams so the runner doesn't wait on them
+        self._closing = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        if self._runner:
+            await self._runner.cleanup()
+
+def _label_matches(labels: Dict[str, str], selector: str) -> bool:
+    if "=" in selector:
+        key, value = selector.split("=", 1)
+        return labels.get(key) == value
+    return selector in labels
+
+async def main(args):
+    daemon = FakeDockerDaemon(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate)
+    url = await daemon.start(port=args.port, socket_path=args.socket)
+    print(f"🐳 Fake Docker daemon listening on {url}")
+    print(f"Use: DOCKER_HOST={url} python3 bot.py")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Docker Engine API server")
+    parser.add_argument("--port", type=int, default=2375)
+    parser.add_argument("--socket", help="Serve on a unix socket instead of TCP")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of calls answered with a 500")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import psutil
+
+from metrics import RingBuffer
+
+FIELDS = (
+    "cpu_percent",
+    "used_ram_gb",
+    "available_ram_gb",
+    "disk_used_gb",
+    "load_1m",
+    "disk_read_mbps",
+    "disk_write_mbps",
+    "net_rx_mbps",
+    "net_tx_mbps",
+)
+
+# Windows shown by !resources, in seconds
+WINDOWS = (("1m", 60), ("5m", 300), ("15m", 900))
+
+class HostSampler:
+    """Samples host CPU, memory, disk, load and I/O in the background.
+
+    Readers get the latest sample or a min/avg/max over a recent window
+    straight from memory. No psutil call ever runs on the event loop.
+    """
+
+    def __init__(self, interval: float = 5, history_seconds: int = 900, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path if os.path.exists(disk_path) else "/"
+        self.history = RingBuffer(FIELDS, int(history_seconds / interval) + 1)
+        self.total_ram_gb = 0.0
+        self.disk_total_gb = 0.0
+        self.cpu_cores = psutil.cpu_count() or 0
+        self._last_io: Optional[Tuple[float, int, int, int, int]] = None
+        # The first non-blocking cpu_percent() call only sets the baseline
+        psutil.cpu_percent(interval=None)
+
+    def _read(self) -> Dict[str, float]:
+        """Collect one sample; runs in a worker thread"""
+        now = time.monotonic()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        disk_io = psutil.disk_io_counters()
+        net_io = psutil.net_io_counters()
+        self.total_ram_gb = memory.total / 1024 ** 3
+        self.disk_total_gb = disk.total / 1024 ** 3
+
+        sample = {
+            # Usage since the previous call, so this never sleeps
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "used_ram_gb": memory.used / 1024 ** 3,
+            "available_ram_gb": memory.available / 1024 ** 3,
+            "disk_used_gb": disk.used / 1024 ** 3,
+            "load_1m": os.getloadavg()[0],
+        }
+        io = (now,
+              disk_io.read_bytes if disk_io else 0, disk_io.write_bytes if disk_io else 0,
+              net_io.bytes_recv if net_io else 0, net_io.bytes_sent if net_io else 0)
+        if self._last_io is not None:
+            elapsed = max(now - self._last_io[0], 1e-6)
+            rates = [(current - previous) / elapsed / 1024 ** 2 for current, previous in zip(io[1:], self._last_io[1:])]
+            sample.update(zip(("disk_read_mbps", "disk_write_mbps", "net_rx_mbps", "net_tx_mbps"), rates))
+        self._last_io = io
+        return sample
+
+    async def sample(self):
+        loop = asyncio.get_running_loop()
+        self.history.append(await loop.run_in_executor(None, self._read))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample()
+            except Exception as e:
+                print(f"Error sampling host resources: {e}")
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        return self.history.latest()
+
+    def summaries(self, field: str) -> Dict[str, Tuple[float, float, float]]:
+        """min/avg/max of a field over each of the 1/5/15 minute windows"""
+        result = {}
+        for label, seconds in WINDOWS:
+            summary = self.history.summary(field, seconds)
+            if summary:
+                result[label] = summary
+        return result
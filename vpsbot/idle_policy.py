@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    from vps_manager import VPSConfig, VPSManager
+
+class IdlePolicy:
+    """Pauses, and optionally stops, VPSes nobody has used for a while.
+
+    A running VPS counts as idle while its CPU and network averages over the
+    last check interval stay under the thresholds and no client is attached
+    to its tmate session. After ``pause_after`` idle seconds it is paused,
+    which frees its CPU but keeps its memory committed; after ``stop_after``
+    it is stopped, which frees its memory for other VPSes. Suspended VPSes
+    are resumed by the manager when someone asks for them again.
+    """
+
+    def __init__(self, manager: "VPSManager", pause_after: int, stop_after: int = 0, cpu_percent: float = 2.0,
+                 net_kbps: float = 1.0, interval: int = 60):
+        self.manager = manager
+        self.pause_after = pause_after
+        self.stop_after = stop_after
+        self.cpu_percent = cpu_percent
+        self.net_kbps = net_kbps
+        self.interval = interval
+        # When each VPS was last seen in use
+        self.last_active: Dict[str, float] = {}
+        self.pauses = 0
+        self.stops = 0
+        self.resumes = 0
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"Error checking idle VPSes: {e}")
+
+    def touch(self, vps_name: str):
+        """Record that a VPS was just used"""
+        self.last_active[vps_name] = time.time()
+
+    async def check(self):
+        now = time.time()
+        for name in list(self.last_active):
+            if name not in self.manager.vps_instances:
+                del self.last_active[name]
+        for vps in list(self.manager.vps_instances.values()):
+            if self.manager.jobs.pending(vps.name):
+                continue
+            if vps.status == "running":
+                if await self._active(vps):
+                    self.touch(vps.name)
+                    continue
+                idle = now - self.last_active.setdefault(vps.name, now)
+                if idle >= self.pause_after:
+                    success, message = await self.manager.suspend_vps(vps.name, "pause")
+                    if success:
+                        self.pauses += 1
+                    print(f"Idle for {idle / 60:.0f} min: {message}")
+            elif vps.status == "paused" and vps.idle_suspended and self.stop_after:
+                idle = now - self.last_active.setdefault(vps.name, now)
+                if idle >= self.stop_after:
+                    success, message = await self.manager.suspend_vps(vps.name, "stop")
+                    if success:
+                        self.stops += 1
+                    print(f"Idle for {idle / 60:.0f} min: {message}")
+
+    async def _active(self, vps: "VPSConfig") -> bool:
+        stats = self.manager.stats_collector
+        cpu = stats.recent(vps.name, "cpu_percent", self.interval)
+        if cpu is None:
+            # No samples yet; don't judge a VPS we can't see
+            return True
+        net = (stats.recent(vps.name, "net_rx_kbps", self.interval) or 0) + \
+              (stats.recent(vps.name, "net_tx_kbps", self.interval) or 0)
+        if cpu >= self.cpu_percent or net >= self.net_kbps:
+            return True
+        # Someone can sit in an idle shell; an attached tmate client still counts
+        try:
+            result = await self.manager.node_of(vps).backend.exec(
+                vps.container_id, "tmate -S /tmp/tmate.sock list-clients 2>/dev/null | wc -l"
+            )
+        except Exception:
+            return True
+        clients = result.output.decode().strip()
+        return clients.isdigit() and int(clients) > 0
+
+    def stats(self) -> Dict:
+        paused = stopped = 0
+        reclaimed = 0.0
+        for vps in self.manager.vps_instances.values():
+            if not vps.idle_suspended:
+                continue
+            if vps.status == "paused":
+                # Its memory stays allocated while frozen; only stopping frees it
+                paused += 1
+            elif vps.status == "stopped":
+                stopped += 1
+                reclaimed += vps.ram_gb
+        return {
+            "paused": paused,
+            "stopped": stopped,
+            "reclaimed_ram_gb": round(reclaimed, 2),
+            "pauses": self.pauses,
+            "stops": self.stops,
+            "resumes": self.resumes,
+        }
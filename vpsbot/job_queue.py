@@ -0,0 +1,210 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from state_store import StateStore
+
+# Ops that can safely run again after a restart interrupted them
+RESUMABLE_OPS = {"stop", "delete", "restart"}
+
+@dataclass
+class Job:
+    op: str
+    vps: Optional[str]
+    priority: int
+    status: str = "queued"  # queued, running, done, failed
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[str] = None
+    channel_id: Optional[int] = None
+    message_id: Optional[int] = None
+    id: Optional[int] = None
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent queued"""
+        return (self.started_at or time.time()) - self.created_at
+
+    @property
+    def took(self) -> Optional[float]:
+        """Seconds spent running, so far or in total"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+Handler = Callable[[Job], Awaitable[Tuple[bool, str]]]
+
+class JobQueue:
+    """Persistent, prioritized queue for lifecycle operations.
+
+    Jobs are stored in the state store as soon as they are submitted and run
+    on ``workers`` worker tasks, lowest ``priority`` first and then in
+    submission order. ``limits`` caps how many jobs of one op run at once; a
+    job whose op is at its limit waits without blocking jobs of other ops.
+    Jobs for the same VPS run one at a time, so e.g. a delete never races
+    the create of the container it removes. Handlers return
+    ``(success, message)`` like the rest of the manager.
+    """
+
+    def __init__(self, store: StateStore, handlers: Dict[str, Handler], workers: int = 8,
+                 limits: Optional[Dict[str, int]] = None, priorities: Optional[Dict[str, int]] = None,
+                 history: int = 50):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.limits = limits or {}
+        self.priorities = priorities or {}
+        self.queued: List[Tuple[int, int, Job]] = []
+        self.running: Dict[int, Job] = {}
+        self.recent: Deque[Job] = deque(maxlen=history)
+        self.listeners: List[Callable[[Job], Awaitable]] = []
+        self._running_ops: Dict[str, int] = {}
+        self._running_vps: Set[str] = set()
+        self._finished: Dict[int, asyncio.Event] = {}
+        self._listener_tasks = set()
+        # Created in run() so it binds to the bot's event loop
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def load(self):
+        """Requeue jobs left over from before a restart"""
+        self.recent.extend(self.store.recent_jobs(Job, self.recent.maxlen))
+        for job in self.store.load_jobs(Job, ["queued", "running"]):
+            if job.status == "running" and job.op not in RESUMABLE_OPS:
+                self._finish(job, False, "Interrupted by a restart")
+                continue
+            job.status = "queued"
+            job.started_at = None
+            self.store.save_job(job)
+            self._enqueue(job)
+
+    def submit(self, op: str, vps: Optional[str] = None, priority: Optional[int] = None,
+               origin: Optional[Tuple[int, int]] = None) -> Job:
+        """Queue a job; ``origin`` is the (channel id, message id) to update when it finishes"""
+        if op not in self.handlers:
+            raise ValueError(f"Unknown job type: {op}")
+        job = Job(op, vps, self.priorities.get(op, 0) if priority is None else priority, created_at=time.time())
+        if origin:
+            job.channel_id, job.message_id = origin
+        self.store.save_job(job)
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job: Job):
+        bisect.insort(self.queued, (job.priority, job.id, job))
+        self._finished.setdefault(job.id, asyncio.Event())
+        if self._wakeup:
+            self._wakeup.set()
+
+    def pending(self, vps: str, op: Optional[str] = None) -> Optional[Job]:
+        """A queued or running job for a VPS"""
+        for job in list(self.running.values()) + [job for _, _, job in self.queued]:
+            if job.vps == vps and (op is None or job.op == op):
+                return job
+        return None
+
+    def cancel(self, job: Job, reason: str) -> bool:
+        """Fail a job that hasn't started yet; False if it is already running or finished"""
+        for index, (_, _, queued) in enumerate(self.queued):
+            if queued is job:
+                del self.queued[index]
+                self._finish(job, False, reason)
+                return True
+        return False
+
+    def _pick(self) -> Optional[Job]:
+        for index, (_, _, job) in enumerate(self.queued):
+            if job.vps is not None and job.vps in self._running_vps:
+                # Waits for the job running on its VPS; picked again once that finishes
+                continue
+            limit = self.limits.get(job.op)
+            if limit is None or self._running_ops.get(job.op, 0) < limit:
+                del self.queued[index]
+                return job
+        return None
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _worker(self):
+        while True:
+            job = self._pick()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        self.running[job.id] = job
+        self._running_ops[job.op] = self._running_ops.get(job.op, 0) + 1
+        if job.vps is not None:
+            self._running_vps.add(job.vps)
+        self.store.save_job(job)
+        try:
+            success, message = await self.handlers[job.op](job)
+        except asyncio.CancelledError:
+            # Shutting down; the job stays "running" and is dealt with on restart
+            raise
+        except Exception as e:
+            success, message = False, f"Error running {job.op} job: {e}"
+        finally:
+            del self.running[job.id]
+            self._running_ops[job.op] -= 1
+            self._running_vps.discard(job.vps)
+            # A slot of this op, and the VPS, just freed up
+            self._wakeup.set()
+        self._finish(job, success, message)
+
+    def _finish(self, job: Job, success: bool, message: str):
+        job.status = "done" if success else "failed"
+        job.result = message
+        job.finished_at = time.time()
+        self.store.save_job(job)
+        self.recent.appendleft(job)
+        if not success:
+            print(f"Job #{job.id} ({job.op} {job.vps}) failed: {message}")
+        event = self._finished.pop(job.id, None)
+        if event:
+            event.set()
+        for listener in self.listeners:
+            task = asyncio.create_task(self._notify(listener, job))
+            self._listener_tasks.add(task)
+            task.add_done_callback(self._listener_tasks.discard)
+
+    async def _notify(self, listener: Callable[[Job], Awaitable], job: Job):
+        try:
+            await listener(job)
+        except Exception as e:
+            print(f"Error reporting job #{job.id}: {e}")
+
+    async def wait(self, job: Job) -> Job:
+        """Wait until a job has finished"""
+        event = self._finished.get(job.id)
+        if event:
+            await event.wait()
+        return job
+
+    async def join(self):
+        """Wait until every job submitted so far has finished"""
+        while self._finished:
+            await asyncio.gather(*(event.wait() for event in list(self._finished.values())))
+
+    def stats(self) -> Dict:
+        counts: Dict[str, Dict[str, int]] = {}
+        for _, _, job in self.queued:
+            counts.setdefault(job.op, {"queued": 0, "running": 0})["queued"] += 1
+        for job in self.running.values():
+            counts.setdefault(job.op, {"queued": 0, "running": 0})["running"] += 1
+        return counts
@@ -0,0 +1,220 @@
+import bisect
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from fast API calls to slow provisioning steps
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative buckets"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+class Counter:
+    """Monotonic counter; incrementing is a single float add"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+LabelValues = Tuple[str, ...]
+
+class MetricFamily:
+    """A named metric with one child per combination of label values.
+
+    Look a child up once with ``labels()`` and keep it; recording on the
+    child then never allocates. Everything runs on the event loop, so no
+    locks are needed.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str] = (),
+                 factory: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.children: Dict[LabelValues, object] = {}
+        self.callback: Optional[Callable[[], Iterable[Tuple[LabelValues, object]]]] = None
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+    def samples(self) -> Iterable[Tuple[LabelValues, object]]:
+        if self.callback is not None:
+            return self.callback()
+        return self.children.items()
+
+class MetricsRegistry:
+    """Collects metric families and renders them in the Prometheus text format"""
+
+    def __init__(self, prefix: str = "vpsbot_"):
+        self.prefix = prefix
+        self.families: Dict[str, MetricFamily] = {}
+
+    def _add(self, family: MetricFamily) -> MetricFamily:
+        family.name = self.prefix + family.name
+        self.families[family.name] = family
+        return family
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._add(MetricFamily(name, help, "counter", labelnames, Counter))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._add(MetricFamily(name, help, "histogram", labelnames, lambda: Histogram(buckets)))
+
+    def collect(self, name: str, help: str, kind: str, labelnames: Sequence[str],
+                callback: Callable[[], Iterable[Tuple[LabelValues, object]]]) -> MetricFamily:
+        """A family whose samples are read from ``callback`` at scrape time.
+
+        The callback yields (label values, value) pairs, where value is a
+        number, a Counter or a Histogram.
+        """
+        family = self._add(MetricFamily(name, help, kind, labelnames))
+        family.callback = callback
+        return family
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, sample in family.samples():
+                labels = dict(zip(family.labelnames, values))
+                if isinstance(sample, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(sample.buckets + (float("inf"),), sample.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{family.name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}")
+                    lines.append(f"{family.name}_sum{_format_labels(labels)} {sample.sum}")
+                    lines.append(f"{family.name}_count{_format_labels(labels)} {sample.count}")
+                else:
+                    value = sample.value if isinstance(sample, Counter) else sample
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _format_value(value) -> str:
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+class RingBuffer:
+    """Fixed-size time series stored in flat arrays of doubles.
+
+    Each field gets its own array, and timestamps get another. Once the
+    buffer is full, appending overwrites the oldest sample, so memory stays
+    constant however long the bot runs.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self._columns = {field: array("d", bytes(8 * capacity)) for field in self.fields}
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._next = 0
+        self.size = 0
+
+    def append(self, values: Dict[str, float], timestamp: Optional[float] = None):
+        slot = self._next
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        for field, column in self._columns.items():
+            column[slot] = values.get(field, 0.0)
+        self._next = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _slots(self, since: Optional[float] = None) -> List[int]:
+        """Slots holding samples newer than ``since``, oldest first"""
+        slots = []
+        for age in range(1, self.size + 1):
+            slot = (self._next - age) % self.capacity
+            if since is not None and self._timestamps[slot] < since:
+                break
+            slots.append(slot)
+        slots.reverse()
+        return slots
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not self.size:
+            return None
+        slot = (self._next - 1) % self.capacity
+        sample = {field: column[slot] for field, column in self._columns.items()}
+        sample["timestamp"] = self._timestamps[slot]
+        return sample
+
+    def series(self, field: str, seconds: Optional[float] = None) -> List[float]:
+        """Values of one field over the last ``seconds`` (or everything kept), oldest first"""
+        since = time.time() - seconds if seconds is not None else None
+        column = self._columns[field]
+        return [column[slot] for slot in self._slots(since)]
+
+    def summary(self, field: str, seconds: float) -> Optional[Tuple[float, float, float]]:
+        """(min, avg, max) of one field over the last ``seconds``"""
+        values = self.series(field, seconds)
+        if not values:
+            return None
+        return min(values), sum(values) / len(values), max(values)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values: Sequence[float], width: int = 30, ceiling: Optional[float] = None) -> str:
+    """Render values as a one-line bar chart, averaging them down to ``width`` bars"""
+    if not values:
+        return ""
+    if len(values) > width:
+        step = len(values) / width
+        values = [sum(chunk) / len(chunk) for chunk in
+                  (values[int(i * step):max(int((i + 1) * step), int(i * step) + 1)] for i in range(width))]
+    top = ceiling or max(values) or 1
+    return "".join(SPARK_CHARS[min(len(SPARK_CHARS) - 1, int(max(0, value) / top * (len(SPARK_CHARS) - 1) + 0.5))]
+                   for value in values)
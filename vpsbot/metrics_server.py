@@ -0,0 +1,24 @@
+from typing import Optional
+
+from aiohttp import web
+
+from metrics import MetricsRegistry
+
+async def start_metrics_server(registry: MetricsRegistry, host: str, port: int) -> web.AppRunner:
+    """Serve ``/metrics`` in the Prometheus text format from the running event loop"""
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return runner
+
+async def stop_metrics_server(runner: Optional[web.AppRunner]):
+    if runner is not None:
+        await runner.cleanup()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+from typing import Dict, Optional, Tuple
+
+SYS_NET = "/sys/class/net"
+
+def _run(*cmd: str) -> str:
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[:4])} failed: {(result.stderr or result.stdout).strip()}")
+    return result.stdout.strip()
+
+def host_veth(pid: int) -> str:
+    """Host side of the veth pair behind eth0 of the container running ``pid``"""
+    link = _run("nsenter", "-t", str(pid), "-n", "ip", "-o", "link", "show", "eth0")
+    match = re.search(r"eth0@if(\d+)", link)
+    if not match:
+        raise RuntimeError(f"eth0 of pid {pid} is not a veth: {link}")
+    for name in os.listdir(SYS_NET):
+        try:
+            with open(os.path.join(SYS_NET, name, "ifindex")) as f:
+                if f.read().strip() == match.group(1):
+                    return name
+        except OSError:
+            continue
+    raise RuntimeError(f"No host interface with index {match.group(1)}")
+
+def missing_privileges() -> Optional[str]:
+    """Why tc and nsenter can't be used from this process, or None if they can"""
+    if os.geteuid() != 0:
+        return "needs root (CAP_NET_ADMIN)"
+    missing = [tool for tool in ("tc", "ip", "nsenter") if shutil.which(tool) is None]
+    if missing:
+        return f"needs {', '.join(missing)} on the host"
+    return None
+
+def _htb(dev: str, mbit: float):
+    """One htb class for all traffic leaving ``dev``, with fq_codel so bulk flows don't starve interactive ones"""
+    rate = f"{mbit:g}mbit"
+    # htb can't change its own root options in place; only the class rate changes when reshaping
+    if "qdisc htb 1: root" not in _run("tc", "qdisc", "show", "dev", dev):
+        _run("tc", "qdisc", "replace", "dev", dev, "root", "handle", "1:", "htb", "default", "10")
+    _run("tc", "class", "replace", "dev", dev, "parent", "1:", "classid", "1:10", "htb",
+         "rate", rate, "ceil", rate)
+    try:
+        _run("tc", "qdisc", "replace", "dev", dev, "parent", "1:10", "handle", "10:", "fq_codel")
+    except RuntimeError:
+        # Kernels without fq_codel keep htb's default pfifo leaf
+        pass
+
+def _police(dev: str, mbit: float):
+    """Drop traffic arriving on ``dev`` above ``mbit``; an ingress qdisc can only police, not queue"""
+    # About 100 ms worth of bytes, so TCP can ramp up without being cut at every burst
+    burst = max(int(mbit * 125_000 / 10), 64 * 1024)
+    _run("tc", "qdisc", "replace", "dev", dev, "handle", "ffff:", "ingress")
+    _run("tc", "filter", "replace", "dev", dev, "parent", "ffff:", "protocol", "all", "prio", "1", "handle", "800::1",
+         "u32", "match", "u32", "0", "0", "police", "rate", f"{mbit:g}mbit", "burst", str(burst), "drop",
+         "flowid", ":1")
+
+def _shaped(dev: str, ingress: float, egress: float) -> bool:
+    """Whether the limits for both directions are still installed on ``dev``"""
+    if ingress and "qdisc htb 1: root" not in _run("tc", "qdisc", "show", "dev", dev):
+        return False
+    if egress and "police" not in _run("tc", "filter", "show", "dev", dev, "parent", "ffff:"):
+        return False
+    return True
+
+class TrafficShaper:
+    """Rate limits and byte counters for the VPSes of the local node.
+
+    Both directions are limited on the host side of the VPS's veth, out of
+    reach of root inside the VPS: traffic to it with htb on the veth's root
+    qdisc, traffic from it with a policer on the veth's ingress. A veth only
+    lives as long as its container runs, so shaping is applied again on
+    every start. Counters come straight from the
+    host veth's sysfs statistics, which costs two small reads per VPS and no
+    Docker call; they restart from zero when the container does.
+    """
+
+    def __init__(self, egress_mbit_per_core: float, ingress_mbit_per_core: float):
+        self.egress_mbit_per_core = egress_mbit_per_core
+        self.ingress_mbit_per_core = ingress_mbit_per_core
+        # Host veth of each shaped VPS
+        self.veths: Dict[str, str] = {}
+        # Whether tc and nsenter work here; VPSManager checks once at startup
+        self.available = True
+
+    def rates(self, cpu_cores: int) -> Tuple[float, float]:
+        """Egress and ingress Mbit/s of a VPS; 0 leaves a direction unlimited"""
+        return self.egress_mbit_per_core * cpu_cores, self.ingress_mbit_per_core * cpu_cores
+
+    def shape(self, vps_name: str, pid: int, cpu_cores: int) -> str:
+        """Apply the limits of a VPS to its running container; returns the host veth"""
+        veth = host_veth(pid)
+        egress, ingress = self.rates(cpu_cores)
+        if ingress:
+            _htb(veth, ingress)
+        if egress:
+            _police(veth, egress)
+        if not _shaped(veth, ingress, egress):
+            raise RuntimeError(f"Limits on {veth} did not take effect")
+        self.veths[vps_name] = veth
+        return veth
+
+    async def shape_async(self, vps_name: str, pid: int, cpu_cores: int) -> str:
+        return await asyncio.get_running_loop().run_in_executor(None, self.shape, vps_name, pid, cpu_cores)
+
+    def check(self, vps_name: str, cpu_cores: int) -> bool:
+        """Whether a shaped VPS still has its limits; False when they went missing from its veth"""
+        veth = self.veths.get(vps_name)
+        if veth is None or not os.path.exists(os.path.join(SYS_NET, veth)):
+            # Not shaped yet, or its container stopped; the next start shapes it
+            return True
+        egress, ingress = self.rates(cpu_cores)
+        return _shaped(veth, ingress, egress)
+
+    async def check_async(self, vps_name: str, cpu_cores: int) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.check, vps_name, cpu_cores)
+
+    def forget(self, vps_name: str):
+        self.veths.pop(vps_name, None)
+
+    def counters(self, vps_name: str) -> Optional[Tuple[int, int]]:
+        """Bytes received and sent by a VPS since its container started"""
+        veth = self.veths.get(vps_name)
+        if veth is None:
+            return None
+        stats = os.path.join(SYS_NET, veth, "statistics")
+        try:
+            # The host side sees the VPS's traffic mirrored: what it sends arrives here
+            with open(os.path.join(stats, "tx_bytes")) as f:
+                received = int(f.read())
+            with open(os.path.join(stats, "rx_bytes")) as f:
+                sent = int(f.read())
+        except OSError:
+            # Container stopped and its veth went away
+            return None
+        return received, sent
@@ -0,0 +1,191 @@
+import asyncio
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from cpuset import CpusetAllocator
+from docker_backend import DockerBackend
+from scheduler import CapacityScheduler, Resources
+
+def parse_nodes(spec: str, default_url: str) -> List[Tuple[str, str]]:
+    """Parse ``name=url,name=url`` into (name, url) pairs; empty means one local node"""
+    nodes = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, url = entry.partition("=")
+        if not sep or not name or not url:
+            raise ValueError(f"Invalid Docker node entry {entry!r}, expected name=url")
+        nodes.append((name.strip(), url.strip()))
+    return nodes or [("local", default_url)]
+
+class Node:
+    """One Docker daemon the bot places VPSes on"""
+
+    def __init__(self, name: str, url: str, backend: DockerBackend, scheduler: CapacityScheduler):
+        self.name = name
+        self.url = url
+        self.backend = backend
+        self.scheduler = scheduler
+        self.healthy = True
+        self.draining = False
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        # Dedicated cores for pinned VPSes; None when CPU pinning is off
+        self.cpusets: Optional[CpusetAllocator] = None
+        # Disk holding container root filesystems, where block I/O limits apply
+        self.io_device: Optional[str] = None
+
+    @property
+    def local(self) -> bool:
+        """Whether the daemon runs on this host, so its files and mounts are ours to manage"""
+        return self.url.startswith("unix://")
+
+    @property
+    def schedulable(self) -> bool:
+        return self.healthy and not self.draining
+
+class NodePool:
+    """The Docker daemons of the fleet, with placement and health checks.
+
+    New VPSes go to the healthy, non-draining node chosen by ``strategy``:
+    ``best-fit`` packs the node with the least RAM left after placement,
+    ``least-loaded`` spreads onto the node with the most RAM left. A node
+    that fails ``max_failures`` health checks in a row is taken out of
+    placement until it answers again; draining is the manual equivalent.
+    """
+
+    def __init__(self, nodes: List[Node], strategy: str = "best-fit", max_failures: int = 3,
+                 check_interval: int = 15):
+        if not nodes:
+            raise ValueError("At least one Docker node is required")
+        if strategy not in ("best-fit", "least-loaded"):
+            raise ValueError(f"Unknown placement strategy: {strategy}")
+        self.nodes: Dict[str, Node] = {node.name: node for node in nodes}
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.check_interval = check_interval
+
+    @property
+    def primary(self) -> Node:
+        return next(iter(self.nodes.values()))
+
+    def get(self, name: Optional[str]) -> Node:
+        """The node a VPS lives on; records from before multi-node support live on the primary"""
+        return self.nodes.get(name) or self.primary
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def reserve(self, key: Hashable, ram_gb: int, cpu_cores: int, disk_gb: int,
+                preferred: Optional[str] = None, cpuset_key: Optional[Hashable] = None) -> Tuple[Optional[Node], str]:
+        """Pick a node for a request and reserve its capacity there.
+
+        With a ``cpuset_key`` the request also needs dedicated cores, which
+        are allocated under that key on the chosen node. When no node is
+        returned, nothing stays reserved under either key.
+        """
+        request = Resources(ram_gb, cpu_cores, disk_gb)
+        candidates = [node for node in self.nodes.values()
+                      if node.schedulable and node.scheduler.fits(request, include_pool=False)
+                      and (cpuset_key is None or (node.cpusets and node.cpusets.can_allocate(cpu_cores)))]
+        if not candidates:
+            if not any(node.schedulable for node in self.nodes.values()):
+                return None, "No healthy Docker node available"
+            if cpuset_key is not None:
+                pinning = [node.cpusets for node in self.nodes.values() if node.schedulable and node.cpusets]
+                if not pinning:
+                    return None, "CPU pinning is not enabled on any healthy node"
+                free = max(len(cpusets.free()) for cpusets in pinning)
+                if free < cpu_cores:
+                    return None, f"Not enough dedicated cores (free: {free})"
+            # Let the least full node explain what is missing, without reserving anything on it
+            node = max((node for node in self.nodes.values() if node.schedulable),
+                       key=lambda node: node.scheduler.headroom(include_pool=False).ram_gb)
+            node.scheduler.rejections += 1
+            reason = node.scheduler.rejection(request)
+            if reason is None:
+                # It has the capacity but not the cores; the nodes with free cores lack capacity
+                reason = f"No node has both the capacity and {cpu_cores} free dedicated cores"
+            return None, reason
+
+        preferred_node = self.nodes.get(preferred)
+        if preferred_node in candidates:
+            node = preferred_node
+        elif self.strategy == "best-fit":
+            node = min(candidates, key=lambda node: node.scheduler.headroom().ram_gb)
+        else:
+            node = max(candidates, key=lambda node: node.scheduler.headroom().ram_gb)
+        admitted, reason = node.scheduler.reserve(key, ram_gb, cpu_cores, disk_gb)
+        if not admitted:
+            return None, reason
+        if cpuset_key is not None and node.cpusets.allocate(cpuset_key, cpu_cores) is None:
+            node.scheduler.release(key)
+            return None, f"Not enough dedicated cores on node {node.name}"
+        return node, reason
+
+    def reserve_batch(self, keys: List[Hashable], ram_gb: int, cpu_cores: int, disk_gb: int,
+                      preferred: Optional[str] = None, preferred_count: int = 0,
+                      cpuset_keys: Optional[List[Hashable]] = None) -> Tuple[Optional[List[Node]], str]:
+        """Reserve capacity for several identical requests, all or nothing.
+
+        The first ``preferred_count`` requests prefer the ``preferred`` node.
+        Like ``reserve`` this never yields to the event loop, so no other
+        request can take capacity half way through a batch.
+        """
+        placed = []
+        for index, key in enumerate(keys):
+            node, reason = self.reserve(key, ram_gb, cpu_cores, disk_gb,
+                                        preferred=preferred if index < preferred_count else None,
+                                        cpuset_key=cpuset_keys[index] if cpuset_keys else None)
+            if node is None:
+                for reserved in range(len(placed)):
+                    self.release(keys[reserved])
+                    if cpuset_keys:
+                        self.release_cpuset(cpuset_keys[reserved])
+                return None, f"Only {len(placed)} of {len(keys)} fit: {reason}"
+            placed.append(node)
+        return placed, "Capacity reserved"
+
+    def release(self, key: Hashable):
+        for node in self.nodes.values():
+            node.scheduler.release(key)
+
+    def release_cpuset(self, key: Hashable):
+        for node in self.nodes.values():
+            if node.cpusets:
+                node.cpusets.release(key)
+
+    def pending(self) -> int:
+        return sum(node.scheduler.pending() for node in self.nodes.values())
+
+    async def check(self, node: Node) -> bool:
+        """Ping a node; returns True when it just came back from being unhealthy"""
+        try:
+            await node.backend.ping()
+        except Exception as e:
+            node.failures += 1
+            node.last_error = str(e)
+            if node.healthy and node.failures >= self.max_failures:
+                node.healthy = False
+                print(f"Docker node {node.name} failed {node.failures} health checks, draining it: {e}")
+            return False
+        recovered = not node.healthy
+        node.healthy = True
+        node.failures = 0
+        node.last_error = None
+        if recovered:
+            print(f"Docker node {node.name} is healthy again")
+        return recovered
+
+    async def close(self):
+        await asyncio.gather(*(node.backend.close() for node in self.nodes.values()), return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            node.name: {
+                "url": node.url,
+                "healthy": node.healthy,
+                "draining": node.draining,
+                "last_error": node.last_error,
+                "capacity": node.scheduler.stats(),
+                "cpusets": node.cpusets.stats() if node.cpusets else None,
+            }
+            for node in self.nodes.values()
+        }
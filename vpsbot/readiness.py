@@ -0,0 +1,30 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+async def wait_until(probe: Callable[[], Awaitable[Optional[T]]], timeout: float,
+                     initial_delay: float = 0.25, max_delay: float = 4.0, factor: float = 2.0) -> Optional[T]:
+    """Call probe until it returns a truthy value or the deadline passes.
+
+    Retries back off exponentially from initial_delay up to max_delay, so a
+    fast host answers within a fraction of a second while a loaded one is
+    given the whole timeout instead of a fixed number of attempts.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        try:
+            result = await probe()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            result = None
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * factor, max_delay)
@@ -0,0 +1,162 @@
+import os
+import shutil
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from docker_backend import DockerBackend
+    from host_sampler import HostSampler
+    from vps_manager import VPSManager
+
+# Statuses whose containers hold memory and CPU; stopped ones only hold disk
+ACTIVE_STATUSES = {"queued", "creating", "running", "paused", "restarting", "unknown"}
+
+@dataclass
+class Resources:
+    ram_gb: float = 0
+    cpu_cores: float = 0
+    disk_gb: float = 0
+
+    def __add__(self, other: "Resources") -> "Resources":
+        return Resources(self.ram_gb + other.ram_gb, self.cpu_cores + other.cpu_cores, self.disk_gb + other.disk_gb)
+
+    def __sub__(self, other: "Resources") -> "Resources":
+        return Resources(self.ram_gb - other.ram_gb, self.cpu_cores - other.cpu_cores, self.disk_gb - other.disk_gb)
+
+    def fits_in(self, other: "Resources") -> bool:
+        return self.ram_gb <= other.ram_gb and self.cpu_cores <= other.cpu_cores and self.disk_gb <= other.disk_gb
+
+class CapacityScheduler:
+    """Admission control against the physical capacity of one Docker host.
+
+    Capacity is the host's RAM (minus what is kept back for the host itself),
+    cores and disk, each scaled by an overcommit ratio. A request is admitted
+    only if it fits next to everything already committed: VPSes, creations in
+    flight and warm pool containers. Warm containers are reclaimable, so they
+    are evicted to make room rather than blocking a request.
+    """
+
+    def __init__(self, manager: "VPSManager", node: str, ram_overcommit: float = 1.0, cpu_overcommit: float = 1.0,
+                 disk_overcommit: float = 1.0, host_reserved_ram_gb: float = 0, disk_path: Optional[str] = "/",
+                 sampler: Optional["HostSampler"] = None):
+        self.manager = manager
+        self.node = node
+        self.ram_overcommit = ram_overcommit
+        self.cpu_overcommit = cpu_overcommit
+        self.disk_overcommit = disk_overcommit
+        self.host_reserved_ram_gb = host_reserved_ram_gb
+        self.disk_path = disk_path
+        # Host sampler of a local node; its samples replace our own disk and memory syscalls
+        self.sampler = sampler
+        self.physical = Resources()
+        self._reservations: Dict[Hashable, Resources] = {}
+        self.rejections = 0
+
+    async def refresh(self, backend: "DockerBackend"):
+        """Read the host's physical capacity from the Docker daemon"""
+        info = await backend.info()
+        if self.disk_path is None:
+            # Remote daemons don't report their disk size; don't limit on it
+            disk_gb = float("inf")
+        elif self.sampler and self.sampler.disk_total_gb:
+            disk_gb = self.sampler.disk_total_gb
+        else:
+            path = self.disk_path if os.path.exists(self.disk_path) else "/"
+            disk_gb = shutil.disk_usage(path).total / 1024 ** 3
+        self.physical = Resources(
+            ram_gb=(info.get("MemTotal") or 0) / 1024 ** 3,
+            cpu_cores=info.get("NCPU") or 0,
+            disk_gb=disk_gb
+        )
+
+    def limits(self) -> Resources:
+        """Capacity that may be committed, after overcommit"""
+        return Resources(
+            ram_gb=max(0, self.physical.ram_gb - self.host_reserved_ram_gb) * self.ram_overcommit,
+            cpu_cores=self.physical.cpu_cores * self.cpu_overcommit,
+            disk_gb=self.physical.disk_gb * self.disk_overcommit
+        )
+
+    def committed(self, include_pool: bool = True) -> Resources:
+        total = Resources()
+        for vps in self.manager.vps_instances.values():
+            if self.manager.nodes.get(vps.node).name != self.node:
+                continue
+            # A paused container keeps its memory charged to its cgroup, so it counts in full
+            if vps.status in ACTIVE_STATUSES:
+                total += Resources(vps.ram_gb, vps.cpu_cores, vps.disk_gb)
+            else:
+                total += Resources(disk_gb=vps.disk_gb)
+        for reservation in self._reservations.values():
+            total += reservation
+        pool = self.manager.warm_pool
+        if include_pool and pool and pool.node.name == self.node:
+            total += Resources(*pool.reserved())
+        return total
+
+    def headroom(self, include_pool: bool = True) -> Resources:
+        return self.limits() - self.committed(include_pool)
+
+    def under_memory_pressure(self) -> bool:
+        """Whether the host is already short of memory, whatever has been committed"""
+        sample = self.sampler.latest() if self.sampler else None
+        return bool(sample) and sample["available_ram_gb"] < self.host_reserved_ram_gb
+
+    def fits(self, request: Resources, include_pool: bool = True) -> bool:
+        if not self.physical.ram_gb:
+            return True
+        if self.under_memory_pressure():
+            return False
+        return request.fits_in(self.headroom(include_pool))
+
+    def rejection(self, request: Resources) -> Optional[str]:
+        """Why a request would be turned away right now, or None if it fits; reserves nothing"""
+        # Capacity stays unknown if the daemon didn't answer at startup; don't block creation then
+        if self.fits(request, include_pool=False):
+            return None
+        if self.under_memory_pressure():
+            return "Host is low on free memory, try again later"
+        headroom = self.headroom(include_pool=False)
+        return (f"Not enough host capacity (free: {max(0, headroom.ram_gb):.0f} GB RAM, "
+                f"{max(0, headroom.cpu_cores):.0f} cores, {max(0, headroom.disk_gb):.0f} GB disk)")
+
+    def reserve(self, key: Hashable, ram_gb: int, cpu_cores: int, disk_gb: int) -> Tuple[bool, str]:
+        """Hold capacity for a VPS until it shows up in the registry.
+
+        Checking and reserving happen without yielding to the event loop, so
+        concurrent requests can never both take the last free capacity.
+        """
+        request = Resources(ram_gb, cpu_cores, disk_gb)
+        reason = self.rejection(request)
+        if reason is not None:
+            self.rejections += 1
+            return False, reason
+        self._reservations[key] = request
+        return True, "Capacity reserved"
+
+    def pending(self) -> int:
+        return len(self._reservations)
+
+    def release(self, key: Hashable):
+        self._reservations.pop(key, None)
+
+    def overcommitted(self) -> Optional[Resources]:
+        """How far warm pool containers push the host past its limits, if at all"""
+        if not self.physical.ram_gb:
+            return None
+        excess = self.committed() - self.limits()
+        if excess.ram_gb <= 0 and excess.cpu_cores <= 0 and excess.disk_gb <= 0:
+            return None
+        return excess
+
+    def stats(self) -> Dict:
+        limits = self.limits()
+        committed = self.committed()
+        return {
+            "physical": vars(self.physical).copy(),
+            "limits": vars(limits).copy(),
+            "committed": vars(committed).copy(),
+            "headroom": vars(limits - committed).copy(),
+            "reservations": len(self._reservations),
+            "rejections": self.rejections,
+        }
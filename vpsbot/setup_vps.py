@@ -103,53 +103,14 @@ def create_docker_image():
     """Create a custom Docker image for VPS containers"""
     print("🔨 Creating custom Docker image...")
     
-    # Create Dockerfile
-    dockerfile_content = """
-FROM ubuntu:24.04
-
-# Install essential packages
-RUN apt-get update && apt-get install -y \\
-    openssh-server \\
-    tmate \\
-    curl \\
-    wget \\
-    vim \\
-    htop \\
-    && rm -rf /var/lib/apt/lists/*
-
-# Configure SSH
-RUN mkdir /var/run/sshd
-RUN echo 'root:password' | chpasswd
-RUN sed -i 's/#PermitRootLogin prohibit-password/PermitRootLogin yes/' /etc/ssh/sshd_config
-RUN sed -i 's/#PasswordAuthentication yes/PasswordAuthentication yes/' /etc/ssh/sshd_config
-
-# Create startup script
-RUN echo '#!/bin/bash' > /start.sh && \\
-    echo 'service ssh start' >> /start.sh && \\
-    echo 'tmate -S /tmp/tmate.sock new-session -d' >> /start.sh && \\
-    echo 'tmate -S /tmp/tmate.sock display -p "#{tmate_ssh}" > /tmp/tmate_info' >> /start.sh && \\
-    echo 'while true; do sleep 30; done' >> /start.sh && \\
-    chmod +x /start.sh
-
-EXPOSE 22
-
-CMD ["/start.sh"]
-"""
-    
     try:
-        with open("Dockerfile", "w") as f:
-            f.write(dockerfile_content)
-        
-        print("📝 Created Dockerfile")
-        
-        # Build Docker image
-        success, stdout, stderr = run_command("docker build -t vpsbot-ubuntu:24.04 .")
+        from build_image import build_custom_image
+        success, message = build_custom_image()
         if success:
-            print("✅ Docker image built successfully")
-            os.remove("Dockerfile")  # Clean up
+            print(f"✅ {message}")
             return True
         else:
-            print(f"❌ Failed to build Docker image: {stderr}")
+            print(f"❌ Failed to build Docker image: {message}")
             return False
     
     except Exception as e:
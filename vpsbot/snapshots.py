@@ -0,0 +1,61 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Docker tag rules, minus uppercase so names read like VPS names
+SNAPSHOT_NAME = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,63}$")
+
+# Volume copies of snapshots live next to VPS volumes under this prefix,
+# which orphan detection doesn't touch
+SNAPSHOT_VOLUME_PREFIX = "snapshot-"
+
+@dataclass
+class Snapshot:
+    """A VPS frozen in time: its filesystem as a committed image, plus a copy of its volume"""
+    name: str
+    image: str  # repo:tag on ``node``
+    node: str
+    source: str  # VPS it was taken of
+    ram_gb: int
+    cpu_cores: int
+    disk_gb: int
+    created_at: float
+    owner: Optional[int] = None
+    volume: Optional[str] = None  # Volume copy under CONTAINER_BASE_PATH; None on remote nodes
+
+    def labels(self) -> Dict[str, str]:
+        """Image labels that describe the snapshot, so Docker itself is its registry"""
+        labels = {
+            "vpsbot.snapshot": self.name,
+            "vpsbot.source": self.source,
+            "vps.ram": str(self.ram_gb),
+            "vps.cpu": str(self.cpu_cores),
+            "vps.disk": str(self.disk_gb),
+            "vpsbot.created": str(int(self.created_at)),
+        }
+        if self.owner is not None:
+            labels["vps.owner"] = str(self.owner)
+        if self.volume:
+            labels["vpsbot.volume"] = self.volume
+        return labels
+
+    @classmethod
+    def from_image(cls, image: Dict, node: str) -> Optional["Snapshot"]:
+        """Rebuild a snapshot from an ``/images/json`` entry, or None if it isn't one"""
+        labels = image.get("Labels") or {}
+        tags = [tag for tag in image.get("RepoTags") or [] if not tag.startswith("<none>")]
+        if not labels.get("vpsbot.snapshot") or not tags:
+            return None
+        return cls(
+            name=labels["vpsbot.snapshot"],
+            image=tags[0],
+            node=node,
+            source=labels.get("vpsbot.source", "?"),
+            ram_gb=int(labels.get("vps.ram", "1")),
+            cpu_cores=int(labels.get("vps.cpu", "1")),
+            disk_gb=int(labels.get("vps.disk", "10")),
+            created_at=float(labels.get("vpsbot.created") or image.get("Created") or time.time()),
+            owner=int(labels["vps.owner"]) if labels.get("vps.owner", "").isdigit() else None,
+            volume=labels.get("vpsbot.volume") or None,
+        )
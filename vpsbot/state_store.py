@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict, fields
+from typing import Dict, List, Optional, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vps (
+    name TEXT PRIMARY KEY,
+    updated_at REAL,
+    deleted_at REAL
+);
+CREATE TABLE IF NOT EXISTS vps_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS vps_events_name_ts ON vps_events (name, ts);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    vps TEXT,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    channel_id INTEGER,
+    message_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS volumes (
+    name TEXT PRIMARY KEY,
+    vps TEXT,
+    disk_gb INTEGER,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    deleted_at REAL,
+    reclaimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS volumes_status ON volumes (status);
+"""
+
+JOB_COLUMNS = ("op", "vps", "priority", "status", "created_at", "started_at", "finished_at", "result",
+               "channel_id", "message_id")
+
+VOLUME_COLUMNS = ("name", "vps", "disk_gb", "status", "created_at", "deleted_at", "reclaimed_at")
+
+SQL_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT", bool: "INTEGER"}
+
+class StateStore:
+    """Durable VPS registry in SQLite with write-ahead logging.
+
+    The ``vps`` table mirrors the fields of the record dataclass; columns for
+    fields added later are created automatically on startup. Deleted VPSes
+    keep their row (with ``deleted_at`` set) so lifecycle history survives.
+    """
+
+    def __init__(self, path: str, record_type: type):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.record_type = record_type
+        # Autocommit; every statement is its own small WAL transaction
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._columns = self._ensure_columns()
+
+    def _ensure_columns(self) -> List[str]:
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(vps)")}
+        columns = []
+        for field in fields(self.record_type):
+            columns.append(field.name)
+            if field.name in existing:
+                continue
+            sql_type = SQL_TYPES.get(_base_type(field.type), "TEXT")
+            self.conn.execute(f"ALTER TABLE vps ADD COLUMN {field.name} {sql_type}")
+        return columns
+
+    def _encode(self, value):
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return value
+
+    def load(self) -> List:
+        """All VPS records that have not been deleted"""
+        rows = self.conn.execute("SELECT * FROM vps WHERE deleted_at IS NULL ORDER BY created_at").fetchall()
+        return [self._record(row) for row in rows]
+
+    def load_deleted(self, name: str):
+        """The last record of a deleted VPS, or None"""
+        row = self.conn.execute("SELECT * FROM vps WHERE name=? AND deleted_at IS NOT NULL", (name,)).fetchone()
+        return self._record(row) if row else None
+
+    def _record(self, row: sqlite3.Row):
+        values = {}
+        for field in fields(self.record_type):
+            value = row[field.name]
+            if value is not None and _base_type(field.type) in (list, dict):
+                value = json.loads(value)
+            if value is not None or field.default is None:
+                values[field.name] = value
+        return self.record_type(**values)
+
+    def save(self, record):
+        """Insert or update a VPS record"""
+        data = {name: self._encode(value) for name, value in asdict(record).items() if name in self._columns}
+        columns = ", ".join(data)
+        placeholders = ", ".join("?" for _ in data)
+        updates = ", ".join(f"{name}=excluded.{name}" for name in data if name != "name")
+        self.conn.execute(
+            f"INSERT INTO vps ({columns}, updated_at, deleted_at) VALUES ({placeholders}, ?, NULL) "
+            f"ON CONFLICT(name) DO UPDATE SET {updates}, updated_at=excluded.updated_at, deleted_at=NULL",
+            [*data.values(), time.time()]
+        )
+
+    def mark_deleted(self, name: str):
+        self.conn.execute("UPDATE vps SET deleted_at=?, updated_at=? WHERE name=?", (time.time(), time.time(), name))
+
+    def record_event(self, name: str, event: str, detail: Optional[str] = None):
+        self.conn.execute("INSERT INTO vps_events (name, ts, event, detail) VALUES (?, ?, ?, ?)",
+                          (name, time.time(), event, detail))
+
+    def history(self, name: str, limit: int = 50) -> List[Dict]:
+        """Most recent lifecycle events of a VPS, newest first"""
+        rows = self.conn.execute(
+            "SELECT ts, event, detail FROM vps_events WHERE name=? ORDER BY ts DESC LIMIT ?", (name, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def save_job(self, job):
+        """Insert a new job (assigning its id) or update an existing one"""
+        values = [getattr(job, column) for column in JOB_COLUMNS]
+        if job.id is None:
+            cursor = self.conn.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}) VALUES ({', '.join('?' for _ in JOB_COLUMNS)})",
+                values
+            )
+            job.id = cursor.lastrowid
+        else:
+            self.conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{column}=?' for column in JOB_COLUMNS)} WHERE id=?",
+                [*values, job.id]
+            )
+
+    def load_jobs(self, job_type: type, statuses: List[str]) -> List:
+        """Jobs in any of the given statuses, oldest first"""
+        rows = self.conn.execute(
+            f"SELECT * FROM jobs WHERE status IN ({', '.join('?' for _ in statuses)}) ORDER BY id", statuses
+        ).fetchall()
+        return [job_type(**dict(row)) for row in rows]
+
+    def recent_jobs(self, job_type: type, limit: int = 50) -> List:
+        """Most recently finished jobs, newest first"""
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [job_type(**dict(row)) for row in rows]
+
+    def prune_jobs(self, older_than: float):
+        """Drop finished jobs that finished before the given time"""
+        self.conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (older_than,))
+
+    def save_volume(self, volume):
+        """Insert or update a storage volume"""
+        values = [getattr(volume, column) for column in VOLUME_COLUMNS]
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO volumes ({', '.join(VOLUME_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in VOLUME_COLUMNS)})",
+            values
+        )
+
+    def load_volumes(self, volume_type: type, statuses: List[str]) -> List:
+        """Storage volumes in any of the given statuses, oldest first"""
+        rows = self.conn.execute(
+            f"SELECT * FROM volumes WHERE status IN ({', '.join('?' for _ in statuses)}) ORDER BY created_at", statuses
+        ).fetchall()
+        return [volume_type(**dict(row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+def _base_type(annotation):
+    """int for Optional[int], list for List[str], and so on"""
+    origin = getattr(annotation, "__origin__", None)
+    if origin is not None and origin is not Union:
+        return origin
+    args = [arg for arg in getattr(annotation, "__args__", ()) if arg is not type(None)]
+    if args:
+        return _base_type(args[0])
+    return annotation
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from metrics import RingBuffer
+
+if TYPE_CHECKING:
+    from vps_manager import VPSConfig, VPSManager
+
+FIELDS = (
+    "cpu_percent",
+    "mem_mb",
+    "mem_percent",
+    "net_rx_kbps",
+    "net_tx_kbps",
+    "blk_read_kbps",
+    "blk_write_kbps",
+)
+
+class ContainerStats:
+    """Turns raw Docker stats samples of one container into rates"""
+
+    def __init__(self, capacity: int):
+        self.history = RingBuffer(FIELDS, capacity)
+        self._previous: Optional[Tuple[float, int, int, int, int, int, int]] = None
+
+    def reset(self):
+        """Forget the previous counters, e.g. when a new stream starts from zero"""
+        self._previous = None
+
+    def add(self, raw: Dict, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        cpu = raw.get("cpu_stats") or {}
+        memory = raw.get("memory_stats") or {}
+        networks = (raw.get("networks") or {}).values()
+        blkio = (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+        counters = (
+            now,
+            (cpu.get("cpu_usage") or {}).get("total_usage", 0),
+            cpu.get("system_cpu_usage", 0),
+            sum(net.get("rx_bytes", 0) for net in networks),
+            sum(net.get("tx_bytes", 0) for net in networks),
+            sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "read"),
+            sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "write"),
+        )
+        previous, self._previous = self._previous, counters
+        if previous is None:
+            # Rates need two samples
+            return
+
+        # Page cache is reclaimable, so leave it out like `docker stats` does
+        mem_stats = memory.get("stats") or {}
+        usage = memory.get("usage", 0) - mem_stats.get("inactive_file", mem_stats.get("cache", 0))
+        limit = memory.get("limit") or 0
+        cpu_delta = counters[1] - previous[1]
+        system_delta = counters[2] - previous[2]
+        elapsed = max(counters[0] - previous[0], 1e-6)
+        online_cpus = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+        self.history.append({
+            "cpu_percent": cpu_delta / system_delta * online_cpus * 100 if system_delta > 0 else 0.0,
+            "mem_mb": usage / 1024 ** 2,
+            "mem_percent": usage / limit * 100 if limit else 0.0,
+            "net_rx_kbps": max(0, counters[3] - previous[3]) / elapsed / 1024,
+            "net_tx_kbps": max(0, counters[4] - previous[4]) / elapsed / 1024,
+            "blk_read_kbps": max(0, counters[5] - previous[5]) / elapsed / 1024,
+            "blk_write_kbps": max(0, counters[6] - previous[6]) / elapsed / 1024,
+        })
+
+class StatsCollector:
+    """Follows the Docker stats stream of every running VPS.
+
+    Each running container gets exactly one long-lived stream, opened when
+    it starts and closed when it stops. No stats call ever polls with
+    stream=False. Samples go into a per-VPS ring buffer holding
+    ``history_seconds`` of history.
+    """
+
+    def __init__(self, manager: "VPSManager", history_seconds: int = 300, sync_interval: float = 5):
+        self.manager = manager
+        self.capacity = history_seconds  # Docker sends one sample per second
+        self.sync_interval = sync_interval
+        self.stats: Dict[str, ContainerStats] = {}
+        self._streams: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    async def run(self):
+        try:
+            while True:
+                self.sync()
+                await asyncio.sleep(self.sync_interval)
+        finally:
+            for _, task in self._streams.values():
+                task.cancel()
+            self._streams.clear()
+
+    def sync(self):
+        """Open streams for newly running VPSes and close those of stopped or deleted ones"""
+        wanted = {name: vps for name, vps in self.manager.vps_instances.items()
+                  if vps.status == "running" and vps.container_id and self.manager.node_of(vps).healthy}
+        for name, (container_id, task) in list(self._streams.items()):
+            vps = wanted.get(name)
+            if vps is None or vps.container_id != container_id or task.done():
+                task.cancel()
+                del self._streams[name]
+        for name, vps in wanted.items():
+            if name not in self._streams:
+                self._streams[name] = (vps.container_id, asyncio.create_task(self._follow(vps)))
+        for name in list(self.stats):
+            if name not in self.manager.vps_instances:
+                del self.stats[name]
+
+    async def _follow(self, vps: "VPSConfig"):
+        stats = self.stats.get(vps.name)
+        if stats is None:
+            stats = self.stats[vps.name] = ContainerStats(self.capacity)
+        # Counters restart with the stream, so rates start fresh
+        stats.reset()
+        try:
+            async for raw in self.manager.node_of(vps).backend.stats(vps.container_id):
+                stats.add(raw)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Stats stream for {vps.name} ended: {e}")
+
+    def recent(self, vps_name: str, field: str, seconds: float = 10) -> Optional[float]:
+        """Average of a metric over the last few seconds"""
+        stats = self.stats.get(vps_name)
+        summary = stats.history.summary(field, seconds) if stats else None
+        return summary[1] if summary else None
+
+    def history(self, vps_name: str, field: str, seconds: Optional[float] = None) -> List[float]:
+        stats = self.stats.get(vps_name)
+        return stats.history.series(field, seconds) if stats else []
+
+    def top(self, field: str, limit: int = 10, seconds: float = 10) -> List[Tuple[str, float]]:
+        """VPSes ranked by the recent average of a metric, highest first"""
+        ranked = []
+        for name in self.stats:
+            value = self.recent(name, field, seconds)
+            if value is not None:
+                ranked.append((name, value))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
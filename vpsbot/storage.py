@@ -0,0 +1,380 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# How disk_gb is enforced: a loopback filesystem per VPS volume, Docker's
+# root filesystem size option, or not at all
+QUOTA_MODES = ("loopback", "storage-opt", "none")
+
+def block_device(path: str) -> Optional[str]:
+    """Whole-disk device node a path lives on (``/dev/sda`` for a file on ``/dev/sda2``)"""
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return None
+    sysfs = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    if not os.path.exists(sysfs):
+        # overlay, tmpfs and the like aren't backed by a block device
+        return None
+    if os.path.exists(os.path.join(sysfs, "partition")):
+        # Block I/O limits only apply to whole disks
+        sysfs = os.path.dirname(sysfs)
+    return "/dev/" + os.path.basename(sysfs)
+
+def _run(*cmd: str) -> str:
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} failed: {(result.stderr or result.stdout).strip()}")
+    return result.stdout.strip()
+
+class VolumeManager:
+    """The per-VPS storage directories of the local node, mounted at /vps-storage.
+
+    With ``loopback`` each directory is the mount point of a sparse ext4
+    image as large as the VPS's disk, so a VPS can't write more than it was
+    given while the host only pays for the blocks actually written (mounted
+    with ``discard``, so deleted files give their blocks back). The image's
+    loop device is also where per-VPS block I/O limits apply. Without it the
+    directories are plain directories.
+
+    All methods block on the filesystem and ``mount``; the async wrappers run
+    them off the event loop.
+    """
+
+    def __init__(self, root: str, loopback: bool = True):
+        self.root = root
+        self.loopback = loopback
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def image(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.img")
+
+    def mounted(self, name: str) -> Optional[str]:
+        """Device mounted at a volume's directory, if any"""
+        path = self.path(name)
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                fields = line.split()
+                if fields[4] == path:
+                    return fields[fields.index("-") + 2]
+        return None
+
+    def create(self, name: str, disk_gb: int) -> Optional[str]:
+        """Provision a volume; returns the loop device backing it, if any"""
+        os.makedirs(self.path(name), exist_ok=True)
+        if not self.loopback:
+            return None
+        image = self.image(name)
+        if not os.path.exists(image):
+            try:
+                with open(image, "wb") as f:
+                    f.truncate(disk_gb * 1024 ** 3)
+                _run("mkfs.ext4", "-q", "-F", "-m", "0", image)
+            except Exception:
+                os.unlink(image)
+                raise
+        return self.mount(name)
+
+    def mount(self, name: str) -> str:
+        """Mount a volume's image unless it already is; returns its loop device"""
+        device = self.mounted(name)
+        if device is None:
+            device = _run("losetup", "--find", "--show", self.image(name))
+            try:
+                _run("mount", "-o", "discard", device, self.path(name))
+            except Exception:
+                _run("losetup", "-d", device)
+                raise
+        return device
+
+    def remove(self, name: str, low_priority: bool = False):
+        """Delete a volume; ``low_priority`` runs the deletion in the idle I/O class so VPSes don't notice it"""
+        if self.mounted(name):
+            # -d frees the loop device too
+            _run("umount", "-d", self.path(name))
+        if low_priority and shutil.which("ionice"):
+            _run("ionice", "-c", "3", "rm", "-rf", "--one-file-system", self.path(name), self.image(name))
+            return
+        if os.path.exists(self.image(name)):
+            os.unlink(self.image(name))
+        shutil.rmtree(self.path(name), ignore_errors=True)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name)) or os.path.exists(self.image(name))
+
+    def copy(self, source: str, target: str) -> str:
+        """Copy a volume as cheaply as the filesystem allows; returns how: ``reflink`` or ``copy``.
+
+        Reflinks share every block with the source until either side writes
+        it, so copying a 100 GB volume takes milliseconds and no space. Where
+        the filesystem can't reflink, a sparse copy only writes the blocks in
+        use. A mounted loopback image is frozen meanwhile so the copy is
+        consistent.
+        """
+        if self.loopback and os.path.exists(self.image(source)):
+            os.makedirs(self.path(target), exist_ok=True)
+            source_path, target_path = self.image(source), self.image(target)
+        else:
+            source_path, target_path = self.path(source), self.path(target)
+        frozen = self.loopback and self.mounted(source) is not None
+        if frozen:
+            _run("fsfreeze", "-f", self.path(source))
+        try:
+            try:
+                _run("cp", "-a", "--reflink=always", source_path, target_path)
+                return "reflink"
+            except RuntimeError:
+                # Not a reflink-capable filesystem (btrfs, xfs with reflink=1, ...)
+                _run("rm", "-rf", target_path)
+            _run("cp", "-a", "--sparse=always", source_path, target_path)
+            return "copy"
+        finally:
+            if frozen:
+                _run("fsfreeze", "-u", self.path(source))
+
+    def names(self) -> Set[str]:
+        """Every volume present under the root, with or without its image"""
+        try:
+            entries = os.listdir(self.root)
+        except FileNotFoundError:
+            return set()
+        return {entry[:-len(".img")] if entry.endswith(".img") else entry for entry in entries}
+
+    def age(self, name: str) -> float:
+        """Seconds since a volume was last changed at its top level"""
+        mtimes = []
+        for path in (self.path(name), self.image(name)):
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                pass
+        return time.time() - max(mtimes) if mtimes else 0.0
+
+    def chown(self, name: str, owner: Tuple[int, int]):
+        # A fresh ext4 root is owned by whoever ran mkfs, so this runs after mounting
+        stat = os.stat(self.path(name))
+        if (stat.st_uid, stat.st_gid) != owner:
+            os.chown(self.path(name), *owner)
+
+    def usage(self, name: str) -> Optional[Tuple[float, float]]:
+        """Used and total GB of a mounted volume"""
+        if not self.mounted(name):
+            return None
+        stat = os.statvfs(self.path(name))
+        total = stat.f_blocks * stat.f_frsize
+        return (total - stat.f_bfree * stat.f_frsize) / 1024 ** 3, total / 1024 ** 3
+
+    async def create_async(self, name: str, disk_gb: int) -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.create, name, disk_gb)
+
+    async def mount_async(self, name: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(None, self.mount, name)
+
+    async def remove_async(self, name: str, low_priority: bool = False):
+        await asyncio.get_running_loop().run_in_executor(None, self.remove, name, low_priority)
+
+    async def copy_async(self, source: str, target: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(None, self.copy, source, target)
+
+def parse_owner(spec: str) -> Optional[Tuple[int, int]]:
+    """``1000:1000`` -> (1000, 1000); a bare uid uses the same number as gid; empty -> None"""
+    if not spec:
+        return None
+    uid, _, gid = spec.partition(":")
+    return int(uid), int(gid or uid)
+
+@dataclass
+class Volume:
+    name: str
+    vps: Optional[str]  # VPS using it, or that used it last
+    disk_gb: int
+    status: str = "active"  # active, trash (deleted, kept for the grace period) or reclaimed
+    created_at: float = 0.0
+    deleted_at: Optional[float] = None
+    reclaimed_at: Optional[float] = None
+
+class StorageManager:
+    """Lifecycle of the VPS volumes of the local node, tracked in the state store.
+
+    Deleting a VPS only moves its volume to the trash, which is instant no
+    matter how much data it holds. A background worker removes trashed
+    volumes once ``grace_period`` has passed, one at a time and in the idle
+    I/O class, so reclaiming a 100 GB volume never competes with running
+    VPSes. Until then ``restore`` brings a volume back for an undelete.
+    ``reconcile`` compares the storage root with the volumes in use and
+    trashes leftovers nothing owns, e.g. from a crash mid-delete.
+    """
+
+    # Unregistered volumes younger than this may belong to a create in progress
+    ORPHAN_MIN_AGE = 3600
+
+    def __init__(self, volumes: VolumeManager, store, owner: Optional[Tuple[int, int]], grace_period: float,
+                 interval: float, prefixes: Iterable[str]):
+        self.volumes = volumes
+        self.store = store
+        self.owner = owner
+        self.grace_period = grace_period
+        self.interval = interval
+        self.prefixes = tuple(prefixes)
+        self.registry: Dict[str, Volume] = {}
+        self._reclaiming: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self.reclaimed = 0
+        self.reclaimed_gb = 0
+        self.orphans = 0
+
+    def load(self):
+        for volume in self.store.load_volumes(Volume, ["active", "trash"]):
+            self.registry[volume.name] = volume
+
+    def _save(self, volume: Volume):
+        try:
+            self.store.save_volume(volume)
+        except Exception as e:
+            print(f"Error persisting volume {volume.name}: {e}")
+
+    def _register(self, name: str, vps: Optional[str], disk_gb: int) -> Volume:
+        volume = self.registry.get(name)
+        if volume is None:
+            volume = self.registry[name] = Volume(name, vps, disk_gb, created_at=time.time())
+        volume.vps, volume.disk_gb, volume.status, volume.deleted_at = vps, disk_gb, "active", None
+        self._save(volume)
+        return volume
+
+    def _provision(self, name: str, disk_gb: int) -> Optional[str]:
+        loop_device = self.volumes.create(name, disk_gb)
+        if self.owner is not None:
+            self.volumes.chown(name, self.owner)
+        return loop_device
+
+    async def provision(self, name: str, vps: str, disk_gb: int) -> Optional[str]:
+        """Create (or reuse) a volume owned by the VPS user and register it; returns its loop device, if any"""
+        if name in self._reclaiming:
+            raise RuntimeError(f"Volume {name} is still being reclaimed")
+        loop_device = await asyncio.get_running_loop().run_in_executor(None, self._provision, name, disk_gb)
+        self._register(name, vps, disk_gb)
+        return loop_device
+
+    def assign(self, name: str, vps: str):
+        """Hand a volume over to another VPS, e.g. when a warm container is claimed"""
+        volume = self.registry.get(name)
+        if volume is not None:
+            volume.vps = vps
+            self._save(volume)
+
+    def release(self, name: str, grace: bool = True):
+        """Move a volume to the trash; without ``grace`` it is reclaimed on the next pass"""
+        volume = self.registry.get(name)
+        if volume is None:
+            # Created before volumes were tracked
+            volume = self.registry[name] = Volume(name, None, 0, created_at=time.time())
+        now = time.time()
+        volume.status = "trash"
+        volume.deleted_at = now if grace else now - self.grace_period
+        self._save(volume)
+        if self._wakeup and not (grace and self.grace_period):
+            self._wakeup.set()
+
+    def trashed(self, vps: str) -> Optional[Volume]:
+        """The most recently trashed volume of a VPS that can still be restored"""
+        candidates = [volume for volume in self.registry.values()
+                      if volume.vps == vps and volume.status == "trash" and volume.name not in self._reclaiming]
+        return max(candidates, key=lambda volume: volume.deleted_at or 0, default=None)
+
+    def restore(self, name: str) -> bool:
+        volume = self.registry.get(name)
+        if volume is None or volume.status != "trash" or name in self._reclaiming:
+            return False
+        volume.status = "active"
+        volume.deleted_at = None
+        self._save(volume)
+        return True
+
+    def due(self) -> List[Volume]:
+        cutoff = time.time() - self.grace_period
+        return sorted((volume for volume in self.registry.values()
+                       if volume.status == "trash" and (volume.deleted_at or 0) <= cutoff),
+                      key=lambda volume: volume.deleted_at or 0)
+
+    async def reclaim_due(self):
+        """Remove every trashed volume past its grace period, oldest first"""
+        for volume in self.due():
+            if volume.status != "trash":
+                # Restored while an earlier one was being removed
+                continue
+            self._reclaiming.add(volume.name)
+            try:
+                await self.volumes.remove_async(volume.name, low_priority=True)
+            except Exception as e:
+                print(f"Error reclaiming volume {volume.name}: {e}")
+                continue
+            finally:
+                self._reclaiming.discard(volume.name)
+            volume.status = "reclaimed"
+            volume.reclaimed_at = time.time()
+            self._save(volume)
+            del self.registry[volume.name]
+            self.reclaimed += 1
+            self.reclaimed_gb += volume.disk_gb
+            print(f"Reclaimed volume {volume.name}" + (f" of {volume.vps}" if volume.vps else ""))
+
+    def reconcile(self, in_use: Dict[str, Tuple[str, int]]):
+        """Match the storage root against the volumes in use, given as name -> (vps, disk_gb)"""
+        on_disk = self.volumes.names()
+        present = {name for name in on_disk if name.startswith(self.prefixes)}
+        for name, (vps, disk_gb) in in_use.items():
+            volume = self.registry.get(name)
+            if name in present and (volume is None or volume.status != "active" or volume.vps != vps):
+                # Left from before volumes were tracked, or trashed while something still used it
+                self._register(name, vps, disk_gb)
+        for name in present - set(in_use) - self._reclaiming:
+            volume = self.registry.get(name)
+            if volume is not None and volume.status == "trash":
+                continue
+            # Registered volumes are as old as their record, unknown ones as their files
+            age = time.time() - volume.created_at if volume else self.volumes.age(name)
+            if age < self.ORPHAN_MIN_AGE:
+                continue
+            print(f"Volume {name} belongs to no VPS, moving it to the trash")
+            self.orphans += 1
+            self.release(name)
+        for name, volume in list(self.registry.items()):
+            if name in on_disk or name in in_use or name in self._reclaiming:
+                continue
+            # Removed by hand; nothing left to track or reclaim
+            del self.registry[name]
+            volume.status = "reclaimed"
+            volume.reclaimed_at = time.time()
+            self._save(volume)
+
+    async def run(self):
+        """Reclaim loop; wakes early when a volume is released without a grace period"""
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.reclaim_due()
+            except Exception as e:
+                print(f"Error reclaiming volumes: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict:
+        trash = [volume for volume in self.registry.values() if volume.status == "trash"]
+        return {
+            "active": sum(volume.status == "active" for volume in self.registry.values()),
+            "trash": len(trash),
+            "trash_gb": sum(volume.disk_gb for volume in trash),
+            "due": len(self.due()),
+            "reclaimed": self.reclaimed,
+            "reclaimed_gb": self.reclaimed_gb,
+            "orphans": self.orphans,
+        }
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+# The bot's modules import each other by bare name and read config at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update({
+    "WARM_POOL_ENABLED": "false",
+    "IDLE_PAUSE_AFTER": "0",
+    "VPS_NETWORK": "",
+    "NET_EGRESS_MBIT_PER_CORE": "0",
+    "NET_INGRESS_MBIT_PER_CORE": "0",
+    "DISK_QUOTA": "none",
+    "CPU_PINNING_CORES": "",
+})
+
+import pytest
+
+import vps_manager
+from docker_engine import EngineAPIBackend
+from fake_docker import FakeDockerDaemon
+
+@pytest.fixture
+def run_manager(tmp_path, monkeypatch):
+    """Run ``scenario(manager, daemon)`` against a started VPSManager on fresh fake Docker daemons.
+
+    With several ``nodes`` each gets a daemon of its own; ``daemon`` is the
+    primary node's. With ``local`` the primary daemon listens on a unix
+    socket, so the manager treats its node as this host and manages storage,
+    traffic shaping and the warm pool there.
+    """
+    monkeypatch.setattr(vps_manager, "STATE_DB_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(vps_manager, "CONTAINER_BASE_PATH", str(tmp_path / "containers"))
+
+    def run(scenario, nodes=("local",), local=False, **daemon_options):
+        async def main():
+            daemons = {name: FakeDockerDaemon(**daemon_options) for name in nodes}
+            backends = {}
+            for name, daemon in daemons.items():
+                socket_path = str(tmp_path / "docker.sock") if local and name == nodes[0] else None
+                backends[name] = EngineAPIBackend(await daemon.start(socket_path=socket_path))
+            manager = vps_manager.VPSManager(nodes=backends)
+            try:
+                await manager.start()
+                return await scenario(manager, daemons[nodes[0]])
+            finally:
+                await manager.close()
+                for daemon in daemons.values():
+                    await daemon.stop()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,42 @@
+# 8 GB host minus the 2 GB HOST_RESERVED_RAM_GB leaves 6 GB for VPSes
+SMALL_HOST = {"mem_total": 8 * 1024 ** 3, "ncpu": 4}
+
+def test_rejected_create_releases_its_reservation(run_manager):
+    async def scenario(manager, daemon):
+        node = manager.nodes.primary
+        success, message, vps = await manager.create_vps(4, 1, 10)
+        assert success, message
+        await manager.wait_until_created([vps])
+
+        success, message, _ = await manager.create_vps(4, 1, 10)
+        assert not success
+        assert "Not enough host capacity" in message
+        assert manager.nodes.pending() == 0
+        assert node.scheduler.committed().ram_gb == 4
+        assert node.scheduler.rejections == 1
+
+    run_manager(scenario, **SMALL_HOST)
+
+def test_batch_is_all_or_nothing(run_manager):
+    async def scenario(manager, daemon):
+        success, message, created = await manager.create_vps_batch(2, 1, 10, 4)
+        assert not success
+        assert "Only 3 of 4 fit" in message
+        assert created == []
+        assert manager.nodes.pending() == 0
+        assert manager.vps_instances == {}
+
+    run_manager(scenario, **SMALL_HOST)
+
+def test_batch_names_are_unique(run_manager):
+    async def scenario(manager, daemon):
+        success, message, created = await manager.create_vps_batch(1, 1, 10, 5, owner=7)
+        assert success, message
+        assert await manager.wait_until_created(created) == {}
+        names = {vps.name for vps in created}
+        assert len(names) == 5
+        assert names == set(manager.vps_instances)
+        assert {container.name for container in daemon.containers.values()} == names
+        assert all(vps.owner == 7 for vps in created)
+
+    run_manager(scenario)
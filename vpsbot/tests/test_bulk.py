@@ -0,0 +1,55 @@
+import time
+
+from vps_manager import VPSConfig
+
+def add(manager, name, status="running", owner=None, age=0):
+    manager.vps_instances[name] = VPSConfig(name=name, ram_gb=1, cpu_cores=1, disk_gb=10, status=status,
+                                            owner=owner, created_at=time.time() - age)
+
+def names(vpses):
+    return sorted(vps.name for vps in vpses)
+
+def test_select_vps(run_manager):
+    async def scenario(manager, daemon):
+        add(manager, "vps-1", owner=1, age=7200)
+        add(manager, "vps-2", status="stopped", owner=1)
+        add(manager, "web-1", status="stopped", owner=2, age=7200)
+
+        assert names(manager.select_vps(prefix="vps-")) == ["vps-1", "vps-2"]
+        assert names(manager.select_vps(status="stopped")) == ["vps-2", "web-1"]
+        assert names(manager.select_vps(owner=1, status="stopped")) == ["vps-2"]
+        assert names(manager.select_vps(min_age=3600)) == ["vps-1", "web-1"]
+        assert names(manager.select_vps(["vps-1", "web-1"], owner=2)) == ["web-1"]
+        assert names(manager.select_vps(["vps-9"])) == []
+
+    run_manager(scenario)
+
+def test_empty_selector_is_still_a_filter(run_manager):
+    async def scenario(manager, daemon):
+        add(manager, "vps-1")
+        add(manager, "vps-2", status="stopped")
+
+        # An empty value must never widen the match to the whole fleet
+        assert manager.select_vps(status="") == []
+        assert manager.select_vps(names=[]) == []
+
+    run_manager(scenario)
+
+def test_bulk_runs_every_vps_as_a_job(run_manager):
+    async def scenario(manager, daemon):
+        success, message, created = await manager.create_vps_batch(1, 1, 10, 3)
+        assert success, message
+        assert await manager.wait_until_created(created) == {}
+        names = [vps.name for vps in created]
+
+        results = await manager.bulk("stop", names + ["vps-missing"])
+        assert all(results[name][0] for name in names)
+        assert results["vps-missing"][0] is False
+        assert all(manager.vps_instances[name].status == "stopped" for name in names)
+
+        results = await manager.bulk("delete", names)
+        assert all(success for success, _ in results.values())
+        assert manager.vps_instances == {}
+        assert daemon.containers == {}
+
+    run_manager(scenario)
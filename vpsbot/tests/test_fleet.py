@@ -0,0 +1,58 @@
+from cpuset import CpusetAllocator
+from scheduler import Resources
+
+# 8 GB host minus the 2 GB HOST_RESERVED_RAM_GB leaves 6 GB for VPSes
+SMALL_HOST = {"mem_total": 8 * 1024 ** 3, "ncpu": 4}
+
+def test_vps_stays_on_its_node(run_manager):
+    async def scenario(manager, daemon):
+        manager.drain_node("a")
+        success, message, vps = await manager.create_vps(2, 1, 10)
+        assert success, message
+        await manager.wait_until_created([vps])
+        assert manager.node_of(vps).name == "b"
+        assert vps.container_id not in daemon.containers
+
+        success, message = await manager.stop_vps(vps.name)
+        assert success, message
+        assert vps.status == "stopped"
+
+    run_manager(scenario, nodes=("a", "b"), **SMALL_HOST)
+
+def test_full_fleet_rejects(run_manager):
+    async def scenario(manager, daemon):
+        created = []
+        for _ in range(4):
+            success, message, vps = await manager.create_vps(3, 1, 10)
+            assert success, message
+            created.append(vps)
+        assert {manager.node_of(vps).name for vps in created} == {"a", "b"}
+
+        success, message, _ = await manager.create_vps(1, 1, 10)
+        assert not success
+        assert manager.nodes.pending() == 0
+
+    run_manager(scenario, nodes=("a", "b"), **SMALL_HOST)
+
+def test_no_reservation_left_when_cores_are_taken(run_manager):
+    async def scenario(manager, daemon):
+        roomy, pinnable = manager.nodes.nodes["a"], manager.nodes.nodes["b"]
+        # "a" has the RAM but all of its pinnable cores are taken; "b" has free cores but no RAM
+        roomy.cpusets = CpusetAllocator({0: [0, 1]}, [0, 1])
+        roomy.cpusets.allocate("vps-other", 2)
+        pinnable.cpusets = CpusetAllocator({0: [0, 1]}, [0, 1])
+        pinnable.scheduler.physical = Resources(ram_gb=3, cpu_cores=4, disk_gb=100)
+
+        placed, reason = manager.nodes.reserve(object(), 2, 1, 10, cpuset_key="vps-new")
+        assert placed is None
+        assert "dedicated cores" in reason
+        assert manager.nodes.pending() == 0
+        assert "vps-new" not in roomy.cpusets.allocations
+        assert "vps-new" not in pinnable.cpusets.allocations
+
+        success, message, _ = await manager.create_vps(2, 1, 10, pinned=True)
+        assert not success
+        assert manager.nodes.pending() == 0
+        assert roomy.scheduler.committed().ram_gb == 0
+
+    run_manager(scenario, nodes=("a", "b"), **SMALL_HOST)
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+import vps_manager
+
+@pytest.fixture(autouse=True)
+def idle_policy(monkeypatch):
+    monkeypatch.setattr(vps_manager, "IDLE_PAUSE_AFTER", 600)
+    monkeypatch.setattr(vps_manager, "IDLE_STOP_AFTER", 3600)
+
+def idle_for(manager, vps, seconds):
+    """Pretend a VPS has shown no CPU, network or tmate activity for ``seconds``"""
+    manager.stats_collector.recent = lambda name, metric, window: 0.0
+    manager.idle_policy.last_active[vps.name] = time.time() - seconds
+
+def test_paused_then_stopped_to_free_capacity(run_manager):
+    async def scenario(manager, daemon):
+        scheduler = manager.nodes.primary.scheduler
+        _, _, vps = await manager.create_vps(2, 1, 10)
+        assert await manager.wait_until_created([vps]) == {}
+
+        idle_for(manager, vps, 601)
+        await manager.idle_policy.check()
+        assert vps.status == "paused"
+        assert daemon.containers[vps.container_id].status == "paused"
+        # Frozen memory is still charged to the container
+        assert scheduler.committed().ram_gb == 2
+
+        idle_for(manager, vps, 3601)
+        await manager.idle_policy.check()
+        assert vps.status == "stopped"
+        assert vps.idle_suspended
+        assert scheduler.committed().ram_gb == 0
+        assert manager.idle_policy.stats()["reclaimed_ram_gb"] == 2
+
+        success, message = await manager.resume_vps(vps.name)
+        assert success, message
+        assert vps.status == "running"
+        assert not vps.idle_suspended
+        assert scheduler.committed().ram_gb == 2
+
+    run_manager(scenario)
+
+def test_resume_restarts_tmate(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(2, 1, 10)
+        await manager.wait_until_created([vps])
+        refreshed = []
+        refresh = manager.refresh_tmate_session
+
+        async def spy(name):
+            refreshed.append(name)
+            return await refresh(name)
+
+        manager.refresh_tmate_session = spy
+        idle_for(manager, vps, 601)
+        await manager.idle_policy.check()
+        success, message = await manager.resume_vps(vps.name)
+        assert success, message
+        assert vps.status == "running"
+        # The old session dropped while the VPS was frozen
+        assert refreshed == [vps.name]
+        assert "new tmate session" in message
+
+    run_manager(scenario)
+
+def test_stopped_by_hand_stays_stopped(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(2, 1, 10)
+        await manager.wait_until_created([vps])
+        await manager.stop_vps(vps.name)
+
+        success, _ = await manager.resume_vps(vps.name)
+        assert not success
+        assert vps.status == "stopped"
+
+    run_manager(scenario)
@@ -0,0 +1,79 @@
+import asyncio
+
+# Creating takes long enough to submit something else meanwhile
+SLOW_START = {"op_latency": {"POST /containers/{id}/start": 0.2}}
+
+async def running(jobs, job):
+    for _ in range(200):
+        if job.status == "running":
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job #{job.id} never started")
+
+def test_delete_waits_for_a_running_create(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        create = manager.jobs.pending(vps.name, "create")
+        await running(manager.jobs, create)
+
+        success, message, delete = manager.submit_job("delete", vps.name)
+        assert success, message
+        await asyncio.sleep(0.05)
+        # Queued behind the create instead of running alongside it
+        assert delete.status == "queued"
+
+        await manager.jobs.join()
+        assert create.status == "done"
+        assert delete.status == "done", delete.result
+        assert vps.name not in manager.vps_instances
+        assert daemon.containers == {}
+
+    run_manager(scenario, **SLOW_START)
+
+def test_delete_cancels_a_queued_create(run_manager):
+    async def scenario(manager, daemon):
+        # Hold creates in the queue
+        manager.jobs.limits = {**manager.jobs.limits, "create": 0}
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        create = manager.jobs.pending(vps.name, "create")
+
+        success, message, delete = manager.submit_job("delete", vps.name)
+        assert success, message
+        assert create.status == "failed"
+        assert "Cancelled" in create.result
+
+        await manager.jobs.wait(delete)
+        assert delete.status == "done", delete.result
+        assert vps.name not in manager.vps_instances
+        assert daemon.containers == {}
+        assert manager.nodes.primary.scheduler.committed().ram_gb == 0
+
+    run_manager(scenario)
+
+def test_direct_delete_waits_for_a_running_create(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        create = manager.jobs.pending(vps.name, "create")
+        await running(manager.jobs, create)
+
+        success, message = await manager.delete_vps(vps.name)
+        assert success, message
+        assert create.status == "done"
+        assert daemon.containers == {}
+
+    run_manager(scenario, **SLOW_START)
+
+def test_other_vpses_are_not_held_up(run_manager):
+    async def scenario(manager, daemon):
+        _, _, slow = await manager.create_vps(1, 1, 10)
+        await running(manager.jobs, manager.jobs.pending(slow.name, "create"))
+        _, _, other = await manager.create_vps(1, 1, 10)
+        await manager.wait_until_created([other])
+        await manager.stop_vps(other.name)
+
+        success, message, stop = manager.submit_job("restart", other.name)
+        assert success, message
+        await manager.jobs.wait(stop)
+        assert stop.status == "done", stop.result
+
+    run_manager(scenario, **SLOW_START)
@@ -0,0 +1,68 @@
+import pytest
+
+from vps_manager import VPSConfig
+
+def test_create_and_delete(run_manager):
+    async def scenario(manager, daemon):
+        success, message, vps = await manager.create_vps(2, 1, 10, owner=42)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert vps.status == "running"
+        assert vps.tmate_session
+        assert daemon.containers[vps.container_id].status == "running"
+        assert manager.store.load()[0].name == vps.name
+
+        success, message = await manager.delete_vps(vps.name)
+        assert success, message
+        assert vps.name not in manager.vps_instances
+        assert vps.container_id not in daemon.containers
+        assert manager.store.load() == []
+        assert manager.store.load_deleted(vps.name).owner == 42
+
+    run_manager(scenario)
+
+def test_unknown_vps(run_manager):
+    async def scenario(manager, daemon):
+        assert await manager.delete_vps("vps-missing") == (False, "VPS not found")
+        assert (await manager.stop_vps("vps-missing"))[0] is False
+
+    run_manager(scenario)
+
+def test_restart_keeps_record(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(2, 1, 10)
+        await manager.wait_until_created([vps])
+        success, message = await manager.stop_vps(vps.name)
+        assert success, message
+        assert vps.status == "stopped"
+        success, message = await manager.restart_vps(vps.name)
+        assert success, message
+        assert manager.vps_instances[vps.name].status == "running"
+        assert isinstance(manager.vps_instances[vps.name], VPSConfig)
+
+    run_manager(scenario)
+
+def test_create_and_delete_on_the_local_node(run_manager):
+    async def scenario(manager, daemon):
+        assert manager.nodes.primary.local
+        success, message, vps = await manager.create_vps(2, 1, 10)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert vps.tmate_session
+
+        success, message = await manager.delete_vps(vps.name)
+        assert success, message
+        assert daemon.containers == {}
+
+    run_manager(scenario, local=True)
+
+@pytest.mark.parametrize("stream_type", ["application/vnd.docker.raw-stream",
+                                         "application/vnd.docker.multiplexed-stream"])
+def test_exec_output_is_demultiplexed(run_manager, stream_type):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(2, 1, 10)
+        await manager.wait_until_created([vps])
+        result = await manager.nodes.primary.backend.exec(vps.container_id, "cat /tmp/tmate_info")
+        assert result.output == f"{vps.tmate_session}\n".encode()
+
+    run_manager(scenario, stream_type=stream_type)
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import time
+import uuid
+
+import pytest
+
+import network
+import vps_manager
+from network import TrafficShaper, missing_privileges
+
+@pytest.fixture
+def veth_pid():
+    """A process in its own network namespace whose eth0 is a veth, like a container's; yields its pid and host veth"""
+    if missing_privileges():
+        pytest.skip(f"traffic shaping {missing_privileges()}")
+    suffix = uuid.uuid4().hex[:6]
+    namespace, veth = f"vpsbot-test-{suffix}", f"vbt{suffix}"
+    subprocess.run(["ip", "netns", "add", namespace], check=True)
+    process = None
+    try:
+        subprocess.run(["ip", "link", "add", veth, "type", "veth", "peer", "name", "eth0", "netns", namespace],
+                       check=True)
+        process = subprocess.Popen(["ip", "netns", "exec", namespace, "sleep", "60"])
+        # ip only enters the namespace once it runs; until then the pid still sees the host's eth0
+        for _ in range(100):
+            if os.readlink(f"/proc/{process.pid}/ns/net") != os.readlink("/proc/self/ns/net"):
+                break
+            time.sleep(0.01)
+        yield process.pid, veth
+    finally:
+        if process:
+            process.kill()
+            process.wait()
+        subprocess.run(["ip", "link", "del", veth], capture_output=True)
+        subprocess.run(["ip", "netns", "del", namespace], check=True)
+
+def test_rates_scale_with_cores():
+    shaper = TrafficShaper(egress_mbit_per_core=10, ingress_mbit_per_core=0)
+    assert shaper.rates(4) == (40, 0)
+
+def test_shape_finds_the_host_veth(veth_pid):
+    pid, veth = veth_pid
+    assert network.host_veth(pid) == veth
+
+    # Only the download limit; the upload policer needs act_police, which not every kernel has
+    shaper = TrafficShaper(egress_mbit_per_core=0, ingress_mbit_per_core=25)
+    assert shaper.shape("vps-test", pid, 2) == veth
+    classes = subprocess.run(["tc", "class", "show", "dev", veth], capture_output=True, text=True).stdout
+    assert "rate 50Mbit" in classes
+    assert shaper.check("vps-test", 2)
+    assert shaper.counters("vps-test") == (0, 0)
+
+    # Reshaping after a resize only changes the class rate
+    shaper.shape("vps-test", pid, 4)
+    classes = subprocess.run(["tc", "class", "show", "dev", veth], capture_output=True, text=True).stdout
+    assert "rate 100Mbit" in classes
+
+    subprocess.run(["tc", "qdisc", "del", "dev", veth, "root"], check=True)
+    assert not shaper.check("vps-test", 4)
+
+def test_shaping_is_off_without_privileges(run_manager, monkeypatch):
+    monkeypatch.setattr(vps_manager, "NET_INGRESS_MBIT_PER_CORE", 25)
+    monkeypatch.setattr(vps_manager, "missing_privileges", lambda: "needs root (CAP_NET_ADMIN)")
+
+    async def scenario(manager, daemon):
+        assert not manager.shaper.available
+        success, message, vps = await manager.create_vps(1, 1, 10)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert manager.shaper.veths == {}
+
+    run_manager(scenario, local=True)
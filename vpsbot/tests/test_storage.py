@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import pytest
+
+import vps_manager
+
+def expire(storage, name):
+    """Age a trashed volume past its grace period without waking the background reclaimer"""
+    storage.registry[name].deleted_at -= storage.grace_period
+
+def test_deleted_volume_is_trashed_and_restored(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(1, 1, 10, owner=42)
+        assert await manager.wait_until_created([vps]) == {}
+        path = manager.volumes.path(vps.name)
+        assert os.path.isdir(path)
+        assert manager.storage.registry[vps.name].status == "active"
+        with open(os.path.join(path, "data"), "w") as f:
+            f.write("kept")
+
+        success, message = await manager.delete_vps(vps.name)
+        assert success, message
+        assert manager.storage.registry[vps.name].status == "trash"
+        assert os.path.exists(os.path.join(path, "data"))
+
+        success, message, restored = await manager.undelete_vps(vps.name)
+        assert success, message
+        assert await manager.wait_until_created([restored]) == {}
+        assert restored.owner == 42
+        assert manager.storage.registry[vps.name].status == "active"
+        with open(os.path.join(path, "data")) as f:
+            assert f.read() == "kept"
+
+    run_manager(scenario, local=True)
+
+def test_reclaimer_removes_trashed_volumes(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        await manager.wait_until_created([vps])
+        await manager.delete_vps(vps.name)
+
+        expire(manager.storage, vps.name)
+        await manager.storage.reclaim_due()
+        assert not manager.volumes.exists(vps.name)
+        assert vps.name not in manager.storage.registry
+        assert manager.storage.reclaimed == 1
+        assert (await manager.undelete_vps(vps.name))[0] is False
+
+    run_manager(scenario, local=True)
+
+def test_reconcile_trashes_orphans_only(run_manager):
+    async def scenario(manager, daemon):
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        await manager.wait_until_created([vps])
+        os.makedirs(manager.volumes.path("vps-orphan"))
+        os.makedirs(manager.volumes.path("not-a-volume"))
+        manager.storage.ORPHAN_MIN_AGE = 0
+
+        manager.storage.reconcile(manager._volumes_in_use())
+        assert manager.storage.registry["vps-orphan"].status == "trash"
+        assert manager.storage.registry[vps.name].status == "active"
+        assert "not-a-volume" not in manager.storage.registry
+        assert manager.storage.orphans == 1
+
+    run_manager(scenario, local=True)
+
+needs_loopback = pytest.mark.skipif(os.geteuid() != 0 or not shutil.which("mkfs.ext4"),
+                                    reason="loopback volumes need root and mkfs.ext4")
+
+@needs_loopback
+def test_loopback_volume_caps_size_and_io(run_manager, monkeypatch):
+    monkeypatch.setattr(vps_manager, "DISK_QUOTA", "loopback")
+
+    async def scenario(manager, daemon):
+        success, message, vps = await manager.create_vps(1, 1, 5)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        device = manager.volumes.mounted(vps.name)
+        assert device and device.startswith("/dev/loop")
+        stats = os.statvfs(manager.volumes.path(vps.name))
+        assert stats.f_blocks * stats.f_frsize <= 5 * 1024 ** 3
+        host_config = daemon.containers[vps.container_id].host_config
+        assert {"Path": device, "Rate": 5 * 2 * 1024 ** 2} in host_config["BlkioDeviceWriteBps"]
+
+        await manager.delete_vps(vps.name)
+        expire(manager.storage, vps.name)
+        await manager.storage.reclaim_due()
+        assert manager.volumes.mounted(vps.name) is None
+        assert not manager.volumes.exists(vps.name)
+
+    run_manager(scenario, local=True)
+
+def test_loopback_needs_root(run_manager, monkeypatch):
+    monkeypatch.setattr(vps_manager, "DISK_QUOTA", "loopback")
+    monkeypatch.setattr(vps_manager, "STORAGE_OWNER", "1000:1000")
+    monkeypatch.setattr(os, "geteuid", lambda: 1000)
+
+    async def scenario(manager, daemon):
+        assert not manager.volumes.loopback
+        assert manager.storage.owner is None
+        _, _, vps = await manager.create_vps(1, 1, 10)
+        assert await manager.wait_until_created([vps]) == {}
+        assert os.path.isdir(manager.volumes.path(vps.name))
+
+    run_manager(scenario, local=True)
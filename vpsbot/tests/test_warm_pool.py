@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import vps_manager
+
+@pytest.fixture(autouse=True)
+def warm_pool(monkeypatch):
+    monkeypatch.setattr(vps_manager, "WARM_POOL_ENABLED", True)
+    monkeypatch.setattr(vps_manager, "WARM_POOL_SIZES", [(2, 1, 10)])
+
+async def filled(pool, count=2):
+    """Wait until the pool's only size class has ``count`` ready containers"""
+    for _ in range(200):
+        if len(pool.ready[(2, 1, 10)]) >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"warm pool never reached {count} ready containers")
+
+def test_create_claims_a_warm_container(run_manager):
+    async def scenario(manager, daemon):
+        pool = manager.warm_pool
+        await filled(pool)
+        warm = pool.ready[(2, 1, 10)][0]
+
+        success, message, vps = await manager.create_vps(2, 1, 10, owner=42)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert pool.claims == 1
+        assert vps.container_id == warm.container_id
+        assert daemon.containers[vps.container_id].name == vps.name
+        assert vps.tmate_session == warm.tmate_session
+        # The warm container's volume now belongs to the VPS
+        assert manager.storage.registry[vps.volume].vps == vps.name
+
+        # Falling below the low watermark refills the class up to the high one
+        _, _, second = await manager.create_vps(2, 1, 10)
+        await manager.wait_until_created([second])
+        assert pool.claims == 2
+        await filled(pool)
+
+    run_manager(scenario, local=True)
+
+def test_claimed_container_is_resized(run_manager):
+    async def scenario(manager, daemon):
+        await filled(manager.warm_pool)
+
+        success, message, vps = await manager.create_vps(4, 2, 10)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert manager.warm_pool.claims == 1
+        host_config = daemon.containers[vps.container_id].host_config
+        assert host_config["Memory"] == 4 * 1024 ** 3
+        assert host_config["CpuQuota"] == 200000
+
+    run_manager(scenario, local=True)
+
+def test_other_disk_sizes_miss(run_manager):
+    async def scenario(manager, daemon):
+        await filled(manager.warm_pool)
+
+        success, message, vps = await manager.create_vps(2, 1, 20)
+        assert success, message
+        assert await manager.wait_until_created([vps]) == {}
+        assert manager.warm_pool.claims == 0
+        assert len(manager.warm_pool.ready[(2, 1, 10)]) == 2
+
+    run_manager(scenario, local=True)
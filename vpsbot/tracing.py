@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import IO, Dict, Iterator, List, Optional
+
+@dataclass
+class Span:
+    vps: str
+    name: str
+    start: float
+    duration: float = 0.0
+    outcome: str = "ok"
+    detail: Optional[str] = None
+
+class Trace:
+    """Timed stages of provisioning (and later operations) of one VPS"""
+
+    def __init__(self, vps_name: str, tracer: Optional["Tracer"] = None):
+        self.vps_name = vps_name
+        self.tracer = tracer
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, detail: Optional[str] = None) -> Iterator[Span]:
+        """Time the enclosed block; an exception marks the span as failed and propagates.
+
+        The block may set ``outcome`` or ``detail`` on the yielded span.
+        """
+        span = Span(self.vps_name, name, time.time(), detail=detail)
+        started = time.monotonic()
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                span.outcome = "cancelled"
+            elif isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+                span.outcome = "timeout"
+            else:
+                span.outcome = "error"
+            span.detail = span.detail or str(e) or type(e).__name__
+            raise
+        finally:
+            span.duration = time.monotonic() - started
+            self._add(span)
+
+    def add(self, name: str, duration: float, outcome: str = "ok", detail: Optional[str] = None):
+        """Record a stage that was timed elsewhere"""
+        self._add(Span(self.vps_name, name, time.time() - duration, duration, outcome, detail))
+
+    def _add(self, span: Span):
+        self.spans.append(span)
+        if self.tracer is not None:
+            self.tracer._export(span)
+
+class Tracer:
+    """Keeps the traces of the most recent VPSes and streams spans to a JSONL file"""
+
+    def __init__(self, max_traces: int = 500, export_path: Optional[str] = None):
+        self.max_traces = max_traces
+        self.traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self.export_path = export_path
+        self._export_file: Optional[IO[str]] = None
+
+    def trace(self, vps_name: str) -> Trace:
+        """The trace of a VPS, started on first use"""
+        trace = self.traces.get(vps_name)
+        if trace is None:
+            trace = self.traces[vps_name] = Trace(vps_name, self)
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        return trace
+
+    def start(self, vps_name: str) -> Trace:
+        """A fresh trace for a VPS, replacing one left by an earlier VPS of the same name"""
+        self.traces.pop(vps_name, None)
+        return self.trace(vps_name)
+
+    def get(self, vps_name: str) -> Optional[Trace]:
+        return self.traces.get(vps_name)
+
+    def _export(self, span: Span):
+        if not self.export_path:
+            return
+        try:
+            if self._export_file is None:
+                self._export_file = open(self.export_path, "a", buffering=1)
+            self._export_file.write(json.dumps(asdict(span)) + "\n")
+        except OSError as e:
+            print(f"Error exporting trace span to {self.export_path}: {e}")
+            self.export_path = None
+
+    def export(self, f: IO[str]) -> int:
+        """Write every kept span to a text stream as JSON lines; returns the number of spans"""
+        # Copied first, so traces recorded meanwhile by the event loop don't disturb the iteration
+        spans = [span for trace in list(self.traces.values()) for span in list(trace.spans)]
+        for span in spans:
+            f.write(json.dumps(asdict(span)) + "\n")
+        return len(spans)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, mean and max duration across kept traces"""
+        stages: Dict[str, Dict[str, float]] = {}
+        for trace in self.traces.values():
+            for span in trace.spans:
+                stage = stages.setdefault(span.name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                stage["count"] += 1
+                stage["total_seconds"] += span.duration
+                stage["max_seconds"] = max(stage["max_seconds"], span.duration)
+        return stages
+
+    def close(self):
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
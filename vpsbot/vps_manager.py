@@ -1,12 +1,33 @@
-import docker
 import asyncio
 import os
-import subprocess
-import json
 import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-import psutil
+from config import (CONTAINER_BASE_PATH, CPU_OVERCOMMIT_RATIO, CPU_PINNING_CORES, DEFAULT_VPS_PREFIX, DISK_IO_DEVICE, DISK_IOPS_PER_GB,
+                    DISK_MBPS_PER_GB, DISK_OVERCOMMIT_RATIO, DISK_QUOTA, DOCKER_HOST, DOCKER_NODES, NET_EGRESS_MBIT_PER_CORE,
+                    NET_INGRESS_MBIT_PER_CORE, VPS_NETWORK,
+                    HOST_HISTORY_SECONDS, HOST_RESERVED_RAM_GB, IDLE_CHECK_INTERVAL, IDLE_CPU_PERCENT, IDLE_NET_KBPS,
+                    IDLE_PAUSE_AFTER, IDLE_STOP_AFTER, JOB_LIMITS, JOB_PRIORITIES, JOB_RETENTION_DAYS, JOB_WORKERS, HOST_SAMPLE_INTERVAL, NODE_HEALTH_INTERVAL, NODE_MAX_FAILURES, PLACEMENT_STRATEGY,
+                    MAX_BATCH_SIZE, MAX_CPU_CORES, RESIZE_MAX_USAGE, SNAPSHOT_REPO, MAX_DISK_GB, MAX_RAM_GB, MAX_VPS_COUNT, RAM_OVERCOMMIT_RATIO, STATE_DB_PATH,
+                    STATE_RESYNC_INTERVAL, STATS_HISTORY_SECONDS, STORAGE_GRACE_PERIOD, STORAGE_OWNER, STORAGE_RECLAIM_INTERVAL, TRACE_EXPORT_PATH, TRACE_MAX_VPS, VERIFY_VPS_IMAGE, VPS_IMAGE, TMATE_RUNTIME_INSTALL, TMATE_READY_TIMEOUT,
+                    WARM_POOL_ENABLED, WARM_POOL_SIZES, WARM_POOL_LOW_WATERMARK, WARM_POOL_HIGH_WATERMARK, WARM_POOL_MAX_RESERVED_RAM_GB)
+from build_image import HASH_LABEL, content_hash
+from cpuset import CpusetAllocator, format_cpulist, parse_cpulist, read_topology
+from docker_backend import ContainerSpec, DockerBackend, DockerNotFound, container_name, make_backend
+from host_sampler import HostSampler
+from idle_policy import IdlePolicy
+from job_queue import Job, JobQueue
+from metrics import Histogram, MetricsRegistry
+from network import TrafficShaper, missing_privileges
+from node_pool import Node, NodePool, parse_nodes
+from readiness import wait_until
+from scheduler import ACTIVE_STATUSES, CapacityScheduler
+from snapshots import SNAPSHOT_NAME, SNAPSHOT_VOLUME_PREFIX, Snapshot
+from state_store import StateStore
+from stats_collector import StatsCollector
+from storage import QUOTA_MODES, StorageManager, VolumeManager, block_device, parse_owner
+from tracing import Trace, Tracer
+from warm_pool import POOL_PREFIX, WarmPool
 
 @dataclass
 class VPSConfig:
@@ -18,219 +39,1167 @@ class VPSConfig:
     status: str = "creating"
     tmate_session: Optional[str] = None
     created_at: Optional[float] = None
+    node: Optional[str] = None
+    owner: Optional[int] = None  # Discord user id of whoever created it
+    idle_suspended: bool = False  # Paused or stopped by the idle policy, resumed on next use
+    cpuset: Optional[str] = None  # Dedicated host cores of a pinned VPS, e.g. "4-7"
+    volume: Optional[str] = None  # Storage directory under CONTAINER_BASE_PATH; the VPS name unless claimed from the warm pool
+    image: Optional[str] = None  # Snapshot image a clone runs; VPS_IMAGE otherwise
+
+# Docker container states mapped onto the statuses shown to users
+CONTAINER_STATUS = {
+    "running": "running",
+    "paused": "paused",
+    "restarting": "restarting",
+    "created": "stopped",
+    "exited": "stopped",
+    "dead": "stopped",
+}
+
+# Docker event actions that change a VPS status
+EVENT_STATUS = {
+    "start": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "restart": "running",
+    "die": "stopped",
+    "stop": "stopped",
+    "kill": "stopped",
+    "oom": "oom-killed",
+}
+
+# CpuQuota of pinned containers: unlimited on their own cores. 0 would mean "unchanged" to an update
+NO_CPU_QUOTA = -1
 
 class VPSManager:
-    def __init__(self):
+    def __init__(self, backend: Optional[DockerBackend] = None, nodes: Optional[Dict[str, DockerBackend]] = None):
+        if DISK_QUOTA not in QUOTA_MODES:
+            raise ValueError(f"Unknown disk quota mode: {DISK_QUOTA}")
+        self.sampler = HostSampler(HOST_SAMPLE_INTERVAL, HOST_HISTORY_SECONDS, CONTAINER_BASE_PATH)
+        if nodes is None:
+            if backend is not None:
+                nodes = {"local": backend}
+            else:
+                nodes = {name: make_backend(url) for name, url in parse_nodes(DOCKER_NODES, DOCKER_HOST)}
+        self.nodes = NodePool(
+            [self._make_node(name, node_backend) for name, node_backend in nodes.items()],
+            strategy=PLACEMENT_STRATEGY,
+            max_failures=NODE_MAX_FAILURES,
+            check_interval=NODE_HEALTH_INTERVAL
+        )
+        # The primary node also hosts the warm pool
+        self.backend = self.nodes.primary.backend
+        self.vps_instances: Dict[str, VPSConfig] = {}
+        self.snapshots: Dict[str, Snapshot] = {}
+        self.store = StateStore(STATE_DB_PATH, VPSConfig)
+        loopback, owner = DISK_QUOTA == "loopback", parse_owner(STORAGE_OWNER)
+        if os.geteuid() != 0:
+            # Checked once here, so a non-root install doesn't fail every !create
+            if loopback:
+                print("⚠️ DISK_QUOTA=loopback needs root (mkfs, losetup, mount); VPS volumes get no size limit")
+                loopback = False
+            if owner is not None and owner != (os.getuid(), os.getgid()):
+                print(f"⚠️ STORAGE_OWNER={STORAGE_OWNER} needs root; VPS volumes stay owned by uid {os.getuid()}")
+                owner = None
+        self.volumes = VolumeManager(CONTAINER_BASE_PATH, loopback=loopback)
+        self.storage = StorageManager(self.volumes, self.store, owner, STORAGE_GRACE_PERIOD,
+                                      STORAGE_RECLAIM_INTERVAL, (DEFAULT_VPS_PREFIX, POOL_PREFIX))
+        self.shaper = TrafficShaper(NET_EGRESS_MBIT_PER_CORE, NET_INGRESS_MBIT_PER_CORE)
+        problem = missing_privileges() if any(node.local for node in self.nodes) else None
+        if problem:
+            # Checked once here, so a non-root install doesn't log an error on every start
+            if any(self.shaper.rates(1)):
+                print(f"⚠️ Traffic shaping {problem}; VPS bandwidth is not limited")
+            self.shaper.available = False
+        self._shaping = set()
+        self._ignored_containers = set()
+        # Numeric part of the last VPS name handed out
+        self._last_name_id = 0
+        self._image_tmate: Dict[Tuple[str, str], bool] = {}
+        self.jobs = JobQueue(
+            self.store,
+            {"create": self._run_create, "stop": self._run_stop, "delete": self._run_delete,
+             "restart": self._run_restart},
+            workers=JOB_WORKERS,
+            limits=JOB_LIMITS,
+            priorities=JOB_PRIORITIES
+        )
+        self.tmate_ready_seconds = Histogram()
+        self.tracer = Tracer(TRACE_MAX_VPS, TRACE_EXPORT_PATH or None)
+        self.metrics = MetricsRegistry()
+        self.stats_collector = StatsCollector(self, STATS_HISTORY_SECONDS)
+        self.warm_pool: Optional[WarmPool] = None
+        if WARM_POOL_ENABLED:
+            self.warm_pool = WarmPool(
+                self,
+                self.nodes.primary,
+                WARM_POOL_SIZES,
+                low=WARM_POOL_LOW_WATERMARK,
+                high=WARM_POOL_HIGH_WATERMARK,
+                max_reserved_ram_gb=WARM_POOL_MAX_RESERVED_RAM_GB
+            )
+        self.idle_policy: Optional[IdlePolicy] = None
+        if IDLE_PAUSE_AFTER:
+            self.idle_policy = IdlePolicy(
+                self,
+                pause_after=IDLE_PAUSE_AFTER,
+                stop_after=IDLE_STOP_AFTER,
+                cpu_percent=IDLE_CPU_PERCENT,
+                net_kbps=IDLE_NET_KBPS,
+                interval=IDLE_CHECK_INTERVAL
+            )
+        self._tasks: List[asyncio.Task] = []
+        self._register_metrics()
+
+    def _make_node(self, name: str, backend: DockerBackend) -> Node:
+        url = getattr(backend, "url", None) or DOCKER_HOST
+        local = url.startswith("unix://")
+        scheduler = CapacityScheduler(
+            self,
+            node=name,
+            ram_overcommit=RAM_OVERCOMMIT_RATIO,
+            cpu_overcommit=CPU_OVERCOMMIT_RATIO,
+            disk_overcommit=DISK_OVERCOMMIT_RATIO,
+            host_reserved_ram_gb=HOST_RESERVED_RAM_GB,
+            # Only a local daemon's disk can be measured from here
+            disk_path=CONTAINER_BASE_PATH if local else None,
+            sampler=self.sampler if local else None
+        )
+        return Node(name, url, backend, scheduler)
+
+    def _register_metrics(self):
+        """Export manager state; everything is read at scrape time, nothing is recorded twice"""
+        self.metrics.collect(
+            "docker_operation_seconds", "Latency of Docker API calls", "histogram", ("node", "operation"),
+            lambda: [((node.name, op), histogram) for node in self.nodes
+                     for op, histogram in list(node.backend.op_stats.latency.items())]
+        )
+        self.metrics.collect(
+            "docker_operation_failures_total", "Failed Docker API calls", "counter", ("node", "operation", "reason"),
+            lambda: [((node.name, op, reason), stats[f"{reason}s"]) for node in self.nodes
+                     for op, stats in list(node.backend.op_stats.ops.items()) for reason in ("error", "timeout")]
+        )
+        self.metrics.collect(
+            "docker_queue_depth", "Docker calls waiting for a worker or connection", "gauge", ("node", "lane"),
+            lambda: [((node.name, lane), stats["queued"]) for node in self.nodes
+                     for lane, stats in node.backend.stats_summary()["lanes"].items()]
+        )
+        self.metrics.collect(
+            "docker_in_flight", "Docker calls or streams currently running", "gauge", ("node", "lane"),
+            lambda: [((node.name, lane), stats["running"]) for node in self.nodes
+                     for lane, stats in node.backend.stats_summary()["lanes"].items()]
+        )
+        self.metrics.collect(
+            "tmate_ready_seconds", "Time from container start to a usable tmate session", "histogram", (),
+            lambda: [((), self.tmate_ready_seconds)]
+        )
+        self.metrics.collect("vps", "VPS instances by node and status", "gauge", ("node", "status"), self._fleet_counts)
+        self.metrics.collect(
+            "node_healthy", "Whether a Docker node answers health checks", "gauge", ("node",),
+            lambda: [((node.name,), int(node.healthy)) for node in self.nodes]
+        )
+        self.metrics.collect(
+            "node_headroom", "Capacity left for new VPSes", "gauge", ("node", "resource"),
+            lambda: [((node.name, resource), value) for node in self.nodes
+                     for resource, value in node.scheduler.stats()["headroom"].items()]
+        )
+        self.metrics.collect(
+            "pinned_cores", "Dedicated cores for pinned VPSes", "gauge", ("node", "state"),
+            lambda: [((node.name, state), value) for node in self.nodes if node.cpusets
+                     for state, value in (("used", node.cpusets.stats()["used"]),
+                                          ("free", len(node.cpusets.free())))]
+        )
+        self.metrics.collect(
+            "storage_volumes", "VPS volumes on the local node by lifecycle state", "gauge", ("state",),
+            lambda: [((state,), self.storage.stats()[state]) for state in ("active", "trash")]
+        )
+        self.metrics.collect(
+            "storage_reclaimed_total", "Trashed volumes removed by the reclaimer", "counter", (),
+            lambda: [((), self.storage.reclaimed)]
+        )
+        self.metrics.collect(
+            "jobs", "Lifecycle jobs queued or running", "gauge", ("op", "state"),
+            lambda: [((op, state), count) for op, counts in self.jobs.stats().items() for state, count in counts.items()]
+        )
+        self.metrics.collect(
+            "idle_suspended", "VPSes paused or stopped by the idle policy", "gauge", ("action",),
+            lambda: [((action,), self.idle_policy.stats()[action]) for action in ("paused", "stopped")]
+                    if self.idle_policy else []
+        )
+        self.metrics.collect(
+            "idle_reclaimed_ram_gb", "RAM freed up by idle VPSes", "gauge", (),
+            lambda: [((), self.idle_policy.stats()["reclaimed_ram_gb"])] if self.idle_policy else []
+        )
+        self.metrics.collect(
+            "warm_pool_ready", "Warm containers ready to claim", "gauge", ("size",),
+            lambda: [((size,), count) for size, count in self.warm_pool.stats()["ready"].items()] if self.warm_pool else []
+        )
+
+    def _fleet_counts(self):
+        counts: Dict[Tuple[str, str], int] = {}
+        for vps in self.vps_instances.values():
+            key = (self.node_of(vps).name, vps.status)
+            counts[key] = counts.get(key, 0) + 1
+        return counts.items()
+
+    async def start(self):
+        """Connect to Docker, load existing VPS containers and start background tasks"""
         try:
-            self.client = docker.from_env()
-            # Test the connection
-            self.client.ping()
+            await self.sampler.sample()
         except Exception as e:
-            print(f"Docker connection error: {e}")
+            print(f"Error sampling host resources: {e}")
+        self._tasks.append(asyncio.create_task(self.sampler.run()))
+        reachable = 0
+        for node in self.nodes:
+            try:
+                # Test the connection
+                await node.backend.ping()
+                reachable += 1
+            except Exception as e:
+                print(f"Docker connection error on node {node.name}: {e}")
+                node.healthy = False
+                node.last_error = str(e)
+                continue
+            try:
+                await node.scheduler.refresh(node.backend)
+            except Exception as e:
+                print(f"Error reading capacity of node {node.name}, admission control disabled there: {e}")
+            if CPU_PINNING_CORES:
+                self._init_cpusets(node)
+            if DISK_MBPS_PER_GB or DISK_IOPS_PER_GB:
+                node.io_device = DISK_IO_DEVICE or await self._docker_root_device(node)
+            if VPS_NETWORK:
+                await self._ensure_network(node)
+            if VERIFY_VPS_IMAGE:
+                await self._verify_image(node)
+        if not reachable:
             print("Please ensure Docker is running and accessible")
-            raise
-        self.vps_instances: Dict[str, VPSConfig] = {}
-        self.load_existing_containers()
+            raise RuntimeError("No Docker node is reachable")
+        if VERIFY_VPS_IMAGE and all(node.draining for node in self.nodes if node.healthy):
+            raise RuntimeError(f"No reachable Docker node has {VPS_IMAGE}; build it with: python3 build_image.py")
+        self.store.prune_jobs(time.time() - JOB_RETENTION_DAYS * 86400)
+        self.jobs.load()
+        try:
+            self.storage.load()
+        except Exception as e:
+            print(f"Error loading volume registry: {e}")
+        await self.load_existing_containers()
+        await self._mount_volumes()
+        for node in self.nodes:
+            if node.healthy:
+                await self._load_snapshots(node)
+        for vps in list(self.vps_instances.values()):
+            if vps.status == "running":
+                self._shape_later(vps)
+        self._tasks.append(asyncio.create_task(self.jobs.run()))
+        for node in self.nodes:
+            self._tasks.append(asyncio.create_task(self._watch_events(node)))
+        self._tasks.append(asyncio.create_task(self._resync_loop()))
+        self._tasks.append(asyncio.create_task(self._health_loop()))
+        self._tasks.append(asyncio.create_task(self.stats_collector.run()))
+        if self.idle_policy:
+            self._tasks.append(asyncio.create_task(self.idle_policy.run()))
+        if self.warm_pool:
+            if self.warm_pool.node.healthy:
+                try:
+                    await self.warm_pool.adopt_existing()
+                except Exception as e:
+                    print(f"Error adopting warm pool containers: {e}")
+            self._tasks.append(asyncio.create_task(self.warm_pool.run()))
+        if any(node.local for node in self.nodes):
+            self._reconcile_storage()
+            self._tasks.append(asyncio.create_task(self.storage.run()))
+
+    def _init_cpusets(self, node: Node):
+        """Set up the dedicated core allocator of a node from its CPU topology"""
+        if node.url.startswith("unix://"):
+            topology = read_topology()
+        else:
+            # A remote host's sysfs isn't readable from here; treat it as one NUMA node
+            topology = {0: list(range(int(node.scheduler.physical.cpu_cores)))}
+        node.cpusets = CpusetAllocator(topology, parse_cpulist(CPU_PINNING_CORES))
+        if not node.cpusets.total:
+            print(f"None of the cores {CPU_PINNING_CORES} exist on node {node.name}, CPU pinning is off there")
+            node.cpusets = None
+        elif not node.cpusets.shared:
+            print(f"Every core of node {node.name} is pinnable; shared VPSes will run on pinned cores too")
+
+    async def _docker_root_device(self, node: Node) -> Optional[str]:
+        """Disk holding the container root filesystems of the local node"""
+        if not node.local:
+            return None
+        try:
+            root = (await node.backend.info()).get("DockerRootDir") or "/var/lib/docker"
+        except Exception as e:
+            print(f"Error reading Docker root dir of node {node.name}, no block I/O limits there: {e}")
+            return None
+        return block_device(root)
+
+    def _io_limits(self, node: Node, disk_gb: int, loop_device: Optional[str]) -> Dict:
+        """Block I/O limits of a VPS, scaled with its disk, on its own volume and on the node's disk"""
+        devices = [device for device in (loop_device, node.io_device) if device]
+        bps = int(DISK_MBPS_PER_GB * disk_gb * 1024 ** 2)
+        iops = DISK_IOPS_PER_GB * disk_gb
+        limits = {}
+        if bps:
+            limits.update(device_read_bps={device: bps for device in devices},
+                          device_write_bps={device: bps for device in devices})
+        if iops:
+            limits.update(device_read_iops={device: iops for device in devices},
+                          device_write_iops={device: iops for device in devices})
+        return limits
+
+    async def _mount_volumes(self):
+        """Mount the loopback volumes of local VPSes that aren't, e.g. after a host reboot"""
+        if not self.volumes.loopback:
+            return
+        for vps in list(self.vps_instances.values()):
+            volume = vps.volume or vps.name
+            if not self.node_of(vps).local or not os.path.exists(self.volumes.image(volume)):
+                continue
+            try:
+                await self.volumes.mount_async(volume)
+            except Exception as e:
+                print(f"Error mounting storage of {vps.name}: {e}")
+
+    def release_volume(self, vps_config: VPSConfig, grace: bool = True):
+        """Trash the storage of a VPS or warm container on the local node; the reclaimer removes it later"""
+        if self.node_of(vps_config).local:
+            self.storage.release(vps_config.volume or vps_config.name, grace)
+
+    def _volumes_in_use(self) -> Dict[str, Tuple[str, int]]:
+        """Volumes of the local node that a VPS or warm container still needs"""
+        in_use = {}
+        warm = [warm for ready in self.warm_pool.ready.values() for warm in ready] if self.warm_pool else []
+        for vps in list(self.vps_instances.values()) + warm:
+            if self.node_of(vps).local:
+                in_use[vps.volume or vps.name] = (vps.name, vps.disk_gb)
+        return in_use
+
+    def _reconcile_storage(self):
+        try:
+            self.storage.reconcile(self._volumes_in_use())
+        except Exception as e:
+            print(f"Error reconciling VPS storage: {e}")
+
+    def _cpu_limits(self, vps_config: VPSConfig, cpu_cores: int) -> Dict:
+        """Docker CPU settings of a VPS: its own cores when pinned, a CFS quota on the shared cores otherwise"""
+        cpusets = self.node_of(vps_config).cpusets
+        if cpusets is None:
+            return {"cpu_quota": int(cpu_cores * 100000)}
+        if vps_config.cpuset and vps_config.name in cpusets.allocations:
+            cpus, mems = cpusets.describe(vps_config.name)
+            return {"cpu_quota": NO_CPU_QUOTA, "cpuset_cpus": cpus, "cpuset_mems": mems}
+        # Keep shared VPSes off the pinned cores
+        return {"cpu_quota": int(cpu_cores * 100000), "cpuset_cpus": format_cpulist(cpusets.shared) or None}
+
+    async def _ensure_network(self, node: Node):
+        """Create the bridge network VPSes are attached to unless the node already has it"""
+        try:
+            await node.backend.inspect_network(VPS_NETWORK)
+        except DockerNotFound:
+            try:
+                await node.backend.create_network(VPS_NETWORK, labels={"vpsbot": "true"})
+                print(f"Created network {VPS_NETWORK} on node {node.name}")
+            except Exception as e:
+                print(f"Error creating network {VPS_NETWORK} on node {node.name}: {e}")
+        except Exception as e:
+            print(f"Error inspecting network {VPS_NETWORK} on node {node.name}: {e}")
+
+    async def _verify_image(self, node: Node):
+        """Check that a node has the VPS image, built from the current build inputs.
+
+        A node without it is drained so ``!create`` never lands there; an image
+        built from older inputs only gets a warning. Images without the content
+        hash label (built elsewhere) are taken as they are.
+        """
+        try:
+            image = await node.backend.inspect_image(VPS_IMAGE)
+        except DockerNotFound:
+            print(f"❌ Image {VPS_IMAGE} is missing on node {node.name}; build it there with: python3 build_image.py")
+            node.draining = True
+            node.last_error = f"Image {VPS_IMAGE} is missing"
+            return
+        except Exception as e:
+            print(f"Error inspecting image {VPS_IMAGE} on node {node.name}: {e}")
+            return
+        built_from = ((image.get("Config") or {}).get("Labels") or {}).get(HASH_LABEL)
+        if built_from and built_from != content_hash():
+            print(f"⚠️ Image {VPS_IMAGE} on node {node.name} was built from older inputs "
+                  f"({built_from[:12]}, expected {content_hash()[:12]}); rebuild it with: python3 build_image.py")
+
+    async def _shape(self, vps_config: VPSConfig):
+        """Apply the bandwidth limits of a running VPS to its veth; only possible on the local node"""
+        node = self.node_of(vps_config)
+        if not node.local or not vps_config.container_id:
+            return
+        try:
+            state = (await node.backend.inspect_container(vps_config.container_id))["State"]
+            if not state.get("Pid"):
+                return
+            veth = await self.shaper.shape_async(vps_config.name, state["Pid"], vps_config.cpu_cores)
+        except Exception as e:
+            print(f"Error shaping traffic of {vps_config.name}: {e}")
+            return
+        egress, ingress = self.shaper.rates(vps_config.cpu_cores)
+        print(f"Shaped {vps_config.name} on {veth}: {egress:g} Mbit/s up, {ingress:g} Mbit/s down")
+
+    def _shape_later(self, vps_config: VPSConfig):
+        if not self.shaper.available or not self.node_of(vps_config).local:
+            return
+        task = asyncio.create_task(self._shape(vps_config))
+        self._shaping.add(task)
+        task.add_done_callback(self._shaping.discard)
+
+    async def close(self):
+        tasks = self._tasks + list(self._shaping)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.nodes.close()
+        self.store.close()
+        self.tracer.close()
+
+    def _persist(self, vps: VPSConfig, event: Optional[str] = None, detail: Optional[str] = None):
+        """Write a VPS record (and optionally a lifecycle event) to the state store"""
+        try:
+            self.store.save(vps)
+            if event:
+                self.store.record_event(vps.name, event, detail)
+        except Exception as e:
+            print(f"Error persisting state of {vps.name}: {e}")
+
+    def _forget(self, vps: VPSConfig, event: str):
+        self.nodes.release_cpuset(vps.name)
+        self.shaper.forget(vps.name)
+        # Kept for the grace period, so an undelete finds the data where it left it
+        self.release_volume(vps)
+        try:
+            self.store.mark_deleted(vps.name)
+            self.store.record_event(vps.name, event)
+        except Exception as e:
+            print(f"Error persisting deletion of {vps.name}: {e}")
+
+    def get_vps_history(self, vps_name: str, limit: int = 20) -> List[Dict]:
+        """Most recent lifecycle events of a VPS, including deleted ones"""
+        return self.store.history(vps_name, limit)
     
-    def load_existing_containers(self):
-        """Load existing VPS containers on startup"""
+    def config_from_container(self, container: Dict, node: Optional[str] = None) -> VPSConfig:
+        """Build a VPS config from a container list entry and its labels"""
+        labels = container.get("Labels") or {}
+        return VPSConfig(
+            name=container_name(container),
+            ram_gb=int(labels.get("vps.ram", "1")),
+            cpu_cores=int(labels.get("vps.cpu", "1")),
+            disk_gb=int(labels.get("vps.disk", "10")),
+            container_id=container["Id"],
+            status=CONTAINER_STATUS.get(container.get("State"), "unknown"),
+            node=node,
+            owner=int(labels["vps.owner"]) if labels.get("vps.owner", "").isdigit() else None
+        )
+
+    async def load_existing_containers(self):
+        """Load the VPS registry from the state store and reconcile it with Docker"""
         try:
-            containers = self.client.containers.list(all=True, filters={"label": "vpsbot=true"})
-            for container in containers:
-                if container.name.startswith("vps-"):
-                    # Extract VPS config from container labels
-                    ram = int(container.labels.get("vps.ram", "1"))
-                    cpu = int(container.labels.get("vps.cpu", "1"))
-                    disk = int(container.labels.get("vps.disk", "10"))
-                    
-                    vps_config = VPSConfig(
-                        name=container.name,
-                        ram_gb=ram,
-                        cpu_cores=cpu,
-                        disk_gb=disk,
-                        container_id=container.id,
-                        status="running" if container.status == "running" else "stopped"
-                    )
-                    self.vps_instances[container.name] = vps_config
+            for vps in self.store.load():
+                self.vps_instances[vps.name] = vps
         except Exception as e:
-            print(f"Error loading existing containers: {e}")
+            print(f"Error loading VPS state store: {e}")
+        for node in self.nodes:
+            if not node.healthy:
+                continue
+            try:
+                await self.resync(node)
+            except Exception as e:
+                print(f"Error loading existing containers from node {node.name}: {e}")
+        for vps in self.vps_instances.values():
+            suffix = vps.name[len(DEFAULT_VPS_PREFIX):]
+            if vps.name.startswith(DEFAULT_VPS_PREFIX) and suffix.isdigit():
+                self._last_name_id = max(self._last_name_id, int(suffix))
+            cpusets = self.node_of(vps).cpusets
+            if vps.cpuset and (cpusets is None or not cpusets.claim(vps.name, vps.cpuset)):
+                print(f"VPS {vps.name} is pinned to cores {vps.cpuset}, which aren't free for pinning anymore")
+            if vps.container_id is None and vps.status in ("queued", "creating") and not self.jobs.pending(vps.name, "create"):
+                # The bot went down before Docker ever created the container
+                vps.status = "error"
+                self._persist(vps, "error", "interrupted by restart")
+
+    def node_of(self, vps: VPSConfig) -> Node:
+        """The node a VPS lives on"""
+        return self.nodes.get(vps.node)
+
+    async def _adopt_container(self, node: Node, container: Dict) -> VPSConfig:
+        """Build a config for a VPS container the store doesn't know about"""
+        vps_config = self.config_from_container(container, node.name)
+        # Warm pool claims and !resize change limits in place, and labels
+        # can't be changed after creation, so read the limits themselves
+        host_config = (await node.backend.inspect_container(container["Id"]))["HostConfig"]
+        vps_config.ram_gb = (host_config.get("Memory") or 0) // 1024 ** 3 or vps_config.ram_gb
+        vps_config.cpu_cores = max(0, host_config.get("CpuQuota") or 0) // 100000 or vps_config.cpu_cores
+        cpuset = host_config.get("CpusetCpus") or ""
+        if cpuset and node.cpusets and node.cpusets.claim(vps_config.name, cpuset):
+            # Only pinnable cores can be claimed, so the shared cpuset never counts as pinned
+            vps_config.cpuset = cpuset
+            vps_config.cpu_cores = len(parse_cpulist(cpuset))
+        for bind in host_config.get("Binds") or []:
+            host_path, _, target = bind.partition(":")
+            if target.split(":")[0] == "/vps-storage" and os.path.basename(host_path) != vps_config.name:
+                vps_config.volume = os.path.basename(host_path)
+        if (container.get("Image") or "").startswith(f"{SNAPSHOT_REPO}:"):
+            vps_config.image = container["Image"]
+        vps_config.tmate_session = await self.read_tmate_session(node.backend, vps_config.container_id)
+        return vps_config
+
+    async def resync(self, node: Node):
+        """Reconcile cached statuses of one node against a single container listing"""
+        known = {name: vps.container_id for name, vps in self.vps_instances.items()
+                 if vps.container_id and self.node_of(vps) is node}
+        containers = await node.backend.list_containers(labels=["vpsbot=true"])
+        seen = set()
+        for container in containers:
+            name = container_name(container)
+            if not name.startswith(DEFAULT_VPS_PREFIX):
+                if not name.startswith(POOL_PREFIX) and name not in self._ignored_containers:
+                    self._ignored_containers.add(name)
+                    print(f"Ignoring container {name}: labeled vpsbot=true but not named like a VPS")
+                continue
+            vps = self.vps_instances.get(name)
+            if vps is not None and self.node_of(vps) is not node:
+                if name not in self._ignored_containers:
+                    self._ignored_containers.add(name)
+                    print(f"Ignoring container {name} on node {node.name}: the VPS lives on {self.node_of(vps).name}")
+                continue
+            seen.add(name)
+            if vps is None:
+                vps = await self._adopt_container(node, container)
+                self.vps_instances[name] = vps
+                self._persist(vps, "adopted", container["Id"][:12])
+                continue
+            changed = vps.container_id != container["Id"]
+            vps.container_id = container["Id"]
+            status = CONTAINER_STATUS.get(container.get("State"), "unknown")
+            # A dead container keeps showing why it died
+            if vps.status != status and not (status == "stopped" and vps.status == "oom-killed"):
+                vps.status = status
+                changed = True
+            if changed:
+                self._persist(vps, status, "resync")
+
+        for name, container_id in known.items():
+            # Only drop containers that existed before the listing was taken
+            vps = self.vps_instances.get(name)
+            if vps and vps.container_id == container_id and name not in seen:
+                print(f"VPS {name} no longer exists in Docker, dropping it")
+                del self.vps_instances[name]
+                self._forget(vps, "vanished")
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(STATE_RESYNC_INTERVAL)
+            for node in self.nodes:
+                if not node.healthy:
+                    continue
+                try:
+                    await self.resync(node)
+                except Exception as e:
+                    print(f"Error resyncing VPS state of node {node.name}: {e}")
+            if any(node.local and node.healthy for node in self.nodes):
+                self._reconcile_storage()
+                await self._check_shaping()
+
+    async def _check_shaping(self):
+        """Shape running VPSes again whose tc rules went missing from their veth"""
+        if not self.shaper.available:
+            return
+        for vps in list(self.vps_instances.values()):
+            if vps.status != "running" or not self.node_of(vps).local:
+                continue
+            try:
+                if await self.shaper.check_async(vps.name, vps.cpu_cores):
+                    continue
+            except Exception as e:
+                print(f"Error checking traffic limits of {vps.name}: {e}")
+                continue
+            print(f"⚠️ Traffic limits of {vps.name} went missing, shaping it again")
+            self._shape_later(vps)
+
+    async def _health_loop(self):
+        """Ping every node; failed nodes stop receiving VPSes until they answer again"""
+        while True:
+            await asyncio.sleep(self.nodes.check_interval)
+            for node in self.nodes:
+                was_healthy = node.healthy
+                if await self.nodes.check(node):
+                    try:
+                        if not node.scheduler.physical.ram_gb:
+                            await node.scheduler.refresh(node.backend)
+                        await self.resync(node)
+                    except Exception as e:
+                        print(f"Error resyncing recovered node {node.name}: {e}")
+                elif was_healthy and not node.healthy:
+                    for vps in self.vps_instances.values():
+                        if self.node_of(vps) is node and vps.status != "unknown":
+                            vps.status = "unknown"
+                            self._persist(vps, "node unreachable", node.name)
+
+    def drain_node(self, name: str, draining: bool = True) -> Tuple[bool, str]:
+        """Stop (or resume) placing new VPSes on a node; existing ones keep running"""
+        node = self.nodes.nodes.get(name)
+        if node is None:
+            return False, "Node not found"
+        node.draining = draining
+        return True, f"Node {name} {'draining' if draining else 'accepting VPSes again'}"
+
+    async def _watch_events(self, node: Node):
+        """Keep cached statuses current from a node's Docker events stream"""
+        backoff = 1
+        while True:
+            try:
+                async for event in node.backend.events(labels=["vpsbot=true"]):
+                    backoff = 1
+                    self._apply_event(node, event)
+                # The daemon closed the stream; catch up on anything missed
+                await self.resync(node)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Docker events stream error on node {node.name}: {e}, reconnecting in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+                try:
+                    await self.resync(node)
+                except Exception:
+                    pass
+
+    def _apply_event(self, node: Node, event: Dict):
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+        actor = event.get("Actor") or {}
+        name = (actor.get("Attributes") or {}).get("name")
+        vps = self.vps_instances.get(name)
+        if vps is None or self.node_of(vps) is not node:
+            return
+
+        if action == "destroy":
+            # Removed outside the bot; our own deletes drop the entry first
+            if vps.container_id == actor.get("ID"):
+                del self.vps_instances[name]
+                self._forget(vps, "destroyed")
+            return
+
+        status = EVENT_STATUS.get(action)
+        if status is None:
+            return
+        if action == "oom":
+            print(f"⚠️ VPS {name} was killed by the OOM killer (limit {vps.ram_gb} GB)")
+        elif vps.status == "oom-killed" and status == "stopped":
+            # Keep the OOM reason visible through the following die/stop events
+            return
+        if action == "start":
+            # Started outside the bot; unpause isn't enough to tell, it also comes before an idle stop
+            vps.idle_suspended = False
+            # Every start gets a new veth, which needs shaping again
+            self._shape_later(vps)
+        if vps.status != status:
+            vps.status = status
+            self._persist(vps, action)
+    
+    def _new_vps_name(self) -> str:
+        """A unique VPS name; names are the creation time, bumped past any name already used"""
+        self._last_name_id = max(self._last_name_id + 1, int(time.time()))
+        # Trashed volumes keep their VPS's name until they are reclaimed
+        while (f"{DEFAULT_VPS_PREFIX}{self._last_name_id}" in self.vps_instances
+               or f"{DEFAULT_VPS_PREFIX}{self._last_name_id}" in self.storage.registry):
+            self._last_name_id += 1
+        return f"{DEFAULT_VPS_PREFIX}{self._last_name_id}"
     
-    async def create_vps(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> Tuple[bool, str, Optional[VPSConfig]]:
-        """Create a new VPS with specified resources"""
+    def _warm_node(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> Optional[str]:
+        """The node to prefer for a request because a warm container fits it"""
+        if self.warm_pool and self.warm_pool.can_claim(ram_gb, cpu_cores, disk_gb):
+            return self.warm_pool.node.name
+        return None
+    
+    async def create_vps(self, ram_gb: int, cpu_cores: int, disk_gb: int, origin: Optional[Tuple[int, int]] = None,
+                         owner: Optional[int] = None, pinned: bool = False) -> Tuple[bool, str, Optional[VPSConfig]]:
+        """Create a new VPS with specified resources; cold starts are queued as a create job.
+
+        A ``pinned`` VPS gets ``cpu_cores`` host cores of its own instead of a
+        share of the common ones.
+        """
         try:
-            # Generate unique VPS name
-            vps_name = f"vps-{int(time.time())}"
-            
             # Validate resource limits
             if not self._validate_resources(ram_gb, cpu_cores, disk_gb):
                 return False, "Invalid resource specifications", None
             
             # Check if we can create more VPS instances
-            if len(self.vps_instances) >= 10:  # MAX_VPS_COUNT from config
+            if len(self.vps_instances) + self.nodes.pending() >= MAX_VPS_COUNT:
                 return False, "Maximum VPS limit reached", None
             
-            # Create VPS configuration
-            vps_config = VPSConfig(
-                name=vps_name,
-                ram_gb=ram_gb,
-                cpu_cores=cpu_cores,
-                disk_gb=disk_gb,
-                created_at=time.time()
+            # Place it on a node that can actually hold it, preferring one with a warm container
+            vps_name = self._new_vps_name()
+            trace = self.tracer.start(vps_name)
+            reservation = object()
+            with trace.span("admission") as span:
+                node, reason = self.nodes.reserve(reservation, ram_gb, cpu_cores, disk_gb,
+                                                  preferred=self._warm_node(ram_gb, cpu_cores, disk_gb),
+                                                  cpuset_key=vps_name if pinned else None)
+                span.detail = node.name if node else reason
+                if node is None:
+                    span.outcome = "rejected"
+            if node is None:
+                return False, reason, None
+            
+            try:
+                return await self._start_vps(node, vps_name, ram_gb, cpu_cores, disk_gb, origin, owner)
+            finally:
+                self.nodes.release(reservation)
+                if vps_name not in self.vps_instances:
+                    self.nodes.release_cpuset(vps_name)
+                if self.warm_pool:
+                    self.warm_pool.trim()
+            
+        except Exception as e:
+            return False, f"Error creating VPS: {str(e)}", None
+    
+    async def create_vps_batch(self, ram_gb: int, cpu_cores: int, disk_gb: int, count: int,
+                               owner: Optional[int] = None, pinned: bool = False) -> Tuple[bool, str, List[VPSConfig]]:
+        """Create ``count`` identical VPSes; either all of them are admitted or none is.
+
+        Warm containers are claimed first and the rest are queued as create
+        jobs, which run at most JOB_CREATE_CONCURRENCY at a time.
+        """
+        try:
+            if count < 1 or count > MAX_BATCH_SIZE:
+                return False, f"Batch size must be between 1-{MAX_BATCH_SIZE}", []
+            if not self._validate_resources(ram_gb, cpu_cores, disk_gb):
+                return False, "Invalid resource specifications", []
+            free = MAX_VPS_COUNT - len(self.vps_instances) - self.nodes.pending()
+            if count > free:
+                return False, f"Maximum VPS limit reached ({max(0, free)} more allowed)", []
+            
+            # Reserve capacity for the whole batch before anything is created
+            reservations = [object() for _ in range(count)]
+            names = [self._new_vps_name() for _ in range(count)]
+            started = time.monotonic()
+            preferred = self._warm_node(ram_gb, cpu_cores, disk_gb)
+            nodes, reason = self.nodes.reserve_batch(
+                reservations, ram_gb, cpu_cores, disk_gb, preferred=preferred,
+                preferred_count=self.warm_pool.claimable(ram_gb, cpu_cores, disk_gb) if preferred else 0,
+                cpuset_keys=names if pinned else None
             )
+            if nodes is None:
+                return False, reason, []
+            admission = time.monotonic() - started
+            for name, node in zip(names, nodes):
+                self.tracer.start(name).add("admission", admission, detail=f"{node.name} (batch of {count})")
             
-            # Start VPS creation process
-            asyncio.create_task(self._create_vps_container(vps_config))
+            try:
+                results = await asyncio.gather(*(
+                    self._start_vps(node, name, ram_gb, cpu_cores, disk_gb, owner=owner)
+                    for name, node in zip(names, nodes)
+                ))
+            finally:
+                for reservation in reservations:
+                    self.nodes.release(reservation)
+                for name in names:
+                    if name not in self.vps_instances:
+                        self.nodes.release_cpuset(name)
+                if self.warm_pool:
+                    self.warm_pool.trim()
             
-            self.vps_instances[vps_name] = vps_config
-            return True, f"VPS {vps_name} creation started", vps_config
+            configs = [vps_config for _, _, vps_config in results if vps_config]
+            warm = sum(vps_config.status == "running" for vps_config in configs)
+            return True, f"{len(configs)} VPSes: {warm} from warm pool, {len(configs) - warm} queued", configs
             
         except Exception as e:
-            return False, f"Error creating VPS: {str(e)}", None
+            return False, f"Error creating VPS batch: {str(e)}", []
+    
+    async def wait_until_created(self, vps_configs: List[VPSConfig]) -> Dict[str, str]:
+        """Wait for the create jobs of the given VPSes; returns the error of each one that failed"""
+        jobs = [job for job in (self.jobs.pending(vps_config.name, "create") for vps_config in vps_configs) if job]
+        await asyncio.gather(*(self.jobs.wait(job) for job in jobs))
+        return {job.vps: job.result for job in jobs if job.status == "failed"}
+    
+    async def _start_vps(self, node: Node, vps_name: str, ram_gb: int, cpu_cores: int, disk_gb: int,
+                         origin: Optional[Tuple[int, int]] = None,
+                         owner: Optional[int] = None) -> Tuple[bool, str, Optional[VPSConfig]]:
+        """Claim a warm container or queue the creation of a new one for an admitted request"""
+        vps_config = VPSConfig(
+            name=vps_name,
+            ram_gb=ram_gb,
+            cpu_cores=cpu_cores,
+            disk_gb=disk_gb,
+            created_at=time.time(),
+            node=node.name,
+            owner=owner
+        )
+        if node.cpusets and vps_name in node.cpusets.allocations:
+            vps_config.cpuset = node.cpusets.describe(vps_name)[0]
+        
+        # Hand out a pre-started container when one fits
+        with self.tracer.trace(vps_name).span("warm_claim") as span:
+            claimed = await self._claim_warm(vps_config)
+            span.outcome = "hit" if claimed else "miss"
+        if claimed:
+            self.vps_instances[vps_name] = vps_config
+            self._persist(vps_config, "created", "warm pool")
+            return True, f"VPS {vps_name} created from warm pool", vps_config
+        
+        # Queued VPSes count against capacity until the job runs
+        vps_config.status = "queued"
+        self.vps_instances[vps_name] = vps_config
+        self._persist(vps_config, "queued")
+        job = self.jobs.submit("create", vps_name, origin=origin)
+        return True, f"VPS {vps_name} queued as job #{job.id}", vps_config
+    
+    def submit_job(self, op: str, vps_name: str,
+                   origin: Optional[Tuple[int, int]] = None) -> Tuple[bool, str, Optional[Job]]:
+        """Queue a stop, delete or restart of a VPS; ``origin`` is the Discord message to update when it finishes.
+
+        A delete cancels the VPS's create if that hasn't started yet.
+        """
+        if vps_name not in self.vps_instances:
+            return False, "VPS not found", None
+        job = self.jobs.pending(vps_name, op)
+        if job is not None:
+            return True, f"Job #{job.id} is already {job.status}", job
+        if op == "delete":
+            create = self.jobs.pending(vps_name, "create")
+            if create is not None:
+                self.jobs.cancel(create, f"Cancelled: VPS {vps_name} was deleted")
+        job = self.jobs.submit(op, vps_name, origin=origin)
+        return True, f"Queued as job #{job.id}", job
+    
+    async def _run_create(self, job: Job) -> Tuple[bool, str]:
+        vps_config = self.vps_instances.get(job.vps)
+        if vps_config is None:
+            return False, f"VPS {job.vps} was deleted before it was created"
+        if vps_config.status != "queued":
+            return False, f"VPS {job.vps} is already {vps_config.status}"
+        self.tracer.trace(job.vps).add("queue_wait", job.waited, detail=f"job #{job.id}")
+        vps_config.status = "creating"
+        self._persist(vps_config, "creating")
+        return await self.create_vps_container(vps_config)
+    
+    async def _run_stop(self, job: Job) -> Tuple[bool, str]:
+        return await self.stop_vps(job.vps)
+    
+    async def _run_delete(self, job: Job) -> Tuple[bool, str]:
+        return await self.delete_vps(job.vps)
     
+    async def _run_restart(self, job: Job) -> Tuple[bool, str]:
+        return await self.restart_vps(job.vps)
+    
+    def select_vps(self, names: Optional[List[str]] = None, prefix: Optional[str] = None,
+                   status: Optional[str] = None, min_age: Optional[float] = None,
+                   owner: Optional[int] = None) -> List[VPSConfig]:
+        """VPSes matching every selector given; ``min_age`` is in seconds"""
+        now = time.time()
+        selected = []
+        for vps in self.vps_instances.values():
+            if names is not None and vps.name not in names:
+                continue
+            if prefix is not None and not vps.name.startswith(prefix):
+                continue
+            if status is not None and vps.status != status:
+                continue
+            if min_age is not None and (vps.created_at is None or now - vps.created_at < min_age):
+                continue
+            if owner is not None and vps.owner != owner:
+                continue
+            selected.append(vps)
+        return selected
+    
+    async def bulk(self, op: str, vps_names: List[str]) -> Dict[str, Tuple[bool, str]]:
+        """Stop, delete or restart many VPSes; they run as jobs, JOB_WORKERS at a time.
+
+        Returns the result of each VPS by name.
+        """
+        submitted = {name: self.submit_job(op, name) for name in vps_names}
+        await asyncio.gather(*(self.jobs.wait(job) for _, _, job in submitted.values() if job))
+        return {name: (job.status == "done", job.result) if job else (success, message)
+                for name, (success, message, job) in submitted.items()}
+    
+    async def _claim_warm(self, vps_config: VPSConfig) -> bool:
+        """Turn a warm pool container into the requested VPS"""
+        if not self.warm_pool or self.warm_pool.node is not self.node_of(vps_config):
+            return False
+        backend = self.warm_pool.node.backend
+        while True:
+            warm = self.warm_pool.claim(vps_config.ram_gb, vps_config.cpu_cores, vps_config.disk_gb)
+            if warm is None:
+                return False
+            try:
+                container = await backend.inspect_container(warm.container_id)
+                if not container["State"]["Running"]:
+                    raise RuntimeError("warm container is not running")
+                await backend.rename_container(warm.container_id, vps_config.name)
+            except Exception as e:
+                print(f"Discarding warm container {warm.name}: {e}")
+                await self.warm_pool.discard(warm)
+                continue
+
+            if (warm.ram_gb, warm.cpu_cores) != (vps_config.ram_gb, vps_config.cpu_cores) or vps_config.cpuset:
+                try:
+                    await backend.update_container(
+                        warm.container_id,
+                        mem_limit=vps_config.ram_gb * 1024 ** 3,
+                        **self._cpu_limits(vps_config, vps_config.cpu_cores)
+                    )
+                except Exception as e:
+                    # Renamed already, so it can't go back into the pool
+                    print(f"Error resizing warm container for {vps_config.name}: {e}")
+                    await self.warm_pool.discard(warm)
+                    return False
+
+            vps_config.container_id = warm.container_id
+            vps_config.volume = warm.volume or warm.name
+            if self.warm_pool.node.local:
+                self.storage.assign(vps_config.volume, vps_config.name)
+            vps_config.tmate_session = warm.tmate_session
+            vps_config.status = "running"
+            # Shaped for its pool size class until now
+            self._shape_later(vps_config)
+            print(f"Claimed warm container {warm.name} as {vps_config.name}")
+            return True
+
     def _validate_resources(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> bool:
         """Validate resource specifications"""
-        if ram_gb < 1 or ram_gb > 32:
+        if ram_gb < 1 or ram_gb > MAX_RAM_GB:
             return False
-        if cpu_cores < 1 or cpu_cores > 16:
+        if cpu_cores < 1 or cpu_cores > MAX_CPU_CORES:
             return False
-        if disk_gb < 5 or disk_gb > 500:
+        if disk_gb < 5 or disk_gb > MAX_DISK_GB:
             return False
         return True
     
-    async def _create_vps_container(self, vps_config: VPSConfig):
+    async def create_vps_container(self, vps_config: VPSConfig, pool: bool = False) -> Tuple[bool, str]:
         """Create the actual VPS container"""
+        # Pool containers get renamed on claim, so their traces aren't kept
+        trace = Trace(vps_config.name) if pool else self.tracer.trace(vps_config.name)
         try:
-            # Create container with resource limits
-            container = self.client.containers.run(
-                image="vpsbot-ubuntu:24.04",
+            labels = {
+                "vpsbot": "true",
+                "vps.ram": str(vps_config.ram_gb),
+                "vps.cpu": str(vps_config.cpu_cores),
+                "vps.disk": str(vps_config.disk_gb)
+            }
+            if vps_config.owner is not None:
+                labels["vps.owner"] = str(vps_config.owner)
+            if pool:
+                labels["vpsbot.pool"] = "true"
+            
+            node = self.node_of(vps_config)
+            image = vps_config.image or VPS_IMAGE
+            with trace.span("image_inspect", image):
+                ships_tmate = await self._image_ships_tmate(node, image)
+            if not ships_tmate and not TMATE_RUNTIME_INSTALL:
+                raise RuntimeError(f"Image {image} does not ship tmate and runtime install is disabled")
+            
+            vps_config.volume = vps_config.volume or vps_config.name
+            loop_device = None
+            if node.local:
+                snapshot = self._snapshot_of(vps_config)
+                if snapshot and snapshot.volume and not self.volumes.exists(vps_config.volume):
+                    # A clone starts from the snapshot's data; an undeleted clone already has its own
+                    with trace.span("volume_clone", snapshot.name) as span:
+                        span.outcome = await self.volumes.copy_async(snapshot.volume, vps_config.volume)
+                with trace.span("volume_create", DISK_QUOTA):
+                    loop_device = await self.storage.provision(vps_config.volume, vps_config.name, vps_config.disk_gb)
+            
+            # Create container with resource limits. Images that ship tmate run
+            # their own /start.sh; legacy images get a keep-alive command instead
+            spec = ContainerSpec(
                 name=vps_config.name,
-                detach=True,
-                privileged=True,
-                mem_limit=f"{vps_config.ram_gb}g",
-                cpu_quota=int(vps_config.cpu_cores * 100000),
+                image=image,
+                mem_limit=vps_config.ram_gb * 1024 ** 3,
                 cpu_period=100000,
-                volumes={
-                    f"/var/lib/vpsbot/containers/{vps_config.name}": {
-                        "bind": "/vps-storage",
-                        "mode": "rw"
-                    }
-                },
-                labels={
-                    "vpsbot": "true",
-                    "vps.ram": str(vps_config.ram_gb),
-                    "vps.cpu": str(vps_config.cpu_cores),
-                    "vps.disk": str(vps_config.disk_gb)
-                },
-                command="/bin/bash -c 'while true; do sleep 30; done'"
+                **self._cpu_limits(vps_config, vps_config.cpu_cores),
+                storage_size=f"{vps_config.disk_gb}G" if DISK_QUOTA == "storage-opt" else None,
+                **self._io_limits(node, vps_config.disk_gb, loop_device),
+                network=VPS_NETWORK or None,
+                binds={self.volumes.path(vps_config.volume): "/vps-storage"},
+                labels=labels,
+                command=None if ships_tmate else ["/bin/bash", "-c", "while true; do sleep 30; done"]
             )
+            with trace.span("container_create", node.name):
+                container_id = await node.backend.create_container(spec)
+            stale = None
+            if vps_config.image:
+                # The snapshot froze the source's session file; wait for the clone's own
+                content = await node.backend.read_file(container_id, "/tmp/tmate_info")
+                stale = (content or b"").decode().strip() or None
+            try:
+                with trace.span("container_start"):
+                    await node.backend.start_container(container_id)
+            except Exception:
+                # Don't leave a created-but-never-started container holding the name
+                await node.backend.remove_container(container_id, force=True)
+                raise
             
-            vps_config.container_id = container.id
+            vps_config.container_id = container_id
             vps_config.status = "running"
+            started = time.monotonic()
+            
+            if ships_tmate:
+                trace.add("tmate_install", 0.0, "skipped", "image ships tmate")
+                await self._collect_tmate_session(vps_config, trace, stale=stale)
+            else:
+                # Legacy image: install and setup tmate
+                await self._setup_tmate(vps_config, trace)
             
-            # Install and setup tmate
-            await self._setup_tmate(vps_config)
+            if vps_config.tmate_session:
+                self.tmate_ready_seconds.observe(time.monotonic() - started)
+                return True, f"VPS {vps_config.name} is ready"
+            return True, f"VPS {vps_config.name} is running, but its tmate session isn't ready yet"
             
         except Exception as e:
             vps_config.status = "error"
             print(f"Error creating container for {vps_config.name}: {e}")
+            return False, f"Error creating container: {e}"
+        finally:
+            if not pool and vps_config.name in self.vps_instances:
+                self._persist(vps_config, "created" if vps_config.status == "running" else "error")
     
-    async def _setup_tmate(self, vps_config: VPSConfig):
-        """Install and setup tmate for remote access"""
+    async def _image_ships_tmate(self, node: Node, image: str) -> bool:
+        """Whether the node's copy of the image starts its own tmate session via /start.sh"""
+        key = (node.name, image)
+        if key not in self._image_tmate:
+            try:
+                config = (await node.backend.inspect_image(image)).get("Config") or {}
+            except Exception as e:
+                print(f"Error inspecting image {image}: {e}")
+                return False
+            labels = config.get("Labels") or {}
+            # Images built before the label was added still run /start.sh
+            self._image_tmate[key] = labels.get("vpsbot.tmate") == "true" or config.get("Cmd") == ["/start.sh"]
+        return self._image_tmate[key]
+
+    async def _collect_tmate_session(self, vps_config: VPSConfig, trace: Trace, stale: Optional[str] = None):
+        """Read the session the image's /start.sh publishes in /tmp/tmate_info, ignoring a ``stale`` one"""
+        backend = self.node_of(vps_config).backend
+
+        async def probe():
+            with trace.span("session_poll") as span:
+                ssh_info = await read_session()
+                if not ssh_info:
+                    span.outcome = "pending"
+                return ssh_info
+
+        async def read_session():
+            content = await backend.read_file(vps_config.container_id, "/tmp/tmate_info")
+            ssh_info = (content or b"").decode().strip()
+            if ssh_info == stale:
+                # Left over from before a restart; /start.sh hasn't replaced it yet
+                return None
+            if "tmate.io" in ssh_info:
+                return ssh_info
+            # Older images write the file before the session is up; ask tmate directly
+            if content is not None:
+                return await self.read_tmate_session(backend, vps_config.container_id)
+            return None
+
+        with trace.span("session_wait") as span:
+            vps_config.tmate_session = await wait_until(probe, TMATE_READY_TIMEOUT)
+            if not vps_config.tmate_session:
+                span.outcome = "timeout"
+        if vps_config.tmate_session:
+            print(f"tmate session ready for {vps_config.name}: {vps_config.tmate_session}")
+        else:
+            print(f"No tmate session published by {vps_config.name} within {TMATE_READY_TIMEOUT}s")
+
+    async def _wait_for_tmate_ready(self, backend: DockerBackend, container_id: str, trace: Trace,
+                                    timeout: float = TMATE_READY_TIMEOUT) -> Optional[str]:
+        """Block on tmate's own readiness signal, then read the SSH command"""
+        with trace.span("session_wait") as wait_span:
+            try:
+                with trace.span("tmate_wait") as span:
+                    result = await backend.exec(
+                        container_id,
+                        f"timeout {int(timeout)} tmate -S /tmp/tmate.sock wait tmate-ready; "
+                        "tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}'",
+                        timeout=timeout + 10
+                    )
+                    ssh_info = result.output.decode().strip()
+                    if result.exit_code == 0 and "tmate.io" in ssh_info:
+                        return ssh_info
+                    span.outcome = "unsupported"
+            except Exception as e:
+                print(f"tmate wait failed in {container_id[:12]}: {e}")
+
+            # tmate builds without "wait" support: poll the session with backoff instead
+            async def probe():
+                with trace.span("session_poll") as span:
+                    ssh_info = await self.read_tmate_session(backend, container_id)
+                    if not ssh_info:
+                        span.outcome = "pending"
+                    return ssh_info
+
+            ssh_info = await wait_until(probe, timeout)
+            if not ssh_info:
+                wait_span.outcome = "timeout"
+            return ssh_info
+
+    async def _setup_tmate(self, vps_config: VPSConfig, trace: Trace):
+        """Install and setup tmate for remote access (legacy images only)"""
+        backend = self.node_of(vps_config).backend
         try:
-            container = self.client.containers.get(vps_config.container_id)
-            
-            # Wait for container to be fully ready
-            await asyncio.sleep(5)
-            
             # Install tmate
             print(f"Installing tmate for {vps_config.name}...")
-            exec_result = container.exec_run(
-                "apt-get update && apt-get install -y tmate curl",
-                stdout=True,
-                stderr=True
-            )
+            with trace.span("tmate_install") as span:
+                exec_result = await backend.exec(
+                    vps_config.container_id,
+                    "apt-get update && apt-get install -y tmate curl",
+                    op="exec_run.install"
+                )
+                if exec_result.exit_code != 0:
+                    span.outcome = "error"
+                    span.detail = f"exit code {exec_result.exit_code}"
             
-            if exec_result.exit_code == 0:
-                print(f"tmate installed for {vps_config.name}, starting session...")
-                
-                # Start tmate session in background
-                tmate_result = container.exec_run(
-                    "nohup tmate -S /tmp/tmate.sock new-session -d > /tmp/tmate.log 2>&1 &",
-                    stdout=True,
-                    stderr=True
+            if exec_result.exit_code != 0:
+                print(f"Failed to install tmate for {vps_config.name}: {exec_result.output.decode()[-500:]}")
+                return
+            
+            print(f"tmate installed for {vps_config.name}, starting session...")
+            
+            # Start tmate session in background
+            with trace.span("session_start"):
+                await backend.exec(
+                    vps_config.container_id,
+                    "nohup tmate -S /tmp/tmate.sock new-session -d > /tmp/tmate.log 2>&1 &"
                 )
-                
-                # Wait a bit for tmate to start
-                await asyncio.sleep(3)
-                
-                # Try to get session info with retries
-                for attempt in range(5):
-                    try:
-                        session_info = container.exec_run(
-                            "tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}'",
-                            stdout=True,
-                            stderr=True
-                        )
-                        
-                        if session_info.exit_code == 0 and session_info.output:
-                            ssh_info = session_info.output.decode().strip()
-                            if ssh_info and "tmate.io" in ssh_info:
-                                vps_config.tmate_session = ssh_info
-                                print(f"tmate session ready for {vps_config.name}: {ssh_info}")
-                                break
-                        
-                        # If not ready, wait and try again
-                        await asyncio.sleep(2)
-                        
-                    except Exception as e:
-                        print(f"Attempt {attempt + 1} failed for {vps_config.name}: {e}")
-                        await asyncio.sleep(2)
-                
-                # If still no session, try alternative method
-                if not vps_config.tmate_session:
-                    print(f"Trying alternative tmate setup for {vps_config.name}...")
-                    alt_result = container.exec_run(
-                        "tmate -S /tmp/tmate.sock new-session -d; sleep 2; tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}'",
-                        stdout=True,
-                        stderr=True
-                    )
-                    
-                    if alt_result.exit_code == 0 and alt_result.output:
-                        ssh_info = alt_result.output.decode().strip()
-                        if "tmate.io" in ssh_info:
-                            vps_config.tmate_session = ssh_info
-                            print(f"Alternative tmate setup successful for {vps_config.name}")
+            
+            vps_config.tmate_session = await self._wait_for_tmate_ready(backend, vps_config.container_id, trace)
+            if vps_config.tmate_session:
+                print(f"tmate session ready for {vps_config.name}: {vps_config.tmate_session}")
             
         except Exception as e:
             print(f"Error setting up tmate for {vps_config.name}: {e}")
             # Try to get any existing session info
-            try:
-                container = self.client.containers.get(vps_config.container_id)
-                session_info = container.exec_run(
-                    "tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}' 2>/dev/null || echo 'no session'",
-                    stdout=True,
-                    stderr=True
-                )
-                if session_info.exit_code == 0 and "tmate.io" in session_info.output.decode():
-                    vps_config.tmate_session = session_info.output.decode().strip()
-            except:
-                pass
+            vps_config.tmate_session = await self.read_tmate_session(backend, vps_config.container_id)
     
-    def get_vps_info(self, vps_name: str) -> Optional[Dict]:
+    async def read_tmate_session(self, backend: DockerBackend, container_id: str) -> Optional[str]:
+        """Read the SSH command of an already running tmate session"""
+        try:
+            session_info = await backend.exec(
+                container_id,
+                "tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}' 2>/dev/null"
+            )
+        except Exception:
+            return None
+        ssh_info = session_info.output.decode().strip()
+        if session_info.exit_code == 0 and "tmate.io" in ssh_info:
+            return ssh_info
+        return None
+
+    async def get_vps_info(self, vps_name: str) -> Optional[Dict]:
         """Get VPS information including specs and tmate session"""
         if vps_name not in self.vps_instances:
             return None
         
+        # Status is kept current by the events stream, so this never touches Docker
         vps = self.vps_instances[vps_name]
         
-        # Get container status
-        try:
-            if vps.container_id:
-                container = self.client.containers.get(vps.container_id)
-                vps.status = container.status
-        except:
-            vps.status = "unknown"
-        
         return {
             "name": vps.name,
             "ram_gb": vps.ram_gb,
@@ -238,17 +1207,43 @@ class VPSManager:
             "disk_gb": vps.disk_gb,
             "status": vps.status,
             "tmate_session": vps.tmate_session,
-            "created_at": vps.created_at
+            "created_at": vps.created_at,
+            "node": self.node_of(vps).name,
+            "owner": vps.owner,
+            "cpuset": vps.cpuset,
+            # Bytes received and sent since the container started; None where the node isn't local
+            "net_bytes": self.shaper.counters(vps.name),
+            "net_mbit": self.shaper.rates(vps.cpu_cores) if self.node_of(vps).local else None
         }
     
-    def list_vps(self) -> List[Dict]:
+    async def get_disk_usage(self, vps_name: str) -> Optional[Dict[str, Tuple[float, float]]]:
+        """Used and total GB of a VPS's root filesystem and /vps-storage, by mount point"""
+        vps = self.vps_instances.get(vps_name)
+        if vps is None or not vps.container_id:
+            return None
+        node = self.node_of(vps)
+        if vps.status == "running":
+            try:
+                result = await node.backend.exec(vps.container_id, "df -Pk / /vps-storage")
+            except Exception:
+                result = None
+            if result is not None and result.exit_code == 0:
+                usage = {}
+                for line in result.output.decode().splitlines()[1:]:
+                    fields = line.split()
+                    if len(fields) >= 6 and fields[1].isdigit() and fields[2].isdigit():
+                        usage[fields[5]] = (int(fields[2]) / 1024 ** 2, int(fields[1]) / 1024 ** 2)
+                return usage
+        if node.local:
+            # Stopped; a mounted volume can still be measured from the host
+            volume = await asyncio.get_running_loop().run_in_executor(None, self.volumes.usage, vps.volume or vps.name)
+            if volume is not None:
+                return {"/vps-storage": volume}
+        return None
+    
+    async def list_vps(self) -> List[Dict]:
         """List all VPS instances"""
-        vps_list = []
-        for vps_name in self.vps_instances:
-            info = self.get_vps_info(vps_name)
-            if info:
-                vps_list.append(info)
-        return vps_list
+        return [await self.get_vps_info(name) for name in list(self.vps_instances)]
     
     async def stop_vps(self, vps_name: str) -> Tuple[bool, str]:
         """Stop a VPS instance"""
@@ -258,9 +1253,14 @@ class VPSManager:
         try:
             vps = self.vps_instances[vps_name]
             if vps.container_id:
-                container = self.client.containers.get(vps.container_id)
-                container.stop()
+                backend = self.node_of(vps).backend
+                if vps.status == "paused":
+                    await backend.unpause_container(vps.container_id)
+                await backend.stop_container(vps.container_id)
                 vps.status = "stopped"
+                # Stopped on purpose, so using it again shouldn't start it
+                vps.idle_suspended = False
+                self._persist(vps, "stopped")
                 return True, f"VPS {vps_name} stopped"
             return False, "No container found for VPS"
         except Exception as e:
@@ -270,19 +1270,408 @@ class VPSManager:
         """Delete a VPS instance"""
         if vps_name not in self.vps_instances:
             return False, "VPS not found"
+        create = self.jobs.pending(vps_name, "create")
+        if create is not None and not self.jobs.cancel(create, f"Cancelled: VPS {vps_name} was deleted"):
+            # Already creating; removing it now would leave the container it is about to start behind
+            await self.jobs.wait(create)
+            if vps_name not in self.vps_instances:
+                return False, "VPS not found"
         
         try:
             vps = self.vps_instances[vps_name]
+            node = self.node_of(vps)
             if vps.container_id:
-                container = self.client.containers.get(vps.container_id)
-                container.remove(force=True)
+                await node.backend.remove_container(vps.container_id, force=True)
             
-            # Remove from our tracking
-            del self.vps_instances[vps_name]
+            # Remove from our tracking; the destroy event may have beaten us to it.
+            # Its storage only moves to the trash, so this returns right away at any size
+            self.vps_instances.pop(vps_name, None)
+            self._forget(vps, "deleted")
+            if node.local and STORAGE_GRACE_PERIOD:
+                return True, f"VPS {vps_name} deleted; `!undelete {vps_name}` brings it back within {STORAGE_GRACE_PERIOD / 3600:g} h"
             return True, f"VPS {vps_name} deleted"
         except Exception as e:
             return False, f"Error deleting VPS: {str(e)}"
     
+    async def undelete_vps(self, vps_name: str,
+                           origin: Optional[Tuple[int, int]] = None) -> Tuple[bool, str, Optional[VPSConfig]]:
+        """Bring back a deleted VPS whose volume is still in the trash; its container is recreated as a create job"""
+        if vps_name in self.vps_instances:
+            return False, f"VPS {vps_name} still exists", None
+        volume = self.storage.trashed(vps_name)
+        record = self.store.load_deleted(vps_name)
+        if volume is None or record is None:
+            return False, f"Nothing left to restore of {vps_name}; its storage has been reclaimed", None
+        if len(self.vps_instances) + self.nodes.pending() >= MAX_VPS_COUNT:
+            return False, "Maximum VPS limit reached", None
+        # The data lives on the local node, so that is where the VPS comes back
+        node = next((node for node in self.nodes if node.local), None)
+        if node is None or not node.schedulable:
+            return False, "The node holding its storage is not available", None
+        reservation = object()
+        admitted, reason = node.scheduler.reserve(reservation, record.ram_gb, record.cpu_cores, record.disk_gb)
+        if not admitted:
+            return False, reason, None
+        try:
+            cpuset = None
+            if record.cpuset:
+                if node.cpusets is None or node.cpusets.allocate(vps_name, record.cpu_cores) is None:
+                    return False, f"Not enough dedicated cores for {record.cpu_cores} pinned cores", None
+                cpuset = node.cpusets.describe(vps_name)[0]
+            self.storage.restore(volume.name)
+            vps_config = VPSConfig(
+                name=vps_name,
+                ram_gb=record.ram_gb,
+                cpu_cores=record.cpu_cores,
+                disk_gb=record.disk_gb,
+                status="queued",
+                created_at=record.created_at,
+                node=node.name,
+                owner=record.owner,
+                cpuset=cpuset,
+                volume=volume.name
+            )
+            self.tracer.start(vps_name)
+            self.vps_instances[vps_name] = vps_config
+            self._persist(vps_config, "undeleted", volume.name)
+            job = self.jobs.submit("create", vps_name, origin=origin)
+            return True, f"VPS {vps_name} restored with its storage, queued as job #{job.id}", vps_config
+        finally:
+            node.scheduler.release(reservation)
+    
+    async def _load_snapshots(self, node: Node):
+        """Rebuild the snapshot list of a node from the labels of its snapshot images"""
+        try:
+            images = await node.backend.list_images(labels=["vpsbot.snapshot"])
+        except Exception as e:
+            print(f"Error listing snapshots on node {node.name}: {e}")
+            return
+        for image in images:
+            snapshot = Snapshot.from_image(image, node.name)
+            if snapshot is not None:
+                self.snapshots[snapshot.name] = snapshot
+    
+    def _snapshot_of(self, vps_config: VPSConfig) -> Optional[Snapshot]:
+        """The snapshot a clone was made from, if it still exists"""
+        if not vps_config.image:
+            return None
+        return next((snapshot for snapshot in self.snapshots.values() if snapshot.image == vps_config.image), None)
+    
+    async def snapshot_vps(self, vps_name: str, snapshot_name: Optional[str] = None,
+                           owner: Optional[int] = None) -> Tuple[bool, str, Optional[Snapshot]]:
+        """Commit a VPS's filesystem to an image and copy its volume, so it can be cloned later.
+
+        A running VPS is paused for the moment both are captured. The image
+        only holds what changed since the VPS was created, on top of layers
+        shared with every other VPS, and the volume copy is a reflink where
+        the filesystem supports it.
+        """
+        vps = self.vps_instances.get(vps_name)
+        if vps is None:
+            return False, "VPS not found", None
+        if not vps.container_id or vps.status not in ("running", "paused", "stopped", "oom-killed"):
+            return False, f"VPS {vps_name} is {vps.status}, it can only be snapshotted once created", None
+        job = self.jobs.pending(vps_name)
+        if job is not None:
+            return False, f"VPS {vps_name} has job #{job.id} ({job.op}) {job.status}, try again when it is done", None
+        snapshot_name = snapshot_name or f"{vps_name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        if not SNAPSHOT_NAME.match(snapshot_name):
+            return False, "Snapshot names may use a-z, 0-9, '.', '_' and '-', up to 64 characters", None
+        if snapshot_name in self.snapshots:
+            return False, f"Snapshot {snapshot_name} already exists", None
+        
+        node = self.node_of(vps)
+        source_volume = vps.volume or vps.name
+        snapshot = Snapshot(
+            name=snapshot_name,
+            image=f"{SNAPSHOT_REPO}:{snapshot_name}",
+            node=node.name,
+            source=vps_name,
+            ram_gb=vps.ram_gb,
+            cpu_cores=vps.cpu_cores,
+            disk_gb=vps.disk_gb,
+            created_at=time.time(),
+            owner=owner,
+            volume=SNAPSHOT_VOLUME_PREFIX + snapshot_name if node.local and self.volumes.exists(source_volume) else None
+        )
+        # Taken before the first await, so a second snapshot of the same name is refused
+        self.snapshots[snapshot_name] = snapshot
+        paused = committed = False
+        method = None
+        try:
+            if vps.status == "running":
+                # Filesystem and volume are captured at the same instant
+                await node.backend.pause_container(vps.container_id)
+                paused = True
+            await node.backend.commit_container(vps.container_id, SNAPSHOT_REPO, snapshot_name,
+                                                labels=snapshot.labels(), pause=False)
+            committed = True
+            if snapshot.volume:
+                method = await self.volumes.copy_async(source_volume, snapshot.volume)
+        except Exception as e:
+            del self.snapshots[snapshot_name]
+            if committed:
+                try:
+                    await node.backend.remove_image(snapshot.image, force=True)
+                except Exception as cleanup_error:
+                    print(f"Error removing image of failed snapshot {snapshot_name}: {cleanup_error}")
+            if snapshot.volume:
+                self.storage.release(snapshot.volume, grace=False)
+            return False, f"Error taking snapshot: {e}", None
+        finally:
+            if paused:
+                try:
+                    await node.backend.unpause_container(vps.container_id)
+                except Exception as e:
+                    print(f"Error unpausing {vps_name} after its snapshot: {e}")
+        
+        self._persist(vps, "snapshot", snapshot_name)
+        storage = f"volume copied ({method})" if method else "no volume on this node"
+        return True, f"Snapshot {snapshot_name} of {vps_name} taken, {storage}", snapshot
+    
+    async def clone_vps(self, source: str, count: int = 1,
+                        owner: Optional[int] = None) -> Tuple[bool, str, List[VPSConfig]]:
+        """Queue ``count`` new VPSes that start from a snapshot, or from a fresh snapshot of a VPS.
+
+        Clones run the snapshot image, so they share its layers and only
+        store what they change themselves; their volumes are reflinked from
+        the snapshot's where the filesystem supports it. They live on the
+        snapshot's node, where its image is.
+        """
+        if count < 1 or count > MAX_BATCH_SIZE:
+            return False, f"Clone count must be between 1-{MAX_BATCH_SIZE}", []
+        free = MAX_VPS_COUNT - len(self.vps_instances) - self.nodes.pending()
+        if count > free:
+            return False, f"Maximum VPS limit reached ({max(0, free)} more allowed)", []
+        snapshot = self.snapshots.get(source)
+        taken = ""
+        if snapshot is None:
+            if source not in self.vps_instances:
+                return False, f"No VPS or snapshot named {source}", []
+            success, message, snapshot = await self.snapshot_vps(source, owner=owner)
+            if not success:
+                return False, message, []
+            taken = f" ({message})"
+        
+        node = self.nodes.get(snapshot.node)
+        if snapshot.node != node.name or not node.schedulable:
+            return False, f"Node {snapshot.node} holding snapshot {snapshot.name} is not available", []
+        reservations = [object() for _ in range(count)]
+        for index, reservation in enumerate(reservations):
+            admitted, reason = node.scheduler.reserve(reservation, snapshot.ram_gb, snapshot.cpu_cores, snapshot.disk_gb)
+            if not admitted:
+                for reserved in reservations[:index]:
+                    node.scheduler.release(reserved)
+                return False, f"Only {index} of {count} fit on {node.name}: {reason}", []
+        try:
+            configs = []
+            for _ in range(count):
+                vps_config = VPSConfig(
+                    name=self._new_vps_name(),
+                    ram_gb=snapshot.ram_gb,
+                    cpu_cores=snapshot.cpu_cores,
+                    disk_gb=snapshot.disk_gb,
+                    status="queued",
+                    created_at=time.time(),
+                    node=node.name,
+                    owner=owner,
+                    image=snapshot.image
+                )
+                self.tracer.start(vps_config.name)
+                self.vps_instances[vps_config.name] = vps_config
+                self._persist(vps_config, "cloned", snapshot.name)
+                self.jobs.submit("create", vps_config.name)
+                configs.append(vps_config)
+        finally:
+            for reservation in reservations:
+                node.scheduler.release(reservation)
+        return True, f"{count} clone{'s' if count != 1 else ''} of {snapshot.name} queued{taken}", configs
+    
+    async def delete_snapshot(self, snapshot_name: str) -> Tuple[bool, str]:
+        """Remove a snapshot's image and volume copy; clones still running it keep it alive"""
+        snapshot = self.snapshots.get(snapshot_name)
+        if snapshot is None:
+            return False, "Snapshot not found"
+        clones = [vps.name for vps in self.vps_instances.values() if vps.image == snapshot.image]
+        if clones:
+            shown = ", ".join(clones[:5]) + (f" and {len(clones) - 5} more" if len(clones) > 5 else "")
+            return False, f"Snapshot {snapshot_name} is the image of {shown}; delete those first"
+        node = self.nodes.get(snapshot.node)
+        try:
+            await node.backend.remove_image(snapshot.image)
+        except DockerNotFound:
+            pass
+        except Exception as e:
+            return False, f"Error deleting snapshot: {e}"
+        del self.snapshots[snapshot_name]
+        if snapshot.volume and node.local:
+            # Removed by the background reclaimer like any deleted volume
+            self.storage.release(snapshot.volume, grace=False)
+        return True, f"Snapshot {snapshot_name} deleted"
+    
+    async def restart_vps(self, vps_name: str) -> Tuple[bool, str]:
+        """Restart a VPS (starting it if it is stopped) and bring up a new tmate session"""
+        if vps_name not in self.vps_instances:
+            return False, "VPS not found"
+        
+        vps = self.vps_instances[vps_name]
+        if not vps.container_id:
+            return False, "No container found for VPS"
+        node = self.node_of(vps)
+        reservation = object()
+        if vps.status not in ACTIVE_STATUSES:
+            # A stopped VPS only holds its disk; it needs its RAM and cores back
+            admitted, reason = node.scheduler.reserve(reservation, vps.ram_gb, vps.cpu_cores, 0)
+            if not admitted:
+                return False, reason
+        try:
+            stale = vps.tmate_session
+            if vps.status == "paused":
+                await node.backend.unpause_container(vps.container_id)
+            if vps.status in ACTIVE_STATUSES:
+                await node.backend.stop_container(vps.container_id)
+            await node.backend.start_container(vps.container_id)
+            vps.status = "running"
+            vps.tmate_session = None
+            vps.idle_suspended = False
+            self._persist(vps, "restarted")
+        except Exception as e:
+            return False, f"Error restarting VPS: {str(e)}"
+        finally:
+            node.scheduler.release(reservation)
+        
+        # Restarts aren't part of the creation waterfall, so their spans aren't kept
+        if await self._image_ships_tmate(node, vps.image or VPS_IMAGE):
+            await self._collect_tmate_session(vps, Trace(vps_name), stale=stale)
+        else:
+            # Legacy images don't start tmate themselves
+            await self.refresh_tmate_session(vps_name)
+        if vps.tmate_session:
+            self._persist(vps)
+            return True, f"VPS {vps_name} restarted"
+        return True, f"VPS {vps_name} restarted, but its tmate session isn't ready yet"
+    
+    async def resize_vps(self, vps_name: str, ram_gb: int, cpu_cores: int) -> Tuple[bool, str]:
+        """Change the RAM and CPU limits of a VPS in place, without recreating it"""
+        vps = self.vps_instances.get(vps_name)
+        if vps is None:
+            return False, "VPS not found"
+        if not self._validate_resources(ram_gb, cpu_cores, vps.disk_gb):
+            return False, "Invalid resource specifications"
+        if not vps.container_id or vps.status not in ("running", "stopped", "oom-killed"):
+            return False, f"VPS {vps_name} is {vps.status}, it can only be resized while running or stopped"
+        job = self.jobs.pending(vps_name)
+        if job is not None:
+            return False, f"VPS {vps_name} has job #{job.id} ({job.op}) {job.status}, try again when it is done"
+        if (ram_gb, cpu_cores) == (vps.ram_gb, vps.cpu_cores):
+            return True, f"VPS {vps_name} already has {ram_gb} GB RAM and {cpu_cores} cores"
+        
+        node = self.node_of(vps)
+        reservation = object()
+        if vps.status == "running":
+            # Shrinking below what is in use would OOM-kill or throttle the VPS
+            used_mb = self.stats_collector.recent(vps_name, "mem_mb")
+            used_cpu = self.stats_collector.recent(vps_name, "cpu_percent")
+            if ram_gb < vps.ram_gb or cpu_cores < vps.cpu_cores:
+                if used_mb is None or used_cpu is None:
+                    return False, "No recent usage sample yet, try again in a few seconds"
+                if used_mb / 1024 > ram_gb * RESIZE_MAX_USAGE:
+                    return False, (f"VPS {vps_name} is using {used_mb / 1024:.1f} GB RAM, "
+                                   f"too much to shrink to {ram_gb} GB")
+                if used_cpu / 100 > cpu_cores * RESIZE_MAX_USAGE:
+                    return False, (f"VPS {vps_name} is using {used_cpu / 100:.1f} cores, "
+                                   f"too much to shrink to {cpu_cores}")
+            # Only growth needs room; a stopped VPS is admitted again when it starts
+            admitted, reason = node.scheduler.reserve(reservation, max(0, ram_gb - vps.ram_gb),
+                                                      max(0, cpu_cores - vps.cpu_cores), 0)
+            if not admitted:
+                return False, reason
+        cpusets = node.cpusets
+        old_cpuset = vps.cpuset
+        pinned = bool(old_cpuset and cpusets and vps_name in cpusets.allocations)
+        try:
+            if pinned and cpu_cores != vps.cpu_cores:
+                # Reallocated as a whole; best-fit usually lands on a run containing the old cores
+                cpusets.release(vps_name)
+                if cpusets.allocate(vps_name, cpu_cores) is None:
+                    cpusets.claim(vps_name, old_cpuset)
+                    return False, f"Not enough dedicated cores (free: {len(cpusets.free())} besides its own)"
+                vps.cpuset = cpusets.describe(vps_name)[0]
+            await node.backend.update_container(vps.container_id, mem_limit=ram_gb * 1024 ** 3,
+                                                **self._cpu_limits(vps, cpu_cores))
+            detail = f"{vps.ram_gb} -> {ram_gb} GB RAM, {vps.cpu_cores} -> {cpu_cores} cores"
+            if vps.cpuset != old_cpuset:
+                detail += f" (cores {old_cpuset} -> {vps.cpuset})"
+            vps.ram_gb = ram_gb
+            vps.cpu_cores = cpu_cores
+            if vps.status == "running":
+                self._shape_later(vps)
+            self._persist(vps, "resized", detail)
+            return True, f"VPS {vps_name} resized: {detail}"
+        except Exception as e:
+            if vps.cpuset != old_cpuset:
+                cpusets.release(vps_name)
+                cpusets.claim(vps_name, old_cpuset)
+                vps.cpuset = old_cpuset
+            return False, f"Error resizing VPS: {str(e)}"
+        finally:
+            node.scheduler.release(reservation)
+    
+    async def suspend_vps(self, vps_name: str, action: str = "pause") -> Tuple[bool, str]:
+        """Pause or stop an idle VPS until someone needs it again; only stopping frees its memory for other VPSes"""
+        vps = self.vps_instances.get(vps_name)
+        if vps is None:
+            return False, "VPS not found"
+        try:
+            backend = self.node_of(vps).backend
+            if action == "pause":
+                await backend.pause_container(vps.container_id)
+                vps.status = "paused"
+                # Frozen memory stays charged to the container; pausing only frees the CPU
+                detail = "its RAM stays committed until it is stopped"
+            else:
+                if vps.status == "paused":
+                    await backend.unpause_container(vps.container_id)
+                await backend.stop_container(vps.container_id)
+                vps.status = "stopped"
+                detail = f"{vps.ram_gb:.1f} GB RAM reclaimed"
+            vps.idle_suspended = True
+            self._persist(vps, f"idle {action}", detail)
+            return True, f"VPS {vps_name} {'paused' if action == 'pause' else 'stopped'}" + (f", {detail}" if detail else "")
+        except Exception as e:
+            return False, f"Error suspending VPS {vps_name}: {str(e)}"
+    
+    async def resume_vps(self, vps_name: str) -> Tuple[bool, str]:
+        """Bring back a VPS the idle policy paused or stopped"""
+        vps = self.vps_instances.get(vps_name)
+        if vps is None:
+            return False, "VPS not found"
+        if not vps.idle_suspended:
+            return False, f"VPS {vps_name} was not suspended for being idle"
+        if self.idle_policy:
+            self.idle_policy.touch(vps_name)
+            self.idle_policy.resumes += 1
+        if vps.status == "stopped":
+            success, message = await self.restart_vps(vps_name)
+            return success, message.replace("restarted", "resumed", 1)
+        if vps.status != "paused":
+            vps.idle_suspended = False
+            return True, f"VPS {vps_name} is {vps.status}"
+        
+        # Its capacity stayed committed while paused, so there is nothing to reserve
+        try:
+            await self.node_of(vps).backend.unpause_container(vps.container_id)
+        except Exception as e:
+            return False, f"Error resuming VPS {vps_name}: {str(e)}"
+        vps.status = "running"
+        vps.idle_suspended = False
+        self._persist(vps, "resumed")
+        # tmate lost its server connection while frozen, so the old SSH string is dead
+        refreshed, result_msg = await self.refresh_tmate_session(vps_name)
+        if not refreshed:
+            return True, f"VPS {vps_name} resumed, but its tmate session couldn't be restarted: {result_msg}"
+        return True, f"VPS {vps_name} resumed, new tmate session: `{vps.tmate_session}`"
+    
     async def refresh_tmate_session(self, vps_name: str) -> Tuple[bool, str]:
         """Manually refresh tmate session for a VPS"""
         if vps_name not in self.vps_instances:
@@ -292,36 +1681,34 @@ class VPSManager:
             vps = self.vps_instances[vps_name]
             if not vps.container_id:
                 return False, "No container found for VPS"
+            backend = self.node_of(vps).backend
+            trace = self.tracer.trace(vps_name)
             
-            container = self.client.containers.get(vps.container_id)
-            
-            # Kill existing tmate session
-            container.exec_run("pkill -f tmate", stdout=True, stderr=True)
-            await asyncio.sleep(1)
+            # Kill existing tmate session and wait for it to exit
+            with trace.span("session_kill"):
+                await backend.exec(
+                    vps.container_id,
+                    "pkill -f tmate; for i in $(seq 50); do pgrep -x tmate >/dev/null || break; sleep 0.1; done; "
+                    "rm -f /tmp/tmate.sock"
+                )
             
             # Start new tmate session
-            tmate_result = container.exec_run(
-                "tmate -S /tmp/tmate.sock new-session -d",
-                stdout=True,
-                stderr=True
-            )
+            with trace.span("session_start", "refresh") as span:
+                tmate_result = await backend.exec(
+                    vps.container_id,
+                    "tmate -S /tmp/tmate.sock new-session -d"
+                )
+                if tmate_result.exit_code != 0:
+                    span.outcome = "error"
             
             if tmate_result.exit_code == 0:
-                # Wait for session to be ready
-                await asyncio.sleep(3)
-                
-                # Get session info
-                session_info = container.exec_run(
-                    "tmate -S /tmp/tmate.sock display -p '#{tmate_ssh}'",
-                    stdout=True,
-                    stderr=True
-                )
-                
-                if session_info.exit_code == 0 and session_info.output:
-                    ssh_info = session_info.output.decode().strip()
-                    if "tmate.io" in ssh_info:
-                        vps.tmate_session = ssh_info
-                        return True, f"New tmate session created: {ssh_info}"
+                started = time.monotonic()
+                ssh_info = await self._wait_for_tmate_ready(backend, vps.container_id, trace)
+                if ssh_info:
+                    self.tmate_ready_seconds.observe(time.monotonic() - started)
+                    vps.tmate_session = ssh_info
+                    self._persist(vps, "session refreshed")
+                    return True, f"New tmate session created: {ssh_info}"
                 
                 return False, "tmate session created but couldn't get SSH info"
             else:
@@ -331,12 +1718,19 @@ class VPSManager:
             return False, f"Error refreshing tmate session: {str(e)}"
     
     def get_system_resources(self) -> Dict:
-        """Get current system resource usage"""
+        """Get current system resource usage from the latest background sample"""
+        sample = self.sampler.latest() or {}
         return {
-            "total_ram_gb": round(psutil.virtual_memory().total / (1024**3), 2),
-            "used_ram_gb": round(psutil.virtual_memory().used / (1024**3), 2),
-            "cpu_cores": psutil.cpu_count(),
-            "cpu_usage_percent": psutil.cpu_percent(interval=1),
-            "disk_total_gb": round(psutil.disk_usage('/').total / (1024**3), 2),
-            "disk_used_gb": round(psutil.disk_usage('/').used / (1024**3), 2)
+            "total_ram_gb": round(self.sampler.total_ram_gb, 2),
+            "used_ram_gb": round(sample.get("used_ram_gb", 0.0), 2),
+            "cpu_cores": self.sampler.cpu_cores,
+            "cpu_usage_percent": sample.get("cpu_percent", 0.0),
+            "disk_total_gb": round(self.sampler.disk_total_gb, 2),
+            "disk_used_gb": round(sample.get("disk_used_gb", 0.0), 2),
+            "load_1m": sample.get("load_1m", 0.0),
+            "disk_read_mbps": sample.get("disk_read_mbps", 0.0),
+            "disk_write_mbps": sample.get("disk_write_mbps", 0.0),
+            "net_rx_mbps": sample.get("net_rx_mbps", 0.0),
+            "net_tx_mbps": sample.get("net_tx_mbps", 0.0),
+            "history": {field: self.sampler.summaries(field) for field in ("cpu_percent", "used_ram_gb", "load_1m")}
         }
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from scheduler import Resources
+
+if TYPE_CHECKING:
+    from node_pool import Node
+    from vps_manager import VPSConfig, VPSManager
+
+POOL_PREFIX = "vpspool-"
+
+SizeClass = Tuple[int, int, int]  # (ram_gb, cpu_cores, disk_gb)
+
+class WarmPool:
+    """Keeps pre-started VPS containers with live tmate sessions ready to claim.
+
+    The pool lives on a single Docker node. Each size class is refilled in the background whenever it drops below
+    ``low`` ready containers, up to ``high``, as long as the RAM reserved by
+    warm containers stays under ``max_reserved_ram_gb``.
+    """
+
+    def __init__(self, manager: "VPSManager", node: "Node", size_classes: List[SizeClass], low: int, high: int,
+                 max_reserved_ram_gb: int, max_concurrent_fills: int = 2, check_interval: int = 30):
+        self.manager = manager
+        self.node = node
+        self.size_classes = list(size_classes)
+        self.low = low
+        self.high = high
+        self.max_reserved_ram_gb = max_reserved_ram_gb
+        self.check_interval = check_interval
+        self.ready: Dict[SizeClass, List["VPSConfig"]] = {size: [] for size in self.size_classes}
+        self.filling: Dict[SizeClass, int] = {size: 0 for size in self.size_classes}
+        self.max_concurrent_fills = max_concurrent_fills
+        # Created in run() so they bind to the bot's event loop
+        self._fill_slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._fill_tasks = set()
+        self._seq = 0
+        self.claims = 0
+        self.misses = 0
+
+    def reserved_ram_gb(self) -> int:
+        """RAM held by ready and in-progress warm containers"""
+        return sum(size[0] * (len(ready) + self.filling[size]) for size, ready in self.ready.items())
+
+    def reserved(self) -> Tuple[int, int, int]:
+        """RAM, cores and disk held by ready and in-progress warm containers"""
+        counts = {size: len(ready) + self.filling[size] for size, ready in self.ready.items()}
+        return tuple(sum(size[i] * count for size, count in counts.items()) for i in range(3))
+
+    def _pick(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> Optional[SizeClass]:
+        exact = (ram_gb, cpu_cores, disk_gb)
+        if self.ready.get(exact):
+            return exact
+        # Any class with the same disk can be resized in place with container.update
+        for size in self.size_classes:
+            if size[2] == disk_gb and self.ready[size]:
+                return size
+        return None
+
+    def can_claim(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> bool:
+        return self._pick(ram_gb, cpu_cores, disk_gb) is not None
+
+    def claimable(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> int:
+        """How many requests of this size ready warm containers can serve"""
+        # Same rule as _pick: any class with the same disk can be resized
+        return sum(len(self.ready[size]) for size in self.size_classes if size[2] == disk_gb)
+
+    def claim(self, ram_gb: int, cpu_cores: int, disk_gb: int) -> Optional["VPSConfig"]:
+        """Take a ready warm container for the requested size, if any"""
+        size = self._pick(ram_gb, cpu_cores, disk_gb)
+        if size is None:
+            self.misses += 1
+            return None
+        self.claims += 1
+        if self._wakeup:
+            self._wakeup.set()
+        return self.ready[size].pop(0)
+
+    def _next_name(self) -> str:
+        self._seq += 1
+        return f"{POOL_PREFIX}{int(time.time())}-{self._seq}"
+
+    async def adopt_existing(self):
+        """Reuse warm containers left running by a previous bot process"""
+        from vps_manager import CONTAINER_STATUS
+
+        containers = await self.node.backend.list_containers(labels=["vpsbot.pool=true"])
+        for container in containers:
+            warm = self.manager.config_from_container(container, self.node.name)
+            size = (warm.ram_gb, warm.cpu_cores, warm.disk_gb)
+            if not warm.name.startswith(POOL_PREFIX):
+                continue
+            if size not in self.ready or CONTAINER_STATUS.get(container.get("State")) != "running":
+                await self.discard(warm)
+                continue
+            warm.tmate_session = await self.manager.read_tmate_session(self.node.backend, warm.container_id)
+            if warm.tmate_session:
+                self.ready[size].append(warm)
+            else:
+                await self.discard(warm)
+
+    async def discard(self, warm: "VPSConfig"):
+        """Remove a warm container along with its volume"""
+        if warm.container_id:
+            try:
+                await self.node.backend.remove_container(warm.container_id, force=True)
+            except Exception as e:
+                print(f"Error removing warm container {warm.name}: {e}")
+        self.manager.release_volume(warm, grace=False)
+
+    async def run(self):
+        """Refill loop; wakes on claims and every check_interval seconds"""
+        self._fill_slots = asyncio.Semaphore(self.max_concurrent_fills)
+        self._wakeup = asyncio.Event()
+        while True:
+            self._refill()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _refill(self):
+        for size in self.size_classes:
+            available = len(self.ready[size]) + self.filling[size]
+            if available >= self.low:
+                continue
+            for _ in range(self.high - available):
+                if self.reserved_ram_gb() + size[0] > self.max_reserved_ram_gb:
+                    break
+                # Never let the pool take capacity that VPSes could use
+                if not self.node.healthy or not self.node.scheduler.fits(Resources(*size)):
+                    break
+                self.filling[size] += 1
+                task = asyncio.create_task(self._fill(size))
+                self._fill_tasks.add(task)
+                task.add_done_callback(self._fill_tasks.discard)
+
+    def trim(self):
+        """Evict ready containers, largest first, while the host is overcommitted"""
+        while self.node.scheduler.overcommitted():
+            sizes = [size for size in self.size_classes if self.ready[size]]
+            if not sizes:
+                return
+            warm = self.ready[max(sizes)].pop()
+            print(f"Evicting warm container {warm.name} to free host capacity")
+            task = asyncio.create_task(self.discard(warm))
+            self._fill_tasks.add(task)
+            task.add_done_callback(self._fill_tasks.discard)
+
+    async def _fill(self, size: SizeClass):
+        from vps_manager import VPSConfig
+
+        ram_gb, cpu_cores, disk_gb = size
+        warm = VPSConfig(name=self._next_name(), ram_gb=ram_gb, cpu_cores=cpu_cores,
+                         disk_gb=disk_gb, created_at=time.time(), node=self.node.name)
+        try:
+            async with self._fill_slots:
+                await self.manager.create_vps_container(warm, pool=True)
+            if warm.status == "running" and warm.tmate_session:
+                self.ready[size].append(warm)
+            else:
+                await self.discard(warm)
+        finally:
+            self.filling[size] -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "ready": {f"{r}/{c}/{d}": len(ready) for (r, c, d), ready in self.ready.items()},
+            "filling": sum(self.filling.values()),
+            "reserved_ram_gb": self.reserved_ram_gb(),
+            "claims": self.claims,
+            "misses": self.misses,
+        }